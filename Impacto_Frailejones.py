@@ -2,26 +2,35 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-from data.regions import get_frailejon_regions
 import plotly.express as px
 from streamlit_folium import st_folium
 import streamlit.components.v1 as components
-import json
+import uuid
 from models import (
+    CLIMATE_SCENARIO_STRENGTH,
     calculate_biodiversity_impact, 
-    calculate_crop_production, 
-    create_ecosystem_simulation
+    calculate_crop_production
 )
-from visualizations import (
+from visualizations import plot_timeseries_forecast, plot_ensemble_bands
+# Versiones con caché compartida por el proceso (ver cache.py)
+from cache import (
+    get_frailejon_regions,
+    get_initial_data,
+    create_ecosystem_simulation,
     plot_frailejon_crop_relationship,
     plot_frailejon_crop_relationship_3d,
     plot_biodiversity_impact,
     plot_biodiversity_impact_3d,
-    plot_timeseries_forecast,
-    create_risk_map
+    clear_cache
 )
-from data_module import get_initial_data
 from utils import get_emoji, add_vertical_space
+from reactive import ReactiveGraph, block_executor
+from prefetch import prefetch_neighbours
+from prewarm import prewarm_on_startup
+from scenario_cube import lookup_biodiversity, lookup_simulation
+from avances_store import CORTES, AvancesConflictError
+from project_store import read_avances, write_avances, save_scenario, list_scenarios
+from job_queue import submit_job, get_job, cancel_job, ensemble_simulation_job, FINISHED_STATES
 
 # Page configuration
 st.set_page_config(
@@ -31,6 +40,13 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Precalentar la caché compartida con los escenarios comunes (una vez por proceso)
+prewarm_on_startup()
+
+# Identificador de la sesión (precálculo y cola de trabajos)
+if "prefetch_session_id" not in st.session_state:
+    st.session_state["prefetch_session_id"] = uuid.uuid4().hex
+
 # Custom CSS para tema claro/verde natural
 st.markdown("""
 <style>
@@ -162,41 +178,168 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Función para cargar/guardar avances
-def load_avances():
-    """Cargar avances desde archivo o usar valores por defecto"""
-    try:
-        with open('avances_data.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {
-            "primer_corte": [
-                "Revisión bibliográfica sobre el papel de los frailejones en los ecosistemas de páramo",
-                "Identificación de especies de frailejones endémicas de Colombia",
-                "Análisis preliminar de la distribución geográfica de los frailejones",
-                "Definición de parámetros iniciales para el modelo matemático",
-                "Implementación de la estructura básica de la aplicación en Streamlit"
-            ],
-            "segundo_corte": [
-                "Desarrollo del modelo matemático para simular el impacto de la pérdida de frailejones",
-                "Implementación de ecuaciones diferenciales para modelar la dinámica del ecosistema",
-                "Creación de visualizaciones 2D para mostrar relaciones entre variables",
-                "Integración de datos específicos de regiones colombianas (Boyacá, Cundinamarca, etc.)",
-                "Validación preliminar del modelo con datos reales de páramos"
-            ],
-            "tercer_corte": [
-                "Desarrollo de visualizaciones 3D interactivas con Plotly",
-                "Implementación del mapa de riesgo con Folium para páramos colombianos",
-                "Creación de métricas económicas y de biodiversidad específicas",
-                "Desarrollo de la interfaz de usuario final con controles avanzados",
-                "Documentación completa del proyecto y validación final del modelo"
-            ]
-        }
+# Avances del proyecto: guardados en la base SQLite del proyecto, con
+# detección de conflictos entre sesiones (ver project_store.py)
+def load_editor_avances():
+    """Cargar en el editor la versión actual de los avances"""
+    avances_data, version = read_avances()
+    for corte in CORTES:
+        st.session_state[corte] = "\n".join([f"• {avance}" for avance in avances_data[corte]])
+    st.session_state["avances_base_version"] = version
+
+# Vaciar la caché compartida (datos, simulaciones y figuras de todas las sesiones)
+if st.sidebar.button("🧹 Limpiar caché de cálculos"):
+    clear_cache()
+    st.sidebar.success("Caché vaciada")
+
+def compute_regional_metrics(frailejon, region, biodiversity):
+    """Métricas del calculador de impacto ajustadas por el páramo seleccionado"""
+    # Cargar lista de páramos con sus datos
+    paramos = get_frailejon_regions()
+    region_info = next((p for p in paramos if p["name"] == region), None)
+
+    # Valores base globales
+    base_species = 3000
+    water_base = 450
+    carbon_base = 15000
+
+    # Ajuste por región seleccionada
+    if region_info:
+        frailejon_density = region_info.get("frailejon_density", 100)
+        region_modifier = frailejon_density / 100  # Escala según densidad
+        area = region_info.get("area", 1000)
+
+        # Ajustes de bases por región
+        base_species = int(base_species * region_modifier)
+        water_base = water_base * (area / 1000) * region_modifier
+        carbon_base = int(carbon_base * region_modifier)
+    else:
+        region_modifier = 1.0
+
+    # Cálculos principales
+    return {
+        "species_at_risk": int(max(0, 100 - frailejon) * 0.25 * base_species / 100),
+        "water_loss": water_base * (max(0, 100 - frailejon) / 100),
+        "carbon_loss": int(carbon_base * (max(0, 100 - frailejon) / 100) * 0.6),
+        "adjusted_biodiversity": min(100, biodiversity * region_modifier)
+    }
+
+def compute_water_impact(frailejon, climate):
+    """Regulación hídrica ajustada por escenario climático"""
+    climate_modifier = 1.0
+    if climate == "Calentamiento moderado":
+        climate_modifier = 0.9
+    elif climate == "Calentamiento severo":
+        climate_modifier = 0.75
+    return min(100, frailejon * climate_modifier)
+
+def compute_biodiversity(frailejon, resilience):
+    """Índice de biodiversidad desde el cubo precalculado si existe; si no, con el modelo"""
+    biodiversity = lookup_biodiversity(frailejon, resilience)
+    if biodiversity is None:
+        biodiversity = calculate_biodiversity_impact(frailejon, resilience)
+    return biodiversity
+
+def compute_simulation(frailejon, years, resilience, climate):
+    """Simulación desde el cubo precalculado si existe; si no, se resuelve el modelo"""
+    climate_strength = CLIMATE_SCENARIO_STRENGTH[climate]
+    simulation = lookup_simulation(frailejon, years, resilience, climate_strength)
+    if simulation is None:
+        simulation = create_ecosystem_simulation(frailejon, years, resilience, climate_strength)
+    return simulation
+
+# Bloques de cálculo de la página y sus dependencias: en cada rerun solo se
+# recalculan los bloques cuyas entradas cambiaron (p. ej. editar los avances o
+# cambiar el tipo de visualización no repite la simulación)
+page_graph = (
+    ReactiveGraph("impacto_blocks")
+    .block("biodiversity", ["frailejon", "resilience"], compute_biodiversity)
+    .block("simulation", ["frailejon", "years", "resilience", "climate"], compute_simulation)
+    .block("regional_metrics", ["frailejon", "region", "biodiversity"],
+           compute_regional_metrics)
+    .block("water_impact", ["frailejon", "climate"], compute_water_impact)
+    .block("figure_2d", ["frailejon"],
+           lambda frailejon: plot_frailejon_crop_relationship(frailejon))
+    .block("figure_3d", ["frailejon", "years"],
+           lambda frailejon, years: plot_frailejon_crop_relationship_3d(frailejon, years))
+)
+
+# Panel de visualización como fragmento: cambiar el tipo de gráfico solo
+# vuelve a ejecutar este panel, no el resto de la página
+@st.fragment
+def render_visualization_panel(page_inputs):
+    st.markdown("<div class='card'>", unsafe_allow_html=True)
+    st.markdown("<h2 class='sub-header'>🌿 Frailejones y su impacto en el páramo</h2>", unsafe_allow_html=True)
+
+    viz_type = st.radio(
+        "Selecciona tipo de visualización",
+        options=["Gráfico 2D", "Modelo 3D Interactivo"],
+        horizontal=True,
+        key="frailejon_viz_type"
+    )
+
+    if viz_type == "Gráfico 2D":
+        fig_relationship = page_graph.run(page_inputs, only=["figure_2d"])["figure_2d"]
+        st.plotly_chart(fig_relationship, use_container_width=True)
+
+        st.markdown("""
+        <p class='description'>
+        El gráfico muestra la relación crítica entre la población de frailejones y los servicios ecosistémicos 
+        del páramo. La pérdida de frailejones tiene efectos exponenciales en la regulación hídrica y 
+        la biodiversidad del ecosistema.
+        </p>
+        """, unsafe_allow_html=True)
+    else:
+        fig_relationship_3d = page_graph.run(page_inputs, only=["figure_3d"])["figure_3d"]
+        st.plotly_chart(fig_relationship_3d, use_container_width=True)
+
+        st.markdown("""
+        <p class='description'>
+        Esta visualización 3D muestra cómo evoluciona el impacto en los servicios ecosistémicos a lo largo del tiempo
+        según diferentes niveles de población de frailejones. El punto rojo indica tu configuración actual.
+        </p>
+        """, unsafe_allow_html=True)
+
+    st.markdown("</div>", unsafe_allow_html=True)
+
+def render_ensemble_panel(page_inputs):
+    """Panel del ensamble de incertidumbre, calculado en la cola de trabajos"""
+    job_id = st.session_state.get("ensemble_job_id")
+    job = get_job(job_id) if job_id else None
+
+    if st.button("🎲 Calcular ensamble de incertidumbre", disabled=job is not None and job["status"] not in FINISHED_STATES):
+        job_id = submit_job(
+            ensemble_simulation_job,
+            page_inputs["frailejon"],
+            page_inputs["years"],
+            page_inputs["resilience"],
+            page_inputs["climate"],
+            owner=st.session_state["prefetch_session_id"],
+            inputs=page_inputs
+        )
+        st.session_state["ensemble_job_id"] = job_id
+        # Rerun completo para que el panel empiece a sondear el avance
+        st.rerun()
+
+    if job is None:
+        st.caption("Simula 200 variaciones del escenario actual para ver el rango probable de la proyección.")
+        return
+
+    running = job["status"] not in FINISHED_STATES
+    if running:
+        st.progress(job["progress"], text=f"Calculando ensamble… {job['message']}")
+    elif job["status"] == "error":
+        st.error(f"El ensamble falló: {job['error']}")
+
+    ensemble = job["result"] if job["result"] is not None else job["partial"]
+    if ensemble is not None:
+        st.plotly_chart(plot_ensemble_bands(ensemble), use_container_width=True)
+
+    if not running and st.session_state.get("ensemble_polling"):
+        # Termina el sondeo: un rerun completo vuelve a dibujar el panel sin run_every
+        st.session_state["ensemble_polling"] = False
+        st.rerun()
 
-def save_avances(avances_data):
-    """Guardar avances en archivo"""
-    with open('avances_data.json', 'w', encoding='utf-8') as f:
-        json.dump(avances_data, f, ensure_ascii=False, indent=2)
 
 # Header
 st.markdown(f"<h1 class='main-header'>🌿 Proyección de la Permanencia de Frailejones en Páramos Colombianos 🌿</h1>", unsafe_allow_html=True)
@@ -230,7 +373,10 @@ st.markdown("<h2 class='sub-header'>📚 Avances del Proyecto - Métodos Numéri
 st.markdown("<p class='description'><strong>Universidad Central - 2025 Segundo Semestre</strong></p>", unsafe_allow_html=True)
 
 # Cargar avances existentes
-avances = load_avances()
+avances, _ = read_avances()
+# El editor conserva el texto y la versión sobre la que se empezó a editar
+if "avances_base_version" not in st.session_state:
+    load_editor_avances()
 
 # Editor de avances
 with st.expander("✏️ Editar Avances del Proyecto", expanded=False):
@@ -240,7 +386,6 @@ with st.expander("✏️ Editar Avances del Proyecto", expanded=False):
     st.markdown("<div class='corte-header'>Primer Corte</div>", unsafe_allow_html=True)
     primer_corte_text = st.text_area(
         "Avances del Primer Corte:",
-        value="\n".join([f"• {avance}" for avance in avances["primer_corte"]]),
         height=150,
         key="primer_corte"
     )
@@ -249,7 +394,6 @@ with st.expander("✏️ Editar Avances del Proyecto", expanded=False):
     st.markdown("<div class='corte-header'>Segundo Corte</div>", unsafe_allow_html=True)
     segundo_corte_text = st.text_area(
         "Avances del Segundo Corte:",
-        value="\n".join([f"• {avance}" for avance in avances["segundo_corte"]]),
         height=150,
         key="segundo_corte"
     )
@@ -258,21 +402,32 @@ with st.expander("✏️ Editar Avances del Proyecto", expanded=False):
     st.markdown("<div class='corte-header'>Tercer Corte</div>", unsafe_allow_html=True)
     tercer_corte_text = st.text_area(
         "Avances del Tercer Corte:",
-        value="\n".join([f"• {avance}" for avance in avances["tercer_corte"]]),
         height=150,
         key="tercer_corte"
     )
 
-    if st.button("💾 Guardar Cambios", type="primary"):
+    col_guardar, col_recargar = st.columns(2)
+    with col_recargar:
+        st.button("🔄 Recargar avances guardados", on_click=load_editor_avances)
+
+    if col_guardar.button("💾 Guardar Cambios", type="primary"):
         # Procesar y guardar los cambios
         nuevo_avances = {
             "primer_corte": [line.strip("• ").strip() for line in primer_corte_text.split("\n") if line.strip()],
             "segundo_corte": [line.strip("• ").strip() for line in segundo_corte_text.split("\n") if line.strip()],
             "tercer_corte": [line.strip("• ").strip() for line in tercer_corte_text.split("\n") if line.strip()]
         }
-        save_avances(nuevo_avances)
-        st.success("¡Avances guardados correctamente!")
-        st.rerun()
+        try:
+            st.session_state["avances_base_version"] = write_avances(
+                nuevo_avances,
+                expected_version=st.session_state["avances_base_version"]
+            )
+        except AvancesConflictError:
+            st.warning("Otra persona guardó cambios en los avances mientras editabas. "
+                       "Recarga los avances guardados y vuelve a aplicar tus cambios.")
+        else:
+            st.success("¡Avances guardados correctamente!")
+            st.rerun()
 
 # Mostrar avances actuales
 col_avances1, col_avances2, col_avances3 = st.columns(3)
@@ -390,41 +545,32 @@ with col1:
     st.markdown("</div>", unsafe_allow_html=True)
 
 with col2:
-    biodiversity_impact = calculate_biodiversity_impact(frailejon_population_percentage, resilience_value)
-    water_regulation_impact = frailejon_population_percentage
-    ecosystem_data = create_ecosystem_simulation(frailejon_population_percentage, years_to_simulate, resilience_value)
+    page_inputs = {
+        "frailejon": frailejon_population_percentage,
+        "resilience": resilience_value,
+        "years": years_to_simulate,
+        "region": selected_region,
+        "climate": climate_scenario
+    }
+    # Los bloques independientes (biodiversidad, simulación, métricas y la
+    # figura activa) se evalúan en paralelo; el panel de visualización luego
+    # reutiliza la figura ya calculada
+    active_figure = "figure_2d" if st.session_state.get("frailejon_viz_type", "Gráfico 2D") == "Gráfico 2D" else "figure_3d"
+    blocks = page_graph.run(
+        page_inputs,
+        only=["biodiversity", "simulation", "regional_metrics", "water_impact", active_figure],
+        executor=block_executor
+    )
+    ecosystem_data = blocks["simulation"]
+    metrics = blocks["regional_metrics"]
+    species_at_risk = metrics["species_at_risk"]
+    water_loss = metrics["water_loss"]
+    carbon_loss = metrics["carbon_loss"]
+    adjusted_biodiversity = metrics["adjusted_biodiversity"]
 
     st.markdown("<div class='card'>", unsafe_allow_html=True)
     st.markdown("<h2 class='sub-header'>Impacto Calculador</h2>", unsafe_allow_html=True)
 
-    # Cargar lista de páramos con sus datos
-    paramos = get_frailejon_regions()
-    region_info = next((p for p in paramos if p["name"] == selected_region), None)
-
-    # Valores base globales
-    base_species = 3000
-    water_base = 450
-    carbon_base = 15000
-
-    # Ajuste por región seleccionada
-    if region_info:
-        frailejon_density = region_info.get("frailejon_density", 100)
-        region_modifier = frailejon_density / 100  # Escala según densidad
-        area = region_info.get("area", 1000)
-
-        # Ajustes de bases por región
-        base_species = int(base_species * region_modifier)
-        water_base = water_base * (area / 1000) * region_modifier
-        carbon_base = int(carbon_base * region_modifier)
-    else:
-        region_modifier = 1.0
-
-    # Cálculos principales
-    species_at_risk = int(max(0, 100 - frailejon_population_percentage) * 0.25 * base_species / 100)
-    water_loss = water_base * (max(0, 100 - frailejon_population_percentage) / 100)
-    carbon_loss = int(carbon_base * (max(0, 100 - frailejon_population_percentage) / 100) * 0.6)
-    adjusted_biodiversity = min(100, biodiversity_impact * region_modifier)
-
     st.markdown("""
     <style>
     .metric-card {
@@ -444,13 +590,7 @@ with col2:
     # === Columna 1 ===
     with col1:
         st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
-        climate_modifier = 1.0
-        if climate_scenario == "Calentamiento moderado":
-            climate_modifier = 0.9
-        elif climate_scenario == "Calentamiento severo":
-            climate_modifier = 0.75
-
-        adjusted_water_impact = min(100, water_regulation_impact * climate_modifier)
+        adjusted_water_impact = blocks["water_impact"]
         st.metric(
             label="🪴 Regulación Hídrica",
             value=f"{adjusted_water_impact:.1f}%",
@@ -499,46 +639,55 @@ with col2:
         st.markdown("</div>", unsafe_allow_html=True)
 
     # === Visualización ===
-    st.markdown("<div class='card'>", unsafe_allow_html=True)
-    st.markdown("<h2 class='sub-header'>🌿 Frailejones y su impacto en el páramo</h2>", unsafe_allow_html=True)
-
-
-    viz_type = st.radio(
-        "Selecciona tipo de visualización",
-        options=["Gráfico 2D", "Modelo 3D Interactivo"],
-        horizontal=True,
-        key="frailejon_viz_type"
-    )
-
-    if viz_type == "Gráfico 2D":
-        fig_relationship = plot_frailejon_crop_relationship(frailejon_population_percentage)
-        st.plotly_chart(fig_relationship, use_container_width=True)
-
-        st.markdown("""
-        <p class='description'>
-        El gráfico muestra la relación crítica entre la población de frailejones y los servicios ecosistémicos 
-        del páramo. La pérdida de frailejones tiene efectos exponenciales en la regulación hídrica y 
-        la biodiversidad del ecosistema.
-        </p>
-        """, unsafe_allow_html=True)
-    else:
-        ecosystem_data = create_ecosystem_simulation(
-        frailejon_population_percentage,
-        years_to_simulate,
-        resilience_value
-       )
-            
-        fig_relationship_3d = plot_frailejon_crop_relationship_3d(frailejon_population_percentage, years_to_simulate)
-        st.plotly_chart(fig_relationship_3d, use_container_width=True)
-
-        st.markdown("""
-        <p class='description'>
-        Esta visualización 3D muestra cómo evoluciona el impacto en los servicios ecosistémicos a lo largo del tiempo
-        según diferentes niveles de población de frailejones. El punto rojo indica tu configuración actual.
-        </p>
-        """, unsafe_allow_html=True)
-
-    st.markdown("</div>", unsafe_allow_html=True)
+    render_visualization_panel(page_inputs)
+
+    # === Ensamble de incertidumbre (cola de trabajos) ===
+    # Un cambio en los controles cancela el ensamble en curso de la sesión
+    ensemble_job = get_job(st.session_state.get("ensemble_job_id")) if "ensemble_job_id" in st.session_state else None
+    if ensemble_job is not None and ensemble_job["inputs"] != page_inputs:
+        cancel_job(ensemble_job["id"])
+        del st.session_state["ensemble_job_id"]
+        ensemble_job = None
+    # Mientras haya un trabajo en curso, el panel se vuelve a dibujar cada segundo
+    polling = ensemble_job is not None and ensemble_job["status"] not in FINISHED_STATES
+    st.session_state["ensemble_polling"] = polling
+    with st.expander("🎲 Ensamble de incertidumbre", expanded=ensemble_job is not None):
+        st.fragment(render_ensemble_panel, run_every=1.0 if polling else None)(page_inputs)
+
+    # === Escenarios guardados ===
+    if st.button("💾 Guardar escenario"):
+        scenario_id = save_scenario(
+            page_inputs,
+            ecosystem_data,
+            summary={
+                "water_impact": adjusted_water_impact,
+                "species_at_risk": species_at_risk,
+                "carbon_loss": carbon_loss,
+                "adjusted_biodiversity": adjusted_biodiversity
+            }
+        )
+        st.success(f"Escenario #{scenario_id} guardado")
+
+    with st.expander("📂 Escenarios guardados"):
+        saved_scenarios = list_scenarios(limit=50)
+        if saved_scenarios.empty:
+            st.info("Aún no hay escenarios guardados.")
+        else:
+            st.dataframe(
+                saved_scenarios[["id", "created_at", "region", "climate", "resilience", "frailejon", "years"]],
+                hide_index=True
+            )
+
+# Precalcular en segundo plano los estados vecinos de los sliders para que
+# mover una muesca encuentre la simulación y la figura en caché
+prefetch_neighbours(
+    st.session_state["prefetch_session_id"],
+    frailejon_population_percentage,
+    years_to_simulate,
+    resilience_value,
+    st.session_state.get("frailejon_viz_type", "Gráfico 2D"),
+    CLIMATE_SCENARIO_STRENGTH[climate_scenario]
+)
 
 # Footer personalizado para Universidad Central
 add_vertical_space(2)
@@ -0,0 +1,237 @@
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import tornado.web
+
+from models import (
+    calculate_biodiversity_impact_batch,
+    calculate_crop_production_batch,
+    calculate_economic_impact_batch,
+    create_ecosystem_simulation_batch
+)
+
+# API HTTP local (JSON) con las funciones de models.py, para otras
+# herramientas que necesitan los resultados sin pasar por Streamlit.
+#
+# Cada endpoint acepta un escenario ({"frailejon": 80, ...}) o un lote
+# ({"items": [{...}, {...}]}) y responde {"results": [...]}. Las llamadas
+# concurrentes de distintos clientes a un mismo endpoint se agrupan durante
+# unos milisegundos (micro-batching) y se evalúan juntas con las versiones
+# vectorizadas de los modelos.
+#
+# Uso:
+#     python api_server.py --port 8765
+#     curl -X POST localhost:8765/biodiversity -d '{"frailejon": 80, "resilience": 0.6}'
+
+DEFAULT_PORT = 8765
+# Máximo de escenarios por evaluación vectorizada y espera para llenar un lote
+MAX_BATCH = 512
+MAX_DELAY = 0.002
+# Límite de escenarios por solicitud y de años por simulación
+MAX_ITEMS_PER_REQUEST = 10_000
+MAX_YEARS = 200
+
+# Campos numéricos aceptados en un escenario
+NUMERIC_FIELDS = ("frailejon", "resilience", "years", "climate_strength")
+
+
+def _biodiversity(items):
+    values = calculate_biodiversity_impact_batch(
+        [item["frailejon"] for item in items],
+        [item.get("resilience", 0.6) for item in items]
+    )
+    return [{"biodiversity_index": float(value)} for value in values]
+
+
+def _crop_production(items):
+    values = calculate_crop_production_batch([item["frailejon"] for item in items])
+    return [{"water_regulation": float(value)} for value in values]
+
+
+def _economic_impact(items):
+    losses = calculate_economic_impact_batch(
+        [item["frailejon"] for item in items],
+        [item.get("region", "Todos los páramos") for item in items]
+    )
+    results = []
+    for index in range(len(items)):
+        result = {service: float(values[index]) for service, values in losses.items()}
+        result["total"] = float(sum(result.values()))
+        results.append(result)
+    return results
+
+
+def _simulation(items):
+    frames = create_ecosystem_simulation_batch(
+        [item["frailejon"] for item in items],
+        [item.get("years", 15) for item in items],
+        [item.get("resilience", 0.6) for item in items],
+        [item.get("climate_strength", 0.02) for item in items],
+        output="array"
+    )
+    return [{column: frame["data"][:, i].tolist() for i, column in enumerate(frame["columns"])} for frame in frames]
+
+
+# Endpoint -> (función vectorizada sobre una lista de escenarios, campos obligatorios)
+ENDPOINTS = {
+    "biodiversity": (_biodiversity, ("frailejon",)),
+    "crop_production": (_crop_production, ("frailejon",)),
+    "economic_impact": (_economic_impact, ("frailejon",)),
+    "simulation": (_simulation, ("frailejon",)),
+}
+
+
+class MicroBatcher:
+    """
+    Agrupa las solicitudes concurrentes a una función vectorizada.
+
+    Los escenarios que llegan mientras se llena un lote (hasta ``max_batch``
+    escenarios o ``max_delay`` segundos desde el primero) se evalúan en una
+    sola llamada en un hilo aparte, para no bloquear el bucle del servidor.
+
+    Parámetros:
+    - func: función lista de escenarios -> lista de resultados
+    - executor: ThreadPoolExecutor donde se evalúan los lotes
+    """
+
+    def __init__(self, func, executor, max_batch=MAX_BATCH, max_delay=MAX_DELAY):
+        self.func = func
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending = []
+        self._timer = None
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, items):
+        """Encola escenarios y espera sus resultados (en el mismo orden)."""
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in items]
+        self._pending.extend(zip(items, futures))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        return await asyncio.gather(*futures)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            asyncio.ensure_future(self._evaluate(batch))
+
+    async def _evaluate(self, batch):
+        items = [item for item, _ in batch]
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self.executor, self.func, items)
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        self.batches += 1
+        self.items += len(items)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+def _parse_items(body, required):
+    try:
+        payload = json.loads(body or b"{}")
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise tornado.web.HTTPError(400, "El cuerpo debe ser JSON")
+    items = payload.get("items", [payload]) if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        raise tornado.web.HTTPError(400, "Se esperaba un escenario o una lista 'items'")
+    if len(items) > MAX_ITEMS_PER_REQUEST:
+        raise tornado.web.HTTPError(413, f"Máximo {MAX_ITEMS_PER_REQUEST} escenarios por solicitud")
+    for item in items:
+        if not isinstance(item, dict) or any(field not in item for field in required):
+            raise tornado.web.HTTPError(400, f"Cada escenario necesita {', '.join(required)}")
+        # Se valida todo antes de encolar: un escenario inválido no debe
+        # hacer fallar el lote compartido con otras solicitudes
+        for field in NUMERIC_FIELDS:
+            if field in item:
+                value = item[field]
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or not np.isfinite(value):
+                    raise tornado.web.HTTPError(400, f"'{field}' debe ser un número finito")
+        if not 0 < item.get("years", 15) <= MAX_YEARS:
+            raise tornado.web.HTTPError(400, f"'years' debe estar entre 0 y {MAX_YEARS}")
+        if not isinstance(item.get("region", ""), str):
+            raise tornado.web.HTTPError(400, "'region' debe ser texto")
+    return items
+
+
+class ModelHandler(tornado.web.RequestHandler):
+    def initialize(self, batchers):
+        self.batchers = batchers
+
+    def write_error(self, status_code, **kwargs):
+        # La línea de estado HTTP solo admite ASCII: el mensaje en español
+        # de los errores de validación viaja en el cuerpo JSON
+        error = kwargs.get("exc_info", (None, None))[1]
+        message = self._reason
+        if isinstance(error, tornado.web.HTTPError) and error.log_message and status_code < 500:
+            message = error.log_message
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps({"error": message}))
+
+    async def post(self, endpoint):
+        if endpoint not in self.batchers:
+            raise tornado.web.HTTPError(404)
+        _, required = ENDPOINTS[endpoint]
+        items = _parse_items(self.request.body, required)
+        start = time.perf_counter()
+        results = await self.batchers[endpoint].submit(items)
+        self.set_header("Content-Type", "application/json")
+        self.write(json.dumps({"results": results, "elapsed_ms": (time.perf_counter() - start) * 1000.0}))
+
+
+class HealthHandler(tornado.web.RequestHandler):
+    def initialize(self, batchers):
+        self.batchers = batchers
+
+    def get(self):
+        self.write({
+            "status": "ok",
+            "endpoints": {
+                name: {"batches": batcher.batches, "items": batcher.items}
+                for name, batcher in self.batchers.items()
+            }
+        })
+
+
+def make_app(workers=4, max_batch=MAX_BATCH, max_delay=MAX_DELAY):
+    """Aplicación tornado con un MicroBatcher por endpoint."""
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+    batchers = {name: MicroBatcher(func, executor, max_batch, max_delay) for name, (func, _) in ENDPOINTS.items()}
+    return tornado.web.Application([
+        (r"/health", HealthHandler, {"batchers": batchers}),
+        (r"/(\w+)", ModelHandler, {"batchers": batchers}),
+    ])
+
+
+async def serve(host="127.0.0.1", port=DEFAULT_PORT, workers=4):
+    app = make_app(workers)
+    # Cola de conexiones amplia para ráfagas de muchos clientes pequeños
+    app.listen(port, address=host, backlog=1024)
+    print(f"API de modelos en http://{host}:{port}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API HTTP local para las funciones de models.py.")
+    parser.add_argument("--host", default="127.0.0.1", help="dirección de escucha (por defecto solo localhost)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=4, help="hilos para evaluar los lotes")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.workers))
@@ -0,0 +1,171 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Persistencia de los avances del proyecto (avances_data.json) segura para
+# varias sesiones a la vez:
+# - lectura en caché según el mtime del archivo (los reruns no vuelven a leer
+#   ni a parsear el JSON si no cambió)
+# - escritura atómica (archivo temporal + os.replace), nunca un archivo a medias
+# - un candado de archivo serializa a los escritores, también entre procesos
+# - cada documento tiene una versión (hash del contenido); quien guarda indica
+#   sobre qué versión editó y, si otro guardó antes, se detecta el conflicto
+
+AVANCES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "avances_data.json")
+
+CORTES = ("primer_corte", "segundo_corte", "tercer_corte")
+
+DEFAULT_AVANCES = {
+    "primer_corte": [
+        "Revisión bibliográfica sobre el papel de los frailejones en los ecosistemas de páramo",
+        "Identificación de especies de frailejones endémicas de Colombia",
+        "Análisis preliminar de la distribución geográfica de los frailejones",
+        "Definición de parámetros iniciales para el modelo matemático",
+        "Implementación de la estructura básica de la aplicación en Streamlit"
+    ],
+    "segundo_corte": [
+        "Desarrollo del modelo matemático para simular el impacto de la pérdida de frailejones",
+        "Implementación de ecuaciones diferenciales para modelar la dinámica del ecosistema",
+        "Creación de visualizaciones 2D para mostrar relaciones entre variables",
+        "Integración de datos específicos de regiones colombianas (Boyacá, Cundinamarca, etc.)",
+        "Validación preliminar del modelo con datos reales de páramos"
+    ],
+    "tercer_corte": [
+        "Desarrollo de visualizaciones 3D interactivas con Plotly",
+        "Implementación del mapa de riesgo con Folium para páramos colombianos",
+        "Creación de métricas económicas y de biodiversidad específicas",
+        "Desarrollo de la interfaz de usuario final con controles avanzados",
+        "Documentación completa del proyecto y validación final del modelo"
+    ]
+}
+
+# Versión del documento cuando el archivo no existe
+DEFAULT_VERSION = "default"
+
+# Documento parseado por ruta: ruta -> (mtime_ns, tamaño, datos, versión)
+_cache = {}
+_cache_lock = threading.Lock()
+# Serializa a los escritores del mismo proceso (el candado de archivo cubre
+# a los de otros procesos)
+_write_lock = threading.Lock()
+
+
+class AvancesConflictError(RuntimeError):
+    """Otro usuario guardó los avances después de que se cargaron para editar."""
+
+    def __init__(self, current, version):
+        super().__init__("Los avances fueron modificados por otra persona")
+        self.current = current
+        self.version = version
+
+
+def _version(raw):
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def _read(path):
+    """Datos y versión actuales, usando la caché si el archivo no cambió."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return DEFAULT_AVANCES, DEFAULT_VERSION
+
+    with _cache_lock:
+        entry = _cache.get(path)
+    if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+        return entry[2], entry[3]
+
+    with open(path, "rb") as f:
+        raw = f.read()
+    data = json.loads(raw.decode("utf-8"))
+    version = _version(raw)
+    with _cache_lock:
+        _cache[path] = (stat.st_mtime_ns, stat.st_size, data, version)
+    return data, version
+
+
+def read_avances(path=None):
+    """
+    Lee los avances del proyecto.
+
+    Parámetros:
+    - path: ruta del JSON (por defecto AVANCES_PATH)
+
+    Salida:
+    - (datos, versión): dict corte -> lista de avances (copia que se puede
+      modificar) y la versión del documento leído
+    """
+    data, version = _read(path or AVANCES_PATH)
+    return copy.deepcopy(data), version
+
+
+@contextmanager
+def _file_lock(path):
+    """Candado exclusivo entre procesos sobre ``path + '.lock'``."""
+    with open(f"{path}.lock", "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def write_avances(avances_data, expected_version=None, path=None):
+    """
+    Guarda los avances de forma atómica.
+
+    Parámetros:
+    - avances_data: dict corte -> lista de avances
+    - expected_version: versión sobre la que se hizo la edición (la que
+      devolvió read_avances); None = sobrescribir sin comprobar
+    - path: ruta del JSON (por defecto AVANCES_PATH)
+
+    Salida:
+    - versión del documento guardado
+
+    Lanza AvancesConflictError si el archivo cambió desde expected_version.
+    """
+    path = path or AVANCES_PATH
+    raw = json.dumps(avances_data, ensure_ascii=False, indent=2).encode("utf-8")
+
+    with _write_lock, _file_lock(path):
+        current, version = _read(path)
+        if expected_version is not None and version != expected_version:
+            raise AvancesConflictError(copy.deepcopy(current), version)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(raw)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        # La versión sale de los bytes escritos, todavía con el candado: si
+        # se releyera el archivo después, podría ser la de otro escritor
+        version = _version(raw)
+        stat = os.stat(path)
+        with _cache_lock:
+            _cache[path] = (stat.st_mtime_ns, stat.st_size, json.loads(raw.decode("utf-8")), version)
+
+    return version
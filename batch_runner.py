@@ -0,0 +1,246 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+import scenario_store
+from models import (
+    CLIMATE_SCENARIO_STRENGTH,
+    calculate_biodiversity_impact,
+    calculate_economic_impact,
+    create_ecosystem_simulation
+)
+
+# Corridas masivas de escenarios sin la interfaz de Streamlit.
+#
+# La especificación es un JSON con los valores de cada parámetro; se corre el
+# producto cartesiano. Cada valor puede ser una lista o un rango
+# {"start": ..., "stop": ..., "step": ...} (stop incluido):
+#
+#     {
+#         "frailejon": {"start": 10, "stop": 100, "step": 5},
+#         "resilience": [0.2, 0.4, 0.6, 0.8, 1.0],
+#         "climate": ["Estable", "Calentamiento moderado", "Calentamiento severo"],
+#         "region": ["Todos los páramos", "Páramo de Sumapaz"],
+#         "years": [10, 20, 40]
+#     }
+#
+# Uso:
+#     python batch_runner.py escenarios.json --output resultados/ --workers 8
+#
+# Los escenarios se reparten por bloques entre procesos. Cada bloque
+# terminado se escribe de inmediato en la carpeta de salida y se anota en
+# progress.jsonl; si la corrida se interrumpe, volver a lanzar el mismo
+# comando continúa con los bloques pendientes.
+
+PARAMETERS = ("frailejon", "resilience", "climate", "region", "years")
+
+DEFAULTS = {
+    "resilience": [0.6],
+    "climate": ["Estable"],
+    "region": ["Todos los páramos"],
+    "years": [15]
+}
+
+DEFAULT_CHUNK_SIZE = 32
+
+
+def _expand(value):
+    if isinstance(value, dict):
+        start, stop, step = value["start"], value["stop"], value.get("step", 1)
+        return [float(v) if isinstance(step, float) else int(v)
+                for v in np.arange(start, stop + step / 2.0, step)]
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def load_spec(path):
+    """Lee la especificación JSON y la normaliza (dict parámetro -> lista de valores)."""
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    unknown = set(raw) - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Parámetros desconocidos en la especificación: {sorted(unknown)}")
+    if "frailejon" not in raw:
+        raise ValueError("La especificación debe incluir 'frailejon'")
+    spec = {name: _expand(raw.get(name, DEFAULTS.get(name))) for name in PARAMETERS}
+    for climate in spec["climate"]:
+        if climate not in CLIMATE_SCENARIO_STRENGTH:
+            raise ValueError(f"Escenario climático desconocido: {climate}")
+    return spec
+
+
+def spec_hash(spec):
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def scenario_grid(spec):
+    """Producto cartesiano de la especificación, en un orden fijo (lista de dicts)."""
+    return [dict(zip(PARAMETERS, values)) for values in itertools.product(*(spec[name] for name in PARAMETERS))]
+
+
+def run_scenario(params):
+    """
+    Corre un escenario con los modelos de models.py.
+
+    Salida:
+    - (resumen, serie): dict con los parámetros, los valores finales de la
+      simulación, el índice de biodiversidad y las pérdidas económicas; y el
+      DataFrame de create_ecosystem_simulation
+    """
+    series = create_ecosystem_simulation(
+        params["frailejon"], params["years"], params["resilience"],
+        climate_strength=CLIMATE_SCENARIO_STRENGTH[params["climate"]]
+    )
+    summary = dict(params)
+    final = series.iloc[-1]
+    for column in series.columns.drop("time"):
+        summary[f"final_{column}"] = float(final[column])
+    summary["biodiversity_index"] = float(calculate_biodiversity_impact(params["frailejon"], params["resilience"]))
+    economic = calculate_economic_impact(params["frailejon"], params["region"])
+    for service, loss in economic.items():
+        summary[f"loss_{service}"] = float(loss)
+    summary["loss_total"] = float(sum(economic.values()))
+    return summary, series
+
+
+def _run_chunk(chunk_index, first_index, scenarios, keep_series):
+    summaries = []
+    runs = []
+    for offset, params in enumerate(scenarios):
+        summary, series = run_scenario(params)
+        summary["scenario_index"] = first_index + offset
+        summaries.append(summary)
+        if keep_series:
+            runs.append((params, series))
+    return chunk_index, summaries, runs
+
+
+def _read_progress(progress_path, digest):
+    """Bloques ya terminados según progress.jsonl (ignora una última línea truncada)."""
+    done = set()
+    if not os.path.exists(progress_path):
+        return done
+    with open(progress_path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    for number, line in enumerate(lines):
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if number == 0:
+            if record.get("spec_hash") != digest:
+                raise ValueError("La carpeta de salida pertenece a otra especificación o tamaño de bloque")
+            continue
+        done.add(int(record["chunk"]))
+    return done
+
+
+def _append_progress(progress_path, record):
+    with open(progress_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _write_chunk(output_dir, digest, chunk_index, summaries, runs):
+    # Resumen del bloque: archivo propio, escrito de forma atómica
+    summary_dir = os.path.join(output_dir, "summary")
+    os.makedirs(summary_dir, exist_ok=True)
+    name = f"chunk-{chunk_index:06d}.parquet"
+    # El temporal empieza con punto para que las lecturas de la carpeta lo ignoren
+    tmp_path = os.path.join(summary_dir, f".{name}.tmp")
+    pd.DataFrame(summaries).to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, os.path.join(summary_dir, name))
+
+    if runs:
+        # Nombres de archivo e ids fijos por bloque: repetir el bloque al
+        # reanudar reemplaza sus archivos en vez de duplicar corridas
+        run_ids = [f"{digest}-{summary['scenario_index']:08d}" for summary in summaries]
+        scenario_store.write_runs(runs, root=os.path.join(output_dir, "escenarios"), run_ids=run_ids,
+                                  basename=f"chunk-{chunk_index:06d}")
+
+
+def run_batch(spec, output_dir, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, keep_series=True, log=print):
+    """
+    Corre todos los escenarios de la especificación en procesos paralelos.
+
+    Parámetros:
+    - spec: dict parámetro -> lista de valores (ver load_spec)
+    - output_dir: carpeta de salida (summary/*.parquet, escenarios/ y
+      progress.jsonl)
+    - workers: procesos (None = todos los núcleos)
+    - chunk_size: escenarios por tarea enviada a un proceso
+    - keep_series: guardar también las series de cada escenario
+    - log: función para los mensajes de avance (None = silencio)
+
+    Salida:
+    - número de escenarios corridos en esta llamada
+    """
+    scenarios = scenario_grid(spec)
+    digest = spec_hash({"spec": spec, "chunk_size": chunk_size})
+    os.makedirs(output_dir, exist_ok=True)
+    progress_path = os.path.join(output_dir, "progress.jsonl")
+
+    done = _read_progress(progress_path, digest)
+    if not os.path.exists(progress_path):
+        _append_progress(progress_path, {"spec_hash": digest, "spec": spec, "chunk_size": chunk_size,
+                                         "scenarios": len(scenarios)})
+
+    chunks = [(index, start, scenarios[start:start + chunk_size])
+              for index, start in enumerate(range(0, len(scenarios), chunk_size))]
+    pending = [chunk for chunk in chunks if chunk[0] not in done]
+    if log:
+        log(f"{len(scenarios)} escenarios en {len(chunks)} bloques; {len(pending)} pendientes")
+
+    workers = workers or os.cpu_count() or 1
+    completed = 0
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Se mantienen pocas tareas en vuelo para no acumular resultados en memoria
+        queue = iter(pending)
+        in_flight = set()
+        while True:
+            while len(in_flight) < 2 * workers:
+                chunk = next(queue, None)
+                if chunk is None:
+                    break
+                in_flight.add(pool.submit(_run_chunk, *chunk, keep_series))
+            if not in_flight:
+                break
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                chunk_index, summaries, runs = future.result()
+                _write_chunk(output_dir, digest, chunk_index, summaries, runs)
+                _append_progress(progress_path, {"chunk": chunk_index})
+                completed += len(summaries)
+                if log:
+                    elapsed = time.perf_counter() - start_time
+                    log(f"bloque {chunk_index} listo ({completed} escenarios, {completed / elapsed:.1f}/s)")
+    return completed
+
+
+def load_summary(output_dir):
+    """Une los resúmenes de todos los bloques terminados en un DataFrame."""
+    summary_dir = os.path.join(output_dir, "summary")
+    return pd.read_parquet(summary_dir).sort_values("scenario_index").reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Corre una rejilla de escenarios del simulador sin la interfaz.")
+    parser.add_argument("spec", help="archivo JSON con los valores de cada parámetro")
+    parser.add_argument("--output", required=True, help="carpeta de salida (se reanuda si ya existe)")
+    parser.add_argument("--workers", type=int, default=None, help="procesos (por defecto, todos los núcleos)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="escenarios por tarea")
+    parser.add_argument("--summary-only", action="store_true", help="no guardar las series de cada escenario")
+    args = parser.parse_args()
+
+    run_batch(load_spec(args.spec), args.output, workers=args.workers, chunk_size=args.chunk_size,
+              keep_series=not args.summary_only)
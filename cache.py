@@ -0,0 +1,194 @@
+import copy
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from cachetools import TTLCache
+
+import data.regions as _regions
+import data_module as _data_module
+import models as _models
+import visualizations as _visualizations
+
+# Caché compartida por todo el proceso del servidor para los cálculos puros de
+# datos, modelos y figuras. Streamlit vuelve a ejecutar las páginas en cada
+# interacción, pero los módulos importados viven mientras vive el proceso, así
+# que estas cachés son comunes a todas las sesiones. Las páginas importan las
+# versiones envueltas de este módulo en lugar de las originales.
+#
+# Las figuras y mapas en caché se comparten entre sesiones: son de solo lectura.
+#
+# Además, las llamadas idénticas concurrentes se agrupan (single-flight): si
+# varias sesiones piden la misma clave mientras se calcula, solo la primera
+# calcula y las demás esperan su resultado, en vez de repetir el trabajo.
+
+# Segundos que una llamada espera un cálculo idéntico en curso antes de
+# calcular por su cuenta
+DEFAULT_WAIT_TIMEOUT = 120
+
+# Registro de todas las funciones con caché (nombre -> CachedFunction)
+_registry = {}
+
+_MISSING = object()
+
+
+class CachedFunction:
+    """
+    Envoltorio de una función pura con caché TTL + tamaño máximo.
+
+    Parámetros:
+    - func: función a envolver (argumentos hashables)
+    - ttl: segundos que una entrada sigue siendo válida
+    - maxsize: número máximo de entradas (se descartan las menos recientes)
+    - copy_result: devolver una copia profunda para resultados mutables
+      que las páginas modifican (listas de dicts, DataFrames)
+    - wait_timeout: segundos que se espera un cálculo idéntico en curso
+      (None = sin límite)
+    """
+
+    def __init__(self, func, ttl, maxsize, copy_result=False, name=None, wait_timeout=DEFAULT_WAIT_TIMEOUT):
+        self.func = func
+        self.name = name or f"{func.__module__}.{func.__name__}"
+        self.copy_result = copy_result
+        self.wait_timeout = wait_timeout
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl, timer=time.monotonic)
+        # Entradas precalculadas fijadas: no vencen por TTL ni por tamaño
+        self._pinned = {}
+        self._lock = threading.Lock()
+        # Cálculos en curso por clave (clave -> Future)
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.__doc__ = func.__doc__
+        self.__name__ = func.__name__
+        _registry[self.name] = self
+
+    def key(self, *args, **kwargs):
+        """Clave de caché para unos argumentos dados."""
+        return (args, tuple(sorted(kwargs.items())))
+
+    def _output(self, value):
+        return copy.deepcopy(value) if self.copy_result else value
+
+    def get(self, key, default=None):
+        """Valor en caché para una clave (sin calcular); ``default`` si no está."""
+        with self._lock:
+            value = self._lookup(key)
+        return default if value is _MISSING else self._output(value)
+
+    def _lookup(self, key):
+        # Se llama con self._lock tomado
+        value = self._cache.get(key, _MISSING)
+        return self._pinned.get(key, _MISSING) if value is _MISSING else value
+
+    def contains(self, *args, **kwargs):
+        key = self.key(*args, **kwargs)
+        with self._lock:
+            return key in self._cache or key in self._pinned
+
+    def put(self, key, value, pin=False):
+        """
+        Guarda un valor calculado fuera de la llamada normal (precálculo).
+        Con ``pin=True`` la entrada no vence: queda hasta clear().
+        """
+        with self._lock:
+            if pin:
+                self._pinned[key] = value
+            else:
+                self._cache[key] = value
+
+    def __call__(self, *args, **kwargs):
+        key = self.key(*args, **kwargs)
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return self._output(value)
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            try:
+                return self._output(future.result(timeout=self.wait_timeout))
+            except FutureTimeoutError:
+                # El cálculo en curso tarda demasiado: se calcula aparte
+                # (sin registrarlo como en curso para no desplazar al primero)
+                value = self.func(*args, **kwargs)
+                with self._lock:
+                    self.misses += 1
+                    self._cache[key] = value
+                return self._output(value)
+
+        try:
+            value = self.func(*args, **kwargs)
+        except BaseException as exc:
+            # Los que esperaban reciben la misma excepción; no se guarda en caché
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(exc)
+            raise
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = value
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return self._output(value)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._pinned.clear()
+
+    def info(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._inflight),
+                "size": len(self._cache),
+                "pinned": len(self._pinned),
+                "maxsize": self._cache.maxsize,
+                "ttl": self._cache.ttl,
+            }
+
+
+def cached(ttl=600, maxsize=128, copy_result=False, name=None, wait_timeout=DEFAULT_WAIT_TIMEOUT):
+    """Decorador que convierte una función pura en una CachedFunction registrada."""
+    def decorator(func):
+        return CachedFunction(func, ttl, maxsize, copy_result=copy_result, name=name, wait_timeout=wait_timeout)
+    return decorator
+
+
+def clear_cache(name=None):
+    """Vacía la caché de una función (por nombre) o todas si name es None."""
+    targets = [_registry[name]] if name is not None else list(_registry.values())
+    for cached_function in targets:
+        cached_function.clear()
+
+
+def cache_info():
+    """Estadísticas de uso de todas las cachés registradas."""
+    return [cached_function.info() for cached_function in _registry.values()]
+
+
+# ==== Datos ====
+get_frailejon_regions = cached(ttl=3600, maxsize=1, copy_result=True)(_regions.get_frailejon_regions)
+get_initial_data = cached(ttl=3600, maxsize=1, copy_result=True)(_data_module.get_initial_data)
+
+# ==== Modelos ====
+create_ecosystem_simulation = cached(ttl=1800, maxsize=512, copy_result=True)(_models.create_ecosystem_simulation)
+
+# ==== Figuras y mapas (solo lectura) ====
+plot_frailejon_crop_relationship = cached(ttl=1800, maxsize=128)(_visualizations.plot_frailejon_crop_relationship)
+plot_frailejon_crop_relationship_3d = cached(ttl=1800, maxsize=128)(_visualizations.plot_frailejon_crop_relationship_3d)
+plot_biodiversity_impact = cached(ttl=1800, maxsize=128)(_visualizations.plot_biodiversity_impact)
+plot_biodiversity_impact_3d = cached(ttl=1800, maxsize=128)(_visualizations.plot_biodiversity_impact_3d)
+create_risk_map = cached(ttl=1800, maxsize=64)(_visualizations.create_risk_map)
@@ -0,0 +1,209 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+# Archivo GeoJSON local con los límites de los complejos de páramo.
+# Cada Feature debe tener la propiedad "name" con el mismo nombre usado en
+# data/regions.py (p. ej. "Páramo de Sumapaz").
+GEOJSON_PATH = os.path.join(os.path.dirname(__file__), "paramos.geojson")
+
+# Tolerancias de Douglas–Peucker (grados) precalculadas para cada polígono.
+# El nivel 0.0 es la geometría original.
+SIMPLIFICATION_TOLERANCES = (0.0, 0.0005, 0.002, 0.008, 0.03)
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def douglas_peucker(coords, tolerance):
+    """
+    Simplifica una polilínea con el algoritmo de Douglas–Peucker.
+
+    Parámetros:
+    - coords: arreglo (n, 2) de coordenadas [lon, lat]
+    - tolerance: distancia máxima (grados) permitida entre la línea original
+      y la simplificada
+
+    Salida:
+    - np.ndarray (m, 2) con m <= n, conservando los extremos
+    """
+    coords = np.asarray(coords, dtype=float)
+    n = len(coords)
+    if tolerance <= 0 or n < 3:
+        return coords
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    # Pila explícita para no depender de la recursión en anillos largos
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        a = coords[start]
+        b = coords[end]
+        segment = coords[start + 1:end]
+        ab = b - a
+        norm = np.hypot(ab[0], ab[1])
+        if norm == 0.0:
+            distances = np.hypot(segment[:, 0] - a[0], segment[:, 1] - a[1])
+        else:
+            # Distancia perpendicular de cada punto a la recta a-b
+            distances = np.abs(ab[0] * (segment[:, 1] - a[1]) - ab[1] * (segment[:, 0] - a[0])) / norm
+
+        idx = int(np.argmax(distances))
+        if distances[idx] > tolerance:
+            split = start + 1 + idx
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    return coords[keep]
+
+
+def simplify_ring(ring, tolerance):
+    """
+    Simplifica un anillo cerrado de un polígono manteniéndolo válido
+    (cerrado y con al menos 4 vértices). Si la simplificación lo degenera,
+    se devuelve el anillo original.
+    """
+    ring = np.asarray(ring, dtype=float)
+    if tolerance <= 0 or len(ring) <= 4:
+        return ring
+
+    simplified = douglas_peucker(ring, tolerance)
+    if len(simplified) < 4:
+        return ring
+    if not np.array_equal(simplified[0], simplified[-1]):
+        simplified = np.vstack([simplified, simplified[:1]])
+    return simplified
+
+
+def _polygons_from_geometry(geometry):
+    """Normaliza Polygon/MultiPolygon a una lista de polígonos (listas de anillos)."""
+    if geometry is None:
+        return []
+    geom_type = geometry.get("type")
+    if geom_type == "Polygon":
+        return [geometry["coordinates"]]
+    if geom_type == "MultiPolygon":
+        return list(geometry["coordinates"])
+    return []
+
+
+def _simplify_polygons(polygons, tolerance):
+    simplified = []
+    for polygon in polygons:
+        rings = [simplify_ring(ring, tolerance) for ring in polygon]
+        simplified.append([np.round(ring, 6).tolist() for ring in rings])
+    return simplified
+
+
+def _as_geometry(polygons):
+    if len(polygons) == 1:
+        return {"type": "Polygon", "coordinates": polygons[0]}
+    return {"type": "MultiPolygon", "coordinates": polygons}
+
+
+def _read_boundaries(path):
+    with open(path, "r", encoding="utf-8") as f:
+        collection = json.load(f)
+
+    boundaries = {}
+    for feature in collection.get("features", []):
+        properties = feature.get("properties") or {}
+        name = properties.get("name") or properties.get("nombre") or properties.get("NOMBRE")
+        polygons = _polygons_from_geometry(feature.get("geometry"))
+        if not name or not polygons:
+            continue
+
+        # Precalcular todos los niveles de simplificación una sola vez
+        levels = {
+            tolerance: _as_geometry(_simplify_polygons(polygons, tolerance))
+            for tolerance in SIMPLIFICATION_TOLERANCES
+        }
+        boundaries[name] = {
+            "properties": properties,
+            "levels": levels,
+        }
+    return boundaries
+
+
+def load_paramo_boundaries(path=None):
+    """
+    Carga los límites de los páramos desde un GeoJSON local con todos los
+    niveles de simplificación precalculados.
+
+    El resultado se guarda en caché por ruta y fecha de modificación del
+    archivo, de modo que solo se vuelve a procesar si el GeoJSON cambia.
+
+    Salida:
+    - dict nombre -> {"properties": dict, "levels": {tolerancia: geometría}}
+      (vacío si el archivo no existe)
+    """
+    path = path or GEOJSON_PATH
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+    boundaries = _read_boundaries(path)
+    with _cache_lock:
+        _cache[path] = (mtime, boundaries)
+    return boundaries
+
+
+def clear_boundaries_cache():
+    """Elimina las geometrías simplificadas guardadas en memoria."""
+    with _cache_lock:
+        _cache.clear()
+
+
+def tolerance_for_zoom(zoom):
+    """
+    Devuelve la tolerancia precalculada adecuada para un nivel de zoom web
+    (Leaflet/Folium). Se elige la mayor tolerancia que no supere el tamaño
+    aproximado de un píxel en grados, así la simplificación no es visible.
+    """
+    pixel_size = 360.0 / (256.0 * 2 ** max(0.0, float(zoom)))
+    candidates = [t for t in SIMPLIFICATION_TOLERANCES if t <= pixel_size]
+    return max(candidates) if candidates else 0.0
+
+
+def get_boundaries_geojson(zoom, names=None, path=None):
+    """
+    Construye un FeatureCollection con las geometrías simplificadas al nivel
+    que corresponde al zoom.
+
+    Parámetros:
+    - zoom: nivel de zoom actual del mapa
+    - names: nombres de páramos a incluir (None = todos)
+    - path: ruta alternativa del GeoJSON
+
+    Salida:
+    - dict GeoJSON (FeatureCollection); vacío si no hay límites disponibles
+    """
+    boundaries = load_paramo_boundaries(path)
+    tolerance = tolerance_for_zoom(zoom)
+    wanted = None if names is None else set(names)
+
+    features = []
+    for name, entry in boundaries.items():
+        if wanted is not None and name not in wanted:
+            continue
+        features.append({
+            "type": "Feature",
+            "properties": {"name": name},
+            "geometry": entry["levels"][tolerance],
+        })
+
+    return {"type": "FeatureCollection", "features": features}
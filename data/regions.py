@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+from data.zonal_stats import apply_cover_raster
 
 def get_frailejon_regions():
 
@@ -239,7 +240,8 @@ def get_frailejon_regions():
             "type_frailejones": "Espeletia totensis – Crece cerca de humedales y lagunas altoandinas."
         }
     ]
-    return paramos
+    # Si hay un ráster local de cobertura, la densidad sale de sus estadísticas zonales
+    return apply_cover_raster(paramos)
 
 def get_regional_multipliers():
     paramos = get_frailejon_regions()
@@ -0,0 +1,256 @@
+import glob
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Observaciones crudas (CSV por parcela/fecha) y almacén compacto por páramo
+OBSERVATIONS_DIR = os.path.join(os.path.dirname(__file__), "observaciones")
+TIMESERIES_PATH = os.path.join(os.path.dirname(__file__), "cover_timeseries.npz")
+
+# Filas leídas por bloque de cada archivo de observaciones
+DEFAULT_CHUNKSIZE = 200_000
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _chunk_years(chunk, year_col, date_col):
+    if year_col in chunk.columns:
+        return pd.to_numeric(chunk[year_col], errors="coerce")
+    if date_col in chunk.columns:
+        return pd.to_datetime(chunk[date_col], errors="coerce").dt.year
+    raise ValueError(f"Las observaciones necesitan una columna '{year_col}' o '{date_col}'")
+
+
+def ingest_cover_observations(paths=None, store_path=None, site_col="paramo", value_col="cover",
+                              year_col="year", date_col="date", chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Lee observaciones de cobertura de frailejones (anuales o mensuales, por
+    parcela) en bloques y las agrega en una serie anual por páramo.
+
+    Cada archivo se recorre con ``pd.read_csv(chunksize=...)`` y solo se
+    mantienen en memoria las sumas y conteos por (páramo, año), así que el
+    volumen de observaciones no limita la ingestión.
+
+    Parámetros:
+    - paths: lista de CSV (por defecto data/observaciones/*.csv)
+    - store_path: archivo .npz de salida (por defecto data/cover_timeseries.npz)
+    - site_col, value_col: columnas con el páramo y la cobertura (%)
+    - year_col / date_col: columna de año o de fecha (se usa la primera presente)
+
+    Salida:
+    - dict del almacén (ver load_cover_timeseries)
+    """
+    if paths is None:
+        paths = sorted(glob.glob(os.path.join(OBSERVATIONS_DIR, "*.csv")))
+    store_path = store_path or TIMESERIES_PATH
+    if not paths:
+        raise FileNotFoundError("No hay archivos de observaciones para ingerir")
+
+    sums = None
+    counts = None
+    for path in paths:
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            years = _chunk_years(chunk, year_col, date_col)
+            values = pd.to_numeric(chunk[value_col], errors="coerce")
+            frame = pd.DataFrame({"site": chunk[site_col], "year": years, "value": values}).dropna()
+            if frame.empty:
+                continue
+            frame["year"] = frame["year"].astype(np.int32)
+
+            grouped = frame.groupby(["site", "year"])["value"]
+            chunk_sums = grouped.sum()
+            chunk_counts = grouped.count()
+            if sums is None:
+                sums, counts = chunk_sums, chunk_counts
+            else:
+                sums = sums.add(chunk_sums, fill_value=0.0)
+                counts = counts.add(chunk_counts, fill_value=0)
+
+    if sums is None:
+        raise ValueError("Los archivos de observaciones no tienen filas válidas")
+
+    means = (sums / counts).unstack("year")
+    counts = counts.unstack("year").reindex_like(means)
+
+    # Índice de años continuo: los años sin datos quedan como NaN
+    years = np.arange(int(means.columns.min()), int(means.columns.max()) + 1, dtype=np.int16)
+    means = means.reindex(columns=years)
+    counts = counts.reindex(columns=years).fillna(0)
+
+    store = {
+        "sites": np.array(means.index.astype(str).tolist(), dtype=str),
+        "years": years,
+        "mean": means.to_numpy(dtype=np.float32),
+        "count": counts.to_numpy(dtype=np.int32),
+    }
+    save_cover_timeseries(store, store_path)
+    return store
+
+
+def save_cover_timeseries(store, store_path=None):
+    """Escribe el almacén en un .npz de forma atómica (archivo temporal + rename)."""
+    store_path = store_path or TIMESERIES_PATH
+    tmp_path = store_path + ".tmp.npz"
+    np.savez(tmp_path, **store)
+    os.replace(tmp_path, store_path)
+
+
+def load_cover_timeseries(store_path=None):
+    """
+    Carga el almacén de series de cobertura, con caché por fecha de
+    modificación del archivo.
+
+    Salida:
+    - dict con 'sites' (n), 'years' (t), 'mean' (n, t; NaN sin datos) y
+      'count' (n, t); None si el almacén no existe
+    """
+    store_path = store_path or TIMESERIES_PATH
+    try:
+        mtime = os.path.getmtime(store_path)
+    except OSError:
+        return None
+
+    with _cache_lock:
+        cached = _cache.get(store_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+    with np.load(store_path) as npz:
+        store = {key: npz[key] for key in ("sites", "years", "mean", "count")}
+
+    with _cache_lock:
+        _cache[store_path] = (mtime, store)
+    return store
+
+
+def get_site_series(name, store_path=None):
+    """
+    Serie anual de cobertura de un páramo.
+
+    Salida:
+    - pd.DataFrame con columnas year, frailejon_cover_percentage (solo años
+      con observaciones); None si el páramo no está en el almacén
+    """
+    store = load_cover_timeseries(store_path)
+    if store is None:
+        return None
+    idx = np.flatnonzero(store["sites"] == name)
+    if idx.size == 0:
+        return None
+
+    values = store["mean"][idx[0]]
+    observed = ~np.isnan(values)
+    return pd.DataFrame({
+        "year": store["years"][observed].astype(int),
+        "frailejon_cover_percentage": values[observed].astype(float)
+    })
+
+
+def get_sites_long(store_path=None):
+    """Todas las series en formato largo: paramo, year, frailejon_cover_percentage, n_obs."""
+    store = load_cover_timeseries(store_path)
+    if store is None:
+        return None
+    n_sites, n_years = store["mean"].shape
+    df = pd.DataFrame({
+        "paramo": np.repeat(store["sites"], n_years),
+        "year": np.tile(store["years"].astype(int), n_sites),
+        "frailejon_cover_percentage": store["mean"].ravel().astype(float),
+        "n_obs": store["count"].ravel()
+    })
+    return df.dropna(subset=["frailejon_cover_percentage"]).reset_index(drop=True)
+
+
+def get_national_series(weights=None, store_path=None):
+    """
+    Serie nacional: promedio ponderado por año de las series de los páramos.
+
+    Parámetros:
+    - weights: dict páramo -> peso (p. ej. área); por defecto pesos iguales
+    """
+    store = load_cover_timeseries(store_path)
+    if store is None:
+        return None
+
+    w = np.array([weights.get(s, 0.0) if weights else 1.0 for s in store["sites"]], dtype=float)
+    values = store["mean"].astype(float)
+    observed = ~np.isnan(values)
+    w_matrix = np.where(observed, w[:, None], 0.0)
+    total = w_matrix.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        national = np.nansum(values * w_matrix, axis=0) / total
+
+    keep = total > 0
+    return pd.DataFrame({
+        "year": store["years"][keep].astype(int),
+        "frailejon_cover_percentage": national[keep]
+    })
+
+
+def site_trends(store_path=None):
+    """
+    Tendencia lineal (puntos porcentuales por año) de la cobertura de cada
+    páramo, ajustada por mínimos cuadrados sobre los años observados. Sirve
+    para calibrar las tasas de los modelos de proyección.
+
+    Salida:
+    - dict páramo -> pendiente (%/año); solo páramos con al menos 2 años
+    """
+    store = load_cover_timeseries(store_path)
+    if store is None:
+        return {}
+
+    years = store["years"].astype(float)
+    values = store["mean"].astype(float)
+    observed = ~np.isnan(values)
+    n = observed.sum(axis=1)
+
+    # Mínimos cuadrados vectorizados por fila ignorando NaN
+    x = np.where(observed, years[None, :], 0.0)
+    y = np.where(observed, values, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = x.sum(axis=1) / n
+        y_mean = y.sum(axis=1) / n
+        dx = np.where(observed, years[None, :] - x_mean[:, None], 0.0)
+        slope = (dx * (y - y_mean[:, None] * observed)).sum(axis=1) / (dx ** 2).sum(axis=1)
+
+    return {
+        str(site): float(s)
+        for site, s, count in zip(store["sites"], slope, n)
+        if count >= 2 and np.isfinite(s)
+    }
+
+
+def historical_cover_data(weights=None):
+    """
+    Datos históricos de cobertura para las vistas de la aplicación: la serie
+    nacional del almacén si existe, o la serie sintética de referencia
+    (pérdida del 0.5% anual desde 1990, mínimo 60%).
+    """
+    national = get_national_series(weights)
+    if national is not None and not national.empty:
+        return national
+
+    years = np.arange(1990, 2025)
+    historical_cover = 100 - (0.5 * (years - 1990))  # pérdida del 0.5% anual
+    historical_cover = np.maximum(historical_cover, 60)  # mínimo del 60%
+    return pd.DataFrame({
+        'year': years,
+        'frailejon_cover_percentage': historical_cover
+    })
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingerir observaciones de cobertura de frailejones")
+    parser.add_argument("paths", nargs="*", help="CSV de observaciones (por defecto data/observaciones/*.csv)")
+    parser.add_argument("--out", default=TIMESERIES_PATH, help="Almacén .npz de salida")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    result = ingest_cover_observations(args.paths or None, args.out, chunksize=args.chunksize)
+    print(f"{len(result['sites'])} páramos, años {result['years'][0]}-{result['years'][-1]} -> {args.out}")
@@ -0,0 +1,324 @@
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+from data.boundaries import load_paramo_boundaries, SIMPLIFICATION_TOLERANCES
+
+# Ráster de cobertura de frailejones por defecto (porcentaje 0-100 por píxel).
+# Puede ser un arreglo (filas, columnas) o una pila (bandas, filas, columnas).
+COVER_RASTER_PATH = os.path.join(os.path.dirname(__file__), "frailejon_cover.npy")
+
+# Filas del ráster procesadas por bloque: acota la memoria usada
+DEFAULT_CHUNK_ROWS = 1024
+
+# Celdas (filas x aristas) de los temporales del barrido por bloque: con
+# polígonos muy detallados el bloque tiene menos filas
+FILL_CHUNK_CELLS = 4_000_000
+
+# Resolución del histograma usado para los percentiles
+HISTOGRAM_BINS = 1000
+
+_stats_cache = {}
+_stats_lock = threading.Lock()
+
+
+def read_raster_metadata(raster_path):
+    """
+    Lee el archivo lateral ``<raster>.json`` con la georreferenciación.
+
+    Formato esperado:
+    - transform: [x0, dx, 0, y0, 0, dy] (estilo GDAL; x0/y0 = esquina
+      superior izquierda en lon/lat, dy negativo)
+    - nodata: valor a ignorar (opcional)
+    - value_range: [mín, máx] de los valores (opcional, por defecto [0, 100])
+    """
+    meta_path = os.path.splitext(raster_path)[0] + ".json"
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if len(meta.get("transform", [])) != 6:
+        raise ValueError(f"{meta_path}: 'transform' debe tener 6 elementos")
+    return meta
+
+
+def open_raster(raster_path, band=-1):
+    """
+    Abre un ráster ``.npy`` como memoria mapeada (no se carga en RAM).
+
+    Si es una pila (bandas, filas, columnas) se devuelve la vista de la
+    banda indicada (por defecto la última).
+    """
+    raster = np.load(raster_path, mmap_mode="r")
+    if raster.ndim == 3:
+        raster = raster[band]
+    elif raster.ndim != 2:
+        raise ValueError("El ráster debe tener 2 o 3 dimensiones")
+    return raster
+
+
+def _paramo_rings(paramo, boundaries, tolerance):
+    """
+    Anillos (lon, lat) de un páramo. Si no hay polígono en el GeoJSON se usa
+    un círculo de área equivalente centrado en sus coordenadas.
+    """
+    entry = boundaries.get(paramo["name"])
+    if entry is not None:
+        geometry = entry["levels"][tolerance]
+        polygons = geometry["coordinates"] if geometry["type"] == "MultiPolygon" else [geometry["coordinates"]]
+        return [np.asarray(ring, dtype=float) for polygon in polygons for ring in polygon]
+
+    radius_km = math.sqrt(max(paramo.get("area", 0), 0) / math.pi)
+    if radius_km == 0:
+        return []
+    angles = np.linspace(0.0, 2.0 * np.pi, 65)
+    dlat = radius_km / 111.32
+    dlon = dlat / max(0.01, math.cos(math.radians(paramo["lat"])))
+    ring = np.column_stack([paramo["lon"] + dlon * np.cos(angles), paramo["lat"] + dlat * np.sin(angles)])
+    return [ring]
+
+
+def _fill_rings(labels, rings, zone_id, transform):
+    """
+    Rasteriza un conjunto de anillos por barrido de líneas (regla par-impar),
+    marcando con ``zone_id`` los píxeles cuyo centro cae dentro. Cada bloque
+    de filas usa solo las aristas que alcanzan su franja, y su tamaño se
+    ajusta para que los temporales no pasen de FILL_CHUNK_CELLS celdas.
+    """
+    x0, dx, _, y0, _, dy = transform
+    n_rows, n_cols = labels.shape
+
+    edges = np.concatenate([np.column_stack([ring[:-1], ring[1:]]) for ring in rings if len(ring) > 1])
+    ex1, ey1, ex2, ey2 = edges.T
+
+    # Filas cubiertas por la caja envolvente del polígono
+    ys = np.concatenate([ey1, ey2])
+    rows = np.sort([(ys.min() - y0) / dy - 0.5, (ys.max() - y0) / dy - 0.5])
+    row_start = max(0, int(math.floor(rows[0])))
+    row_end = min(n_rows, int(math.ceil(rows[1])) + 1)
+
+    edge_low, edge_high = np.minimum(ey1, ey2), np.maximum(ey1, ey2)
+    chunk_rows = int(min(DEFAULT_CHUNK_ROWS, max(1, FILL_CHUNK_CELLS // len(edges))))
+
+    for start in range(row_start, row_end, chunk_rows):
+        stop = min(row_end, start + chunk_rows)
+        y = y0 + (np.arange(start, stop) + 0.5) * dy
+
+        # Aristas que alcanzan la franja de este bloque
+        near = (edge_high >= y.min()) & (edge_low <= y.max())
+        if not near.any():
+            continue
+        bx1, by1, bx2, by2 = ex1[near], ey1[near], ex2[near], ey2[near]
+
+        # Cruces de cada fila con cada arista (filas x aristas)
+        yy = y[:, None]
+        crosses = (by1 <= yy) != (by2 <= yy)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x = bx1 + (yy - by1) * (bx2 - bx1) / (by2 - by1)
+        x = np.where(crosses, x, np.inf)
+        x.sort(axis=1)
+        counts = crosses.sum(axis=1)
+
+        for i, count in enumerate(counts):
+            if count < 2:
+                continue
+            xs = x[i, :count - count % 2]
+            cols = np.ceil((xs - x0) / dx - 0.5).astype(np.int64)
+            cols = np.clip(cols, 0, n_cols)
+            row = labels[start + i]
+            for c_start, c_end in zip(cols[0::2], cols[1::2]):
+                if c_end > c_start:
+                    row[c_start:c_end] = zone_id
+
+
+def rasterize_zones(paramos, shape, transform, out_path=None, boundaries_path=None):
+    """
+    Rasteriza las zonas de los páramos sobre la grilla del ráster.
+
+    Parámetros:
+    - paramos: lista de páramos (get_frailejon_regions)
+    - shape: (filas, columnas) del ráster
+    - transform: georreferenciación estilo GDAL
+    - out_path: si se indica, las etiquetas se escriben en un ``.npy``
+      memoria-mapeado en disco en lugar de RAM
+    - boundaries_path: GeoJSON alternativo de límites
+
+    Salida:
+    - arreglo uint16 (filas, columnas): 0 = fuera de páramo, i + 1 = paramos[i]
+    """
+    if len(paramos) >= np.iinfo(np.uint16).max:
+        raise ValueError("Demasiadas zonas para etiquetas uint16")
+
+    if out_path is not None:
+        labels = np.lib.format.open_memmap(out_path, mode="w+", dtype=np.uint16, shape=tuple(shape))
+        labels[:] = 0
+    else:
+        labels = np.zeros(shape, dtype=np.uint16)
+
+    # La tolerancia de simplificación no debe superar el tamaño de un píxel
+    pixel_size = min(abs(transform[1]), abs(transform[5]))
+    tolerance = max(t for t in SIMPLIFICATION_TOLERANCES if t <= pixel_size)
+    boundaries = load_paramo_boundaries(boundaries_path)
+
+    for zone_id, paramo in enumerate(paramos, start=1):
+        rings = _paramo_rings(paramo, boundaries, tolerance)
+        if rings:
+            _fill_rings(labels, rings, zone_id, transform)
+
+    if out_path is not None:
+        labels.flush()
+    return labels
+
+
+def _sources_mtime(raster_path, boundaries_path=None):
+    """Fecha de modificación más reciente entre el ráster, su ``.json`` y el GeoJSON de límites."""
+    from data.boundaries import GEOJSON_PATH
+
+    sources = [raster_path, os.path.splitext(raster_path)[0] + ".json", boundaries_path or GEOJSON_PATH]
+    return max(os.path.getmtime(p) for p in sources if os.path.exists(p))
+
+
+def load_or_rasterize_zones(paramos, raster_path, shape, transform, boundaries_path=None):
+    """
+    Devuelve las etiquetas de zonas para un ráster, rasterizándolas solo la
+    primera vez. Se guardan en ``<raster>.zones.npy`` y se reutilizan
+    mientras sean más recientes que el ráster, su georreferenciación y el
+    GeoJSON de límites.
+    """
+    zones_path = os.path.splitext(raster_path)[0] + ".zones.npy"
+    newest_source = _sources_mtime(raster_path, boundaries_path)
+
+    if os.path.exists(zones_path) and os.path.getmtime(zones_path) >= newest_source:
+        zones = np.load(zones_path, mmap_mode="r")
+        if zones.shape == tuple(shape) and int(zones.max(initial=0)) <= len(paramos):
+            return zones
+
+    rasterize_zones(paramos, shape, transform, out_path=zones_path, boundaries_path=boundaries_path)
+    return np.load(zones_path, mmap_mode="r")
+
+
+def compute_zonal_stats(raster, zones, n_zones, percentiles=(50,), nodata=None,
+                        value_range=(0.0, 100.0), chunk_rows=DEFAULT_CHUNK_ROWS,
+                        bins=HISTOGRAM_BINS):
+    """
+    Calcula media, conteo y percentiles por zona recorriendo el ráster por
+    bloques de filas con reducciones tipo ``bincount``.
+
+    Los percentiles se obtienen de un histograma por zona, con precisión de
+    ``(máx - mín) / bins``.
+
+    Parámetros:
+    - raster, zones: arreglos 2D (pueden ser memoria mapeada) de igual forma
+    - n_zones: número de zonas (etiquetas 1..n_zones)
+    - percentiles: percentiles a calcular (0-100)
+    - nodata: valor del ráster a ignorar
+
+    Salida:
+    - dict con arreglos de longitud n_zones: 'count', 'mean' y 'p<q>' por
+      cada percentil q (NaN en zonas sin píxeles válidos)
+    """
+    if raster.shape != zones.shape:
+        raise ValueError("El ráster y las zonas deben tener la misma forma")
+
+    lo, hi = float(value_range[0]), float(value_range[1])
+    size = n_zones + 1
+    counts = np.zeros(size, dtype=np.int64)
+    sums = np.zeros(size, dtype=np.float64)
+    hist = np.zeros(size * bins, dtype=np.int64)
+
+    for start in range(0, raster.shape[0], chunk_rows):
+        values = np.asarray(raster[start:start + chunk_rows], dtype=np.float64).ravel()
+        labels = np.asarray(zones[start:start + chunk_rows]).ravel()
+
+        valid = (labels > 0) & np.isfinite(values)
+        if nodata is not None:
+            valid &= values != nodata
+        if not valid.any():
+            continue
+
+        values = values[valid]
+        labels = labels[valid].astype(np.int64)
+
+        counts += np.bincount(labels, minlength=size)
+        sums += np.bincount(labels, weights=values, minlength=size)
+
+        bin_idx = ((values - lo) / (hi - lo) * bins).astype(np.int64)
+        np.clip(bin_idx, 0, bins - 1, out=bin_idx)
+        hist += np.bincount(labels * bins + bin_idx, minlength=size * bins)
+
+    counts = counts[1:]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums[1:] / counts
+
+    stats = {"count": counts, "mean": means}
+
+    hist = hist.reshape(size, bins)[1:]
+    cumulative = np.cumsum(hist, axis=1)
+    bin_width = (hi - lo) / bins
+    for q in percentiles:
+        target = np.ceil(counts * (q / 100.0)).clip(min=1)
+        idx = (cumulative < target[:, None]).sum(axis=1)
+        value = lo + (np.minimum(idx, bins - 1) + 0.5) * bin_width
+        stats[f"p{q:g}"] = np.where(counts > 0, value, np.nan)
+
+    return stats
+
+
+def paramo_cover_stats(paramos, raster_path=None, band=-1, percentiles=(50,), boundaries_path=None):
+    """
+    Estadísticas zonales de cobertura de frailejones por páramo a partir de
+    un ráster ``.npy`` local. El resultado se guarda en caché por la fecha
+    de modificación más reciente entre el ráster, su ``.json`` y el GeoJSON
+    de límites.
+
+    Salida:
+    - dict nombre -> {'count', 'mean', 'p<q>'...}; vacío si no hay ráster
+    """
+    raster_path = raster_path or COVER_RASTER_PATH
+    if not os.path.exists(raster_path):
+        return {}
+
+    names = tuple(p["name"] for p in paramos)
+    key = (raster_path, band, tuple(percentiles), names)
+    mtime = _sources_mtime(raster_path, boundaries_path)
+    with _stats_lock:
+        cached = _stats_cache.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+    meta = read_raster_metadata(raster_path)
+    raster = open_raster(raster_path, band)
+    zones = load_or_rasterize_zones(paramos, raster_path, raster.shape, meta["transform"], boundaries_path)
+    stats = compute_zonal_stats(
+        raster, zones, len(paramos),
+        percentiles=percentiles,
+        nodata=meta.get("nodata"),
+        value_range=meta.get("value_range", (0.0, 100.0))
+    )
+
+    result = {}
+    for i, name in enumerate(names):
+        if stats["count"][i] > 0:
+            result[name] = {k: float(v[i]) for k, v in stats.items()}
+
+    with _stats_lock:
+        _stats_cache[key] = (mtime, result)
+    return result
+
+
+def apply_cover_raster(paramos, raster_path=None, statistic="mean"):
+    """
+    Sustituye ``frailejon_density`` de cada páramo por la estadística zonal
+    del ráster de cobertura (si existe). Los páramos sin píxeles en el
+    ráster conservan su valor original.
+    """
+    stats = paramo_cover_stats(paramos, raster_path)
+    if not stats:
+        return paramos
+
+    for p in paramos:
+        zone = stats.get(p["name"])
+        if zone is not None and np.isfinite(zone.get(statistic, np.nan)):
+            p["frailejon_density"] = round(zone[statistic], 1)
+    return paramos
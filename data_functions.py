@@ -3,6 +3,8 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import streamlit as st
+from data.regions import get_frailejon_regions
+from data.timeseries import historical_cover_data
 
 def get_initial_data():
     """
@@ -26,13 +28,8 @@ def get_initial_data():
         ]
     })
 
-    years = np.arange(1990, 2025)
-    historical_cover = 100 - (0.5 * (years - 1990))
-    historical_cover = np.maximum(historical_cover, 60)
-    historical_data = pd.DataFrame({
-        'year': years,
-        'frailejon_cover_percentage': historical_cover
-    })
+    area_weights = {p["name"]: p["area"] for p in get_frailejon_regions()}
+    historical_data = historical_cover_data(area_weights)
 
     ecosystems_data = pd.DataFrame({
         'paramo': [
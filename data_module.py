@@ -1,5 +1,7 @@
 import pandas as pd
 import numpy as np
+from data.regions import get_frailejon_regions
+from data.timeseries import historical_cover_data
 
 
 def get_initial_data():
@@ -35,15 +37,10 @@ def get_initial_data():
         ]
     })
 
-    # Datos históricos de cobertura de frailejones (porcentaje del óptimo)
-    years = np.arange(1990, 2025)
-    historical_cover = 100 - (0.5 * (years - 1990))  # pérdida del 0.5% anual
-    historical_cover = np.maximum(historical_cover, 60)  # mínimo del 60%
-
-    historical_data = pd.DataFrame({
-        'year': years,
-        'frailejon_cover_percentage': historical_cover
-    })
+    # Datos históricos de cobertura de frailejones (porcentaje del óptimo):
+    # series observadas por páramo si se ingirieron, o la serie sintética
+    area_weights = {p["name"]: p["area"] for p in get_frailejon_regions()}
+    historical_data = historical_cover_data(area_weights)
 
     # Tipos de páramos y sus características
     ecosystems_data = pd.DataFrame({
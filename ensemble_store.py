@@ -0,0 +1,209 @@
+import json
+import os
+
+import numpy as np
+
+from models import SIMULATION_COLUMNS, create_ecosystem_simulation_batch
+
+# Almacén en disco para ensambles más grandes que la memoria. Un ensamble
+# es una carpeta con:
+#
+#     header.json        metadatos (forma, tipo, variables, parámetros, avance)
+#     time.npy           eje de tiempo (años)
+#     trajectories.npy   arreglo (miembros, tiempo, variables) memoria-mapeado
+#
+# El escritor llena trajectories.npy por bloques de miembros sin tenerlo
+# entero en memoria, y el lector calcula percentiles por bloques de tiempo,
+# con un presupuesto de memoria fijo sin importar el número de miembros.
+
+HEADER_NAME = "header.json"
+TIME_NAME = "time.npy"
+TRAJECTORIES_NAME = "trajectories.npy"
+
+# Variables de estado guardadas (todas las columnas menos el tiempo)
+VARIABLES = SIMULATION_COLUMNS[1:]
+
+# Memoria máxima por bloque al calcular percentiles
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+
+def _write_header(path, header):
+    tmp_path = os.path.join(path, f".{HEADER_NAME}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(header, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, os.path.join(path, HEADER_NAME))
+
+
+def read_header(path):
+    """Metadatos de un ensamble guardado."""
+    with open(os.path.join(path, HEADER_NAME), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class EnsembleWriter:
+    """
+    Escribe las trayectorias de un ensamble directamente en un .npy
+    memoria-mapeado.
+
+    Parámetros:
+    - path: carpeta del ensamble (se crea)
+    - time: eje de tiempo común a todos los miembros
+    - members: número total de miembros
+    - dtype: tipo de los valores guardados (float32 por defecto)
+    - metadata: dict con los parámetros del ensamble (se guarda en el header)
+    """
+
+    def __init__(self, path, time, members, dtype=np.float32, metadata=None):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        time = np.asarray(time, dtype=float)
+        np.save(os.path.join(path, TIME_NAME), time)
+        self.trajectories = np.lib.format.open_memmap(
+            os.path.join(path, TRAJECTORIES_NAME), mode="w+", dtype=np.dtype(dtype),
+            shape=(int(members), len(time), len(VARIABLES))
+        )
+        self.header = {
+            "members": int(members),
+            "times": len(time),
+            "variables": list(VARIABLES),
+            "dtype": np.dtype(dtype).name,
+            "completed": 0,
+            "metadata": metadata or {},
+        }
+        _write_header(path, self.header)
+
+    def write(self, start, block):
+        """
+        Guarda las trayectorias de los miembros start:start + len(block).
+        ``block`` tiene forma (miembros, tiempo, variables).
+        """
+        stop = start + len(block)
+        self.trajectories[start:stop] = block
+        # "completed" cuenta los miembros contiguos desde el primero
+        if start <= self.header["completed"]:
+            self.header["completed"] = max(self.header["completed"], stop)
+
+    def flush(self):
+        """Baja a disco lo escrito y actualiza el avance del header."""
+        self.trajectories.flush()
+        _write_header(self.path, self.header)
+
+    def close(self):
+        self.flush()
+        del self.trajectories
+
+
+def open_ensemble(path):
+    """
+    Abre un ensamble guardado sin leerlo a memoria.
+
+    Salida:
+    - (header, time, trajectories): trajectories es un np.memmap de solo
+      lectura (miembros, tiempo, variables)
+    """
+    header = read_header(path)
+    time = np.load(os.path.join(path, TIME_NAME))
+    trajectories = np.load(os.path.join(path, TRAJECTORIES_NAME), mmap_mode="r")
+    return header, time, trajectories
+
+
+def ensemble_percentiles(path, percentiles=(10, 50, 90), variables=None, memory_budget=DEFAULT_MEMORY_BUDGET):
+    """
+    Percentiles entre miembros de cada variable en cada instante.
+
+    Se recorre el eje de tiempo por bloques cuyo tamaño (miembros x bloque
+    de tiempo) cabe en ``memory_budget`` bytes; solo se usan los miembros
+    ya completados.
+
+    Parámetros:
+    - path: carpeta del ensamble
+    - percentiles: percentiles a calcular (0-100)
+    - variables: variables a resumir (por defecto todas)
+
+    Salida:
+    - dict con 'time', 'members' y 'bands' (variable -> dict percentil -> serie),
+      el mismo formato que los ensambles de job_queue
+    """
+    header, time, trajectories = open_ensemble(path)
+    return trajectory_percentiles(trajectories[:header["completed"]], time, percentiles, variables,
+                                  memory_budget, names=header["variables"])
+
+
+def trajectory_percentiles(trajectories, time, percentiles=(10, 50, 90), variables=None,
+                           memory_budget=DEFAULT_MEMORY_BUDGET, names=VARIABLES):
+    """
+    Como ensemble_percentiles, pero sobre un arreglo (miembros, tiempo,
+    variables) ya abierto: un memmap o una vista en memoria compartida.
+    """
+    members = len(trajectories)
+    if members == 0:
+        raise ValueError("El ensamble no tiene miembros completos")
+    variables = list(variables or names)
+    indices = [list(names).index(name) for name in variables]
+
+    # Bloque en float64 más la copia de trabajo que ordena np.percentile
+    bytes_per_step = members * len(indices) * 8 * 2
+    step = max(1, int(memory_budget // max(1, bytes_per_step)))
+    bands = {name: {p: np.empty(len(time)) for p in percentiles} for name in variables}
+    for t0 in range(0, len(time), step):
+        t1 = min(len(time), t0 + step)
+        block = np.asarray(trajectories[:, t0:t1][:, :, indices], dtype=np.float64)
+        values = np.percentile(block, percentiles, axis=0)
+        for k, name in enumerate(variables):
+            for j, p in enumerate(percentiles):
+                bands[name][p][t0:t1] = values[j, :, k]
+
+    return {"time": time, "members": members, "bands": bands}
+
+
+def run_ensemble_to_store(path, frailejon_percentage, years, ecosystem_resilience, climate_strength=0.02,
+                          members=10_000, spread=0.15, seed=0, batch_size=500, dtype=np.float32,
+                          progress=None):
+    """
+    Corre un ensamble de simulaciones perturbadas y lo escribe en disco por
+    lotes; en memoria solo vive un lote de trayectorias a la vez.
+
+    Parámetros:
+    - path: carpeta del ensamble
+    - frailejon_percentage, years, ecosystem_resilience, climate_strength:
+      escenario central (el clima es común a todos los miembros)
+    - members: número de miembros
+    - spread: desviación relativa (lognormal) de frailejón y resiliencia
+    - batch_size: miembros integrados y escritos juntos (salida mensual)
+    - progress: función opcional progress(miembros_completos, members)
+
+    Salida:
+    - header del ensamble escrito
+    """
+    if members <= 0:
+        raise ValueError("members debe ser > 0")
+    if batch_size <= 0:
+        raise ValueError("batch_size debe ser > 0")
+    rng = np.random.default_rng(seed)
+    metadata = {
+        "frailejon_percentage": frailejon_percentage,
+        "years": years,
+        "ecosystem_resilience": ecosystem_resilience,
+        "climate_strength": climate_strength,
+        "spread": spread,
+        "seed": seed,
+    }
+    writer = None
+    try:
+        for start in range(0, members, batch_size):
+            stop = min(members, start + batch_size)
+            n = stop - start
+            frailejon = np.clip(frailejon_percentage * rng.lognormal(0.0, spread, n), 0, 100)
+            resilience = np.clip(ecosystem_resilience * rng.lognormal(0.0, spread, n), 0.0, 1.0)
+            runs = create_ecosystem_simulation_batch(frailejon, years, resilience, climate_strength,
+                                                     output="array", dtype=dtype)
+            if writer is None:
+                writer = EnsembleWriter(path, runs[0]["data"][:, 0], members, dtype=dtype, metadata=metadata)
+            writer.write(start, np.stack([run["data"][:, 1:] for run in runs]))
+            writer.flush()
+            if progress is not None:
+                progress(stop, members)
+    finally:
+        if writer is not None:
+            writer.close()
+    return writer.header
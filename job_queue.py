@@ -0,0 +1,256 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from models import CLIMATE_SCENARIO_STRENGTH, create_ecosystem_simulation_batch, iter_ecosystem_simulation
+
+# Cola local de trabajos largos (ensambles, superficies finas, horizontes
+# largos) para que no bloqueen el hilo del script de Streamlit. La página
+# envía el trabajo, guarda su id en st.session_state y consulta el avance en
+# cada rerun de un fragmento; el trabajo publica resultados parciales a
+# medida que avanza y se puede cancelar si el usuario cambia los controles.
+#
+# Una función de trabajo recibe el Job como primer argumento y llama a
+# job.report(...) para publicar avance; report lanza JobCancelled si el
+# trabajo fue cancelado, así que la cancelación ocurre en el siguiente
+# reporte.
+
+# Estados de un trabajo
+PENDING = "pendiente"
+RUNNING = "corriendo"
+DONE = "terminado"
+CANCELLED = "cancelado"
+FAILED = "error"
+
+FINISHED_STATES = (DONE, CANCELLED, FAILED)
+
+# Segundos que se conservan los trabajos terminados
+FINISHED_JOB_TTL = 600
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="jobs")
+_jobs = {}
+_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """El trabajo fue cancelado mientras corría."""
+
+
+class Job:
+    """
+    Estado de un trabajo de la cola (se lee con snapshot()).
+
+    Parámetros:
+    - job_id: identificador único
+    - owner: dueño del trabajo (p. ej. el id de la sesión)
+    - inputs: entradas con que se lanzó (para saber si quedó obsoleto)
+    """
+
+    def __init__(self, job_id, owner=None, inputs=None):
+        self.id = job_id
+        self.owner = owner
+        self.inputs = inputs
+        self.status = PENDING
+        self.progress = 0.0
+        self.message = ""
+        self.partial = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def report(self, progress, partial=None, message=None):
+        """Publica avance (0-1) y, opcionalmente, un resultado parcial."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+        with self._lock:
+            self.progress = float(np.clip(progress, 0.0, 1.0))
+            if partial is not None:
+                self.partial = partial
+            if message is not None:
+                self.message = message
+
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+        with self._lock:
+            if self.status == PENDING:
+                self.status = CANCELLED
+                self.finished_at = time.time()
+
+    def _finish(self, status, result=None, error=None):
+        with self._lock:
+            self.status = status
+            self.result = result
+            self.error = error
+            if status == DONE:
+                self.progress = 1.0
+            self.finished_at = time.time()
+
+    def snapshot(self):
+        """Copia consistente del estado: dict con id, status, progress, message, partial, result y error."""
+        with self._lock:
+            return {
+                "id": self.id,
+                "status": self.status,
+                "progress": self.progress,
+                "message": self.message,
+                "partial": self.partial,
+                "result": self.result,
+                "error": self.error,
+                "inputs": self.inputs,
+            }
+
+
+def _run(job, func, args, kwargs):
+    with job._lock:
+        if job.status != PENDING:
+            return
+        job.status = RUNNING
+    try:
+        result = func(job, *args, **kwargs)
+    except JobCancelled:
+        job._finish(CANCELLED)
+    except Exception as exc:
+        job._finish(FAILED, error=f"{type(exc).__name__}: {exc}")
+    else:
+        job._finish(CANCELLED if job.cancelled() else DONE, result=result)
+
+
+def purge_jobs(max_age=FINISHED_JOB_TTL):
+    """Olvida los trabajos terminados hace más de ``max_age`` segundos."""
+    now = time.time()
+    with _lock:
+        for job_id in [job_id for job_id, job in _jobs.items()
+                       if job.finished_at is not None and now - job.finished_at > max_age]:
+            del _jobs[job_id]
+
+
+def submit_job(func, *args, owner=None, inputs=None, **kwargs):
+    """
+    Encola un trabajo y devuelve su id sin esperar.
+
+    Parámetros:
+    - func: función func(job, *args, **kwargs)
+    - owner: dueño (para cancelar todos sus trabajos con cancel_jobs)
+    - inputs: entradas de la página con que se lanzó (informativo)
+    """
+    purge_jobs()
+    job = Job(uuid.uuid4().hex, owner, inputs)
+    with _lock:
+        _jobs[job.id] = job
+    _executor.submit(_run, job, func, args, kwargs)
+    return job.id
+
+
+def get_job(job_id):
+    """Estado actual de un trabajo (ver Job.snapshot) o None si no existe."""
+    with _lock:
+        job = _jobs.get(job_id)
+    return None if job is None else job.snapshot()
+
+
+def cancel_job(job_id):
+    """Pide cancelar un trabajo (se detiene en su siguiente reporte)."""
+    with _lock:
+        job = _jobs.get(job_id)
+    if job is not None:
+        job.cancel()
+
+
+def cancel_jobs(owner):
+    """Cancela todos los trabajos sin terminar de un dueño."""
+    with _lock:
+        jobs = [job for job in _jobs.values() if job.owner == owner and job.status not in FINISHED_STATES]
+    for job in jobs:
+        job.cancel()
+
+
+# ==== Trabajos predefinidos ====
+
+def ensemble_simulation_job(job, frailejon_percentage, years, ecosystem_resilience, climate_scenario="Estable",
+                            members=200, spread=0.15, batch_size=25, seed=0):
+    """
+    Ensamble de simulaciones con parámetros perturbados para estimar la
+    incertidumbre de la proyección. Tras cada lote publica como resultado
+    parcial las bandas de percentiles con los miembros calculados hasta
+    ese momento.
+
+    Parámetros:
+    - frailejon_percentage, years, ecosystem_resilience: escenario central
+    - climate_scenario: clave de CLIMATE_SCENARIO_STRENGTH (común a todos
+      los miembros, así cada lote se integra como un solo sistema apilado)
+    - members: número de miembros del ensamble
+    - spread: desviación relativa de las perturbaciones (lognormal)
+    - batch_size: miembros integrados juntos entre reportes
+
+    Salida:
+    - dict con 'time', 'members' y 'bands' (variable -> dict percentil -> serie)
+    """
+    rng = np.random.default_rng(seed)
+    climate_strength = CLIMATE_SCENARIO_STRENGTH.get(climate_scenario, 0.0)
+    frailejon = np.clip(frailejon_percentage * rng.lognormal(0.0, spread, members), 0, 100)
+    resilience = np.clip(ecosystem_resilience * rng.lognormal(0.0, spread, members), 0.0, 1.0)
+
+    variables = ("biodiversity", "water_regulation", "frailejon_population")
+    time_axis = None
+    values = {name: [] for name in variables}
+    percentiles = (10, 50, 90)
+
+    def bands():
+        return {name: {p: np.percentile(np.vstack(values[name]), p, axis=0) for p in percentiles}
+                for name in variables}
+
+    done = 0
+    for start in range(0, members, batch_size):
+        stop = min(members, start + batch_size)
+        frames = create_ecosystem_simulation_batch(frailejon[start:stop], years, resilience[start:stop],
+                                                   climate_strength)
+        if time_axis is None:
+            time_axis = frames[0]["time"].to_numpy()
+        for name in variables:
+            values[name].extend(frame[name].to_numpy() for frame in frames)
+        done = stop
+        job.report(done / members, partial={"time": time_axis, "members": done, "bands": bands()},
+                   message=f"{done} de {members} miembros")
+
+    return {"time": time_axis, "members": done, "bands": bands()}
+
+
+def long_simulation_job(job, frailejon_percentage, years, ecosystem_resilience, climate_scenario="Estable",
+                        steps_per_year=12, chunk_years=5.0, max_points=2000, sink=None):
+    """
+    Simulación de horizonte largo o resolución fina con
+    iter_ecosystem_simulation. Cada tramo se pasa a ``sink`` (si se da) y se
+    agrega submuestreado a la serie que se publica como resultado parcial,
+    así la serie en memoria nunca supera ``max_points`` filas.
+
+    Salida:
+    - pd.DataFrame submuestreado (mismas columnas que create_ecosystem_simulation)
+    """
+    climate_strength = CLIMATE_SCENARIO_STRENGTH.get(climate_scenario, 0.0)
+    total_points = years * steps_per_year + 1
+    stride = max(1, int(np.ceil(total_points / max_points)))
+
+    kept = []
+    seen = 0
+    for chunk in iter_ecosystem_simulation(frailejon_percentage, years, ecosystem_resilience, climate_strength,
+                                           chunk_years=chunk_years, steps_per_year=steps_per_year, sink=sink):
+        # Filas cuyo índice global es múltiplo de stride
+        offset = (-seen) % stride
+        kept.append(chunk.iloc[offset::stride])
+        seen += len(chunk)
+        series = pd.concat(kept, ignore_index=True)
+        kept = [series]
+        job.report(min(1.0, seen / total_points), partial=series,
+                   message=f"año {chunk['time'].iloc[-1]:.1f} de {years}")
+
+    return kept[0] if kept else None
@@ -1,7 +1,24 @@
 import numpy as np
 import pandas as pd
 from data.regions import get_regional_multipliers
-from scipy.integrate import odeint
+from scipy.integrate import odeint, solve_ivp
+
+# Columnas de la salida de create_ecosystem_simulation
+SIMULATION_COLUMNS = ("time", "biodiversity", "water_regulation", "endemic_plants",
+                      "frailejon_population", "soil_carbon")
+
+# Resoluciones de salida con nombre (puntos por año)
+OUTPUT_RESOLUTIONS = {
+    "yearly": 1,
+    "monthly": 12
+}
+
+# Intensidad del estrés climático (climate_strength) asociada a cada escenario
+CLIMATE_SCENARIO_STRENGTH = {
+    "Estable": 0.0,
+    "Calentamiento moderado": 0.02,
+    "Calentamiento severo": 0.04
+}
 
 def calculate_biodiversity_impact(frailejon_percentage, ecosystem_resilience):
     """
@@ -48,8 +65,106 @@ def calculate_crop_production(frailejon_percentage):
     return float(np.clip(water_regulation_factor * 100.0, 0.0, 100.0))
 
 
+def paramo_ecosystem_derivatives(biodiversity, water_regulation, endemic_plants, frailejon_pop, soil_carbon,
+                                 t_local, resilience, climate_strength, years):
+    """
+    Derivadas del sistema de EDO del páramo (variables normalizadas 0-1).
+    Funciona igual con escalares (un escenario) o con arreglos (varios
+    escenarios a la vez).
+    """
+    # Parámetros (pueden parametrizarse fuera y calibrarse)
+    alpha = 0.08
+    beta = 0.12
+    gamma = 0.06
+    delta = 0.04
+    epsilon = 0.05
+
+    # stress creciente en el tiempo: función escalada por climate_strength
+    # t_local está en años, normalizamos por el horizonte (years)
+    climate_stress = climate_strength * (t_local / max(1e-6, years))
+
+    # Biodiversidad: pérdida por frailejon_pop bajo + estrés climático; recuperación limitada por resiliencia
+    dbio_dt = -alpha * (1.0 - frailejon_pop) * biodiversity - climate_stress * biodiversity + (resilience * 0.015 * (1.0 - biodiversity))
+
+    # Regulación hídrica
+    dwater_dt = -beta * (1.0 - frailejon_pop) * water_regulation - climate_stress * water_regulation
+
+    # Plantas endémicas
+    dplants_dt = -gamma * (1.0 - frailejon_pop) * endemic_plants - climate_stress * endemic_plants
+
+    # Población de frailejones: combinación de declive por clima y posible recuperación ligada a resiliencia
+    # Nota: coeficientes ajustables/calibrables
+    recovery_rate = 0.01 * resilience
+    dfrailejon_dt = -0.05 * climate_stress * frailejon_pop + recovery_rate * (1.0 - frailejon_pop)
+
+    # Carbono del suelo
+    dcarbon_dt = -delta * (1.0 - frailejon_pop) * soil_carbon - climate_stress * soil_carbon
+
+    return dbio_dt, dwater_dt, dplants_dt, dfrailejon_dt, dcarbon_dt
+
+
+def paramo_ecosystem_model(y, t_local, resilience, climate_strength, years):
+    """Lado derecho de odeint para un escenario (``y`` con las 5 variables de estado)."""
+    return list(paramo_ecosystem_derivatives(*y, t_local, resilience, climate_strength, years))
+
+
+def paramo_ecosystem_model_stacked(y, t_local, resilience, climate_strength, years):
+    """
+    Lado derecho de odeint para n escenarios apilados: ``y`` tiene 5 * n
+    valores (primero las n biodiversidades, luego las n regulaciones
+    hídricas, ...) y ``resilience`` n valores.
+    """
+    return np.concatenate(paramo_ecosystem_derivatives(*np.reshape(y, (5, -1)), t_local, resilience,
+                                                       climate_strength, years))
+
+
+def output_times(years, resolution="monthly"):
+    """Instantes de salida (años) para una resolución; None = los pasos del integrador."""
+    if isinstance(resolution, str):
+        if resolution == "adaptive":
+            return None
+        if resolution not in OUTPUT_RESOLUTIONS:
+            raise ValueError(f"resolution debe ser una de {sorted(OUTPUT_RESOLUTIONS) + ['adaptive']}, "
+                             f"un número de puntos por año o un arreglo de tiempos")
+        resolution = OUTPUT_RESOLUTIONS[resolution]
+    if np.ndim(resolution) == 0:
+        if not resolution > 0:
+            raise ValueError("Los puntos por año deben ser > 0")
+        # Puntos por año: mismos instantes que la grilla mensual original
+        step = 1.0 / float(resolution)
+        return np.arange(0.0, years + step, step)
+    t = np.asarray(resolution, dtype=float)
+    if t.ndim != 1 or len(t) < 2 or t[0] != 0.0 or np.any(np.diff(t) <= 0):
+        raise ValueError("Los tiempos de salida deben empezar en 0 y ser crecientes")
+    return t
+
+
+def _simulation_output(t, states, output="dataframe", dtype=np.float64):
+    """
+    Salida de la simulación a partir de los estados normalizados.
+
+    Parámetros:
+    - t: instantes (años)
+    - states: arreglo (len(t), 5) con las variables de estado (0-1)
+    - output, dtype: como en create_ecosystem_simulation
+
+    Salida:
+    - pd.DataFrame o dict con 'columns' y 'data' (en % 0-100, sin valores
+      negativos y con la población de frailejones limitada a 100)
+    """
+    # Un solo arreglo preasignado: tiempo + 5 variables en % (0-100)
+    data = np.empty((len(t), len(SIMULATION_COLUMNS)), dtype=dtype)
+    data[:, 0] = t
+    np.multiply(np.maximum(states, 0.0), 100.0, out=data[:, 1:], casting="same_kind")
+    np.minimum(data[:, 4], 100.0, out=data[:, 4])
+    if output == "array":
+        return {"columns": SIMULATION_COLUMNS, "data": data}
+    return pd.DataFrame(data, columns=list(SIMULATION_COLUMNS))
+
+
 def create_ecosystem_simulation(frailejon_percentage, years, ecosystem_resilience,
-                                climate_strength=0.02):
+                                climate_strength=0.02, resolution="monthly", output="dataframe",
+                                dtype=np.float64):
     """
     Simula el páramo en el tiempo (años) y devuelve un DataFrame con resolución mensual.
 
@@ -58,77 +173,102 @@ def create_ecosystem_simulation(frailejon_percentage, years, ecosystem_resilienc
     - years: > 0 (años)
     - ecosystem_resilience: 0-1
     - climate_strength: controla la magnitud del estrés climático (por defecto 0.02)
+    - resolution: instantes de salida: "monthly" (por defecto), "yearly",
+      un número de puntos por año, un arreglo de tiempos (desde 0) o
+      "adaptive" (los pasos que elige el integrador)
+    - output: "dataframe" (por defecto) o "array" para evitar construir el
+      DataFrame
+    - dtype: tipo del arreglo de salida (np.float64 o np.float32)
 
     Salida:
     - pd.DataFrame con columnas: time (años), biodiversidad, water_regulation,
       endemic_plants, frailejon_population, soil_carbon (todas en % 0-100)
+    - con output="array": dict con 'columns' (SIMULATION_COLUMNS) y 'data',
+      un único arreglo (n, 6) con las columnas en ese orden
     """
     frailejon_percentage = float(np.clip(frailejon_percentage, 0, 100))
     ecosystem_resilience = float(np.clip(ecosystem_resilience, 0.0, 1.0))
     years = float(years)
     if years <= 0:
         raise ValueError("years debe ser > 0")
+    if output not in ("dataframe", "array"):
+        raise ValueError("output debe ser 'dataframe' o 'array'")
 
-    # Tiempo: pasos mensuales, unidad en años
-    t = np.arange(0.0, years + 1/12.0, 1/12.0)
+    # Tiempo: pasos mensuales por defecto, unidad en años
+    t = output_times(years, resolution)
 
     frailejon_norm = frailejon_percentage / 100.0
 
     # Estado inicial normalizado (0-1)
     initial_state = [1.0, 1.0, 1.0, frailejon_norm, 1.0]
 
-    def paramo_ecosystem_model(y, t_local, resilience):
-        biodiversity, water_regulation, endemic_plants, frailejon_pop, soil_carbon = y
-
-        # Parámetros (pueden parametrizarse fuera y calibrarse)
-        alpha = 0.08
-        beta = 0.12
-        gamma = 0.06
-        delta = 0.04
-        epsilon = 0.05
-
-        # stress creciente en el tiempo: función escalada por climate_strength
-        # t_local está en años, normalizamos por el horizonte (years)
-        climate_stress = climate_strength * (t_local / max(1e-6, years))
-
-        # Biodiversidad: pérdida por frailejon_pop bajo + estrés climático; recuperación limitada por resiliencia
-        dbio_dt = -alpha * (1.0 - frailejon_pop) * biodiversity - climate_stress * biodiversity + (resilience * 0.015 * (1.0 - biodiversity))
-
-        # Regulación hídrica
-        dwater_dt = -beta * (1.0 - frailejon_pop) * water_regulation - climate_stress * water_regulation
-
-        # Plantas endémicas
-        dplants_dt = -gamma * (1.0 - frailejon_pop) * endemic_plants - climate_stress * endemic_plants
-
-        # Población de frailejones: combinación de declive por clima y posible recuperación ligada a resiliencia
-        # Nota: coeficientes ajustables/calibrables
-        recovery_rate = 0.01 * resilience
-        dfrailejon_dt = -0.05 * climate_stress * frailejon_pop + recovery_rate * (1.0 - frailejon_pop)
-
-        # Carbono del suelo
-        dcarbon_dt = -delta * (1.0 - frailejon_pop) * soil_carbon - climate_stress * soil_carbon
+    # integrador de ecuaciones diferenciales ordinarias (EDO)
+    if t is None:
+        adaptive = solve_ivp(
+            lambda t_local, y: paramo_ecosystem_model(y, t_local, ecosystem_resilience, climate_strength, years),
+            (0.0, years), initial_state, method="LSODA", rtol=1.49012e-8, atol=1.49012e-8
+        )
+        t = adaptive.t
+        solution = adaptive.y.T
+    else:
+        solution = odeint(paramo_ecosystem_model, initial_state, t,
+                          args=(ecosystem_resilience, climate_strength, years))
 
-        return [dbio_dt, dwater_dt, dplants_dt, dfrailejon_dt, dcarbon_dt]
+    return _simulation_output(t, solution, output, dtype)
 
-    # integrador de ecuaciones diferenciales ordinarias (EDO)
-    solution = odeint(paramo_ecosystem_model, initial_state, t, args=(ecosystem_resilience,))
 
-    biodiversity = np.maximum(0.0, solution[:, 0]) * 100.0
-    water_regulation = np.maximum(0.0, solution[:, 1]) * 100.0
-    endemic_plants = np.maximum(0.0, solution[:, 2]) * 100.0
-    frailejon_population = np.clip(solution[:, 3], 0.0, 1.0) * 100.0
-    soil_carbon = np.maximum(0.0, solution[:, 4]) * 100.0
+def iter_ecosystem_simulation(frailejon_percentage, years, ecosystem_resilience, climate_strength=0.02,
+                              chunk_years=1.0, steps_per_year=12, sink=None):
+    """
+    Versión por tramos de create_ecosystem_simulation: integra el horizonte
+    tramo a tramo (cada uno arranca del estado final del anterior) y entrega
+    las filas de cada tramo apenas se calculan. La memoria usada no depende
+    del horizonte ni de la resolución.
 
-    df = pd.DataFrame({
-        'time': t,
-        'biodiversity': biodiversity,
-        'water_regulation': water_regulation,
-        'endemic_plants': endemic_plants,
-        'frailejon_population': frailejon_population,
-        'soil_carbon': soil_carbon
-    })
+    Parámetros:
+    - frailejon_percentage, years, ecosystem_resilience, climate_strength:
+      igual que en create_ecosystem_simulation
+    - chunk_years: años integrados por tramo
+    - steps_per_year: puntos de salida por año (12 = mensual)
+    - sink: función opcional que recibe cada tramo (p. ej. para escribirlo
+      a disco o actualizar un gráfico)
 
-    return df
+    Salida:
+    - generador de pd.DataFrame (mismas columnas que
+      create_ecosystem_simulation); concatenados equivalen, dentro de la
+      tolerancia del integrador, a la simulación completa
+    """
+    frailejon_percentage = float(np.clip(frailejon_percentage, 0, 100))
+    ecosystem_resilience = float(np.clip(ecosystem_resilience, 0.0, 1.0))
+    years = float(years)
+    if years <= 0:
+        raise ValueError("years debe ser > 0")
+    if not steps_per_year > 0:
+        raise ValueError("steps_per_year debe ser > 0")
+    if not chunk_years > 0:
+        raise ValueError("chunk_years debe ser > 0")
+
+    dt = 1.0 / steps_per_year
+    # Mismos instantes que np.arange(0, years + dt, dt), sin materializarlos
+    n_points = int(np.ceil((years + dt) / dt))
+    points_per_chunk = max(1, int(round(chunk_years * steps_per_year)))
+
+    state = [1.0, 1.0, 1.0, frailejon_percentage / 100.0, 1.0]
+    first = 0
+    while first < n_points:
+        last = min(n_points, first + points_per_chunk)
+        # El tramo incluye el instante de arranque (ya entregado en el tramo
+        # anterior, salvo en el primero)
+        start = max(0, first - 1)
+        t = np.arange(start, last) * dt
+        solution = odeint(paramo_ecosystem_model, state, t,
+                          args=(ecosystem_resilience, climate_strength, years))
+        state = solution[-1]
+        chunk = _simulation_output(t[first - start:], solution[first - start:])
+        if sink is not None:
+            sink(chunk)
+        yield chunk
+        first = last
 
 
 def calculate_economic_impact(frailejon_percentage, region="Todos los páramos"):
@@ -166,3 +306,142 @@ def calculate_economic_impact(frailejon_percentage, region="Todos los páramos")
 
     return economic_losses
 
+
+# ==== Evaluación vectorizada (lotes de escenarios) ====
+
+def calculate_biodiversity_impact_batch(frailejon_percentage, ecosystem_resilience):
+    """
+    Versión vectorizada de calculate_biodiversity_impact.
+
+    Parámetros:
+    - frailejon_percentage: arreglo de porcentajes 0-100
+    - ecosystem_resilience: arreglo (o escalar) de resiliencias 0-1
+
+    Salida:
+    - np.ndarray con el índice de biodiversidad (0-100) de cada escenario
+    """
+    frailejon_norm = np.clip(np.asarray(frailejon_percentage, dtype=float), 0, 100) / 100.0
+    ecosystem_resilience = np.clip(np.asarray(ecosystem_resilience, dtype=float), 0.0, 1.0)
+
+    k = 6.0
+    mid_point = 0.4
+    adjusted_frailejon = np.clip(frailejon_norm + ecosystem_resilience * 0.25, 0.0, 1.0)
+    biodiversity_factor = 1.0 / (1.0 + np.exp(-k * (adjusted_frailejon - mid_point)))
+    return np.minimum(biodiversity_factor * 100.0, 100.0)
+
+
+def calculate_crop_production_batch(frailejon_percentage):
+    """
+    Versión vectorizada de calculate_crop_production.
+
+    Salida:
+    - np.ndarray con la regulación hídrica (0-100) de cada escenario
+    """
+    frailejon_norm = np.clip(np.asarray(frailejon_percentage, dtype=float), 0, 100) / 100.0
+    water_regulation_factor = np.select(
+        [frailejon_norm >= 0.9, frailejon_norm >= 0.7, frailejon_norm >= 0.5, frailejon_norm >= 0.3],
+        [
+            np.ones_like(frailejon_norm),
+            0.85 + ((frailejon_norm - 0.7) / 0.2) * 0.15,
+            0.6 + ((frailejon_norm - 0.5) / 0.2) * 0.25,
+            0.3 + ((frailejon_norm - 0.3) / 0.2) * 0.3
+        ],
+        default=(frailejon_norm / 0.3) * 0.3
+    )
+    return np.clip(water_regulation_factor * 100.0, 0.0, 100.0)
+
+
+def calculate_economic_impact_batch(frailejon_percentage, regions="Todos los páramos"):
+    """
+    Versión vectorizada de calculate_economic_impact (los multiplicadores
+    regionales se consultan una sola vez por lote).
+
+    Parámetros:
+    - frailejon_percentage: arreglo de porcentajes 0-100
+    - regions: región de cada escenario (lista) o una sola para todos
+
+    Salida:
+    - dict servicio -> np.ndarray de pérdidas (millones USD/año)
+    """
+    frailejon_percentage = np.clip(np.asarray(frailejon_percentage, dtype=float), 0, 100)
+    regional_multipliers = get_regional_multipliers()
+    if isinstance(regions, str):
+        multiplier = np.full(frailejon_percentage.shape, regional_multipliers.get(regions, 1.0))
+    else:
+        multiplier = np.array([regional_multipliers.get(region, 1.0) for region in regions], dtype=float)
+
+    base_values = {
+        "water_regulation": 5200.0,
+        "carbon_sequestration": 850.0,
+        "biodiversity_conservation": 1200.0,
+        "tourism": 400.0
+    }
+    sensitivities = {
+        "water_regulation": 0.9,
+        "carbon_sequestration": 0.7,
+        "biodiversity_conservation": 0.8,
+        "tourism": 0.5
+    }
+    frailejon_loss = np.maximum(0.0, 100.0 - frailejon_percentage) / 100.0
+    return {
+        service: base_value * multiplier * frailejon_loss * sensitivities[service]
+        for service, base_value in base_values.items()
+    }
+
+
+def create_ecosystem_simulation_batch(frailejon_percentage, years, ecosystem_resilience, climate_strength=0.02,
+                                      resolution="monthly", output="dataframe", dtype=np.float64):
+    """
+    Simula varios escenarios. Los escenarios con el mismo horizonte y la
+    misma intensidad climática se integran juntos como un solo sistema
+    apilado (una llamada a odeint por grupo), lo que reparte el costo fijo
+    del integrador entre todo el lote. Los resultados coinciden con
+    create_ecosystem_simulation dentro de la tolerancia del integrador.
+
+    Parámetros:
+    - frailejon_percentage, years, ecosystem_resilience, climate_strength:
+      arreglos de la misma longitud (o escalares comunes a todos)
+    - resolution: como en create_ecosystem_simulation, salvo "adaptive"
+      (los escenarios apilados comparten los instantes de salida)
+    - output, dtype: como en create_ecosystem_simulation
+
+    Salida:
+    - lista (uno por escenario) de pd.DataFrame, o de dicts con 'columns' y
+      'data' si output="array"
+    """
+    frailejon_percentage, years, ecosystem_resilience, climate_strength = np.broadcast_arrays(
+        np.clip(np.asarray(frailejon_percentage, dtype=float), 0, 100),
+        np.asarray(years, dtype=float),
+        np.clip(np.asarray(ecosystem_resilience, dtype=float), 0.0, 1.0),
+        np.asarray(climate_strength, dtype=float)
+    )
+    frailejon_percentage = np.atleast_1d(frailejon_percentage)
+    years = np.atleast_1d(years)
+    ecosystem_resilience = np.atleast_1d(ecosystem_resilience)
+    climate_strength = np.atleast_1d(climate_strength)
+    if np.any(years <= 0):
+        raise ValueError("years debe ser > 0")
+    if output not in ("dataframe", "array"):
+        raise ValueError("output debe ser 'dataframe' o 'array'")
+    if isinstance(resolution, str) and resolution == "adaptive":
+        raise ValueError("resolution='adaptive' no está disponible para lotes")
+
+    results = [None] * len(frailejon_percentage)
+    groups = {}
+    for index, key in enumerate(zip(years.tolist(), climate_strength.tolist())):
+        groups.setdefault(key, []).append(index)
+
+    for (group_years, group_climate), indices in groups.items():
+        indices = np.array(indices)
+        n = len(indices)
+        t = output_times(group_years, resolution)
+        initial_state = np.ones((5, n))
+        initial_state[3] = frailejon_percentage[indices] / 100.0
+        solution = odeint(paramo_ecosystem_model_stacked, initial_state.ravel(), t,
+                          args=(ecosystem_resilience[indices], group_climate, group_years))
+        states = solution.reshape(len(t), 5, n)
+
+        for position, index in enumerate(indices):
+            results[index] = _simulation_output(t, states[:, :, position], output, dtype)
+
+    return results
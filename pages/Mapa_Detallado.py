@@ -5,7 +5,10 @@ import altair as alt
 import folium
 from folium.plugins import HeatMap, MarkerCluster
 from streamlit_folium import st_folium
-from data.regions import get_frailejon_regions
+from cache import get_frailejon_regions
+from data.boundaries import tolerance_for_zoom
+from data.timeseries import site_trends
+from visualizations import add_boundary_layer
 
 st.set_page_config(
     page_title="Mapa Detallado - Impacto de Frailejones en Colombia",
@@ -34,6 +37,8 @@ st.markdown("""
 # ==== Función de proyección-- metodo numerico implementado Ecuaciones Diferenciales Ordinarias (EDO) ====
 def proyectar_paramos(paramos, years_ahead, view):
     proyectados = []
+    # Tendencias observadas (%/año) para calibrar la tasa de cada páramo
+    tendencias = site_trends() if view == "Proyección" else {}
 
     for p in paramos:
         nuevo = p.copy()
@@ -56,6 +61,23 @@ def proyectar_paramos(paramos, years_ahead, view):
             else:  # Bajo
                 r = 0.02 
 
+            # Calibrar con la serie observada si existe. Una tendencia
+            # positiva bajo la capacidad se traduce a la tasa logística
+            # equivalente en la densidad actual; en otro caso se usa un
+            # declive (o crecimiento) exponencial r = pendiente / D0, porque
+            # la logística con tasa negativa se acelera al alejarse de K
+            # (igual que en metapopulation.py)
+            D0 = p.get("frailejon_density", 50)
+            pendiente = tendencias.get(p.get("name"))
+            exponencial = False
+            if pendiente is not None and D0 > 0:
+                crecimiento = D0 * (1 - D0 / (K * resiliencia))
+                if pendiente > 0 and crecimiento > 1e-6:
+                    r = pendiente / crecimiento
+                else:
+                    r = pendiente / D0
+                    exponencial = True
+
             # Ajustar tasa según escenario climático
             if clima == "Calentamiento moderado":
                 r *= 0.8
@@ -71,7 +93,10 @@ def proyectar_paramos(paramos, years_ahead, view):
             h = 1  # paso temporal (años)
 
             # Ecuación diferencial logística: dD/dt = r*D*(1 - D/K)
+            # (o exponencial dD/dt = r*D si se calibró así)
             def f(t, D):
+                if exponencial:
+                    return r * D
                 return r * D * (1 - D / K)
 
             # Resolver con Runge-Kutta 4
@@ -121,12 +146,10 @@ Explora la densidad actual de frailejones y los niveles de riesgo por páramo.
 st.markdown("</div>", unsafe_allow_html=True)
 
 # ==== Controles ====
-colA, colB, colC = st.columns([1.2, 1, 1])
+colA, colB = st.columns([1.2, 2])
 with colA:
-    map_type = st.selectbox("Tipo de visualización", ["Marcadores de Páramos", "Densidad de Frailejones", "Clusters por Región"], index=0)
-with colB:
     view = st.radio("Escenario a mostrar", ["Actual", "Proyección"], index=0, horizontal=True)
-with colC:
+with colB:
     years_ahead = 0
 if view == "Proyección":
     years_ahead = st.slider("Horizonte de años", 1, 50, 10)
@@ -161,111 +184,142 @@ filtered_paramos = [
 ]
 
 # ==== Mapa ====
-st.markdown("<div class='map-container'>", unsafe_allow_html=True)
-m = folium.Map(location=[5.5, -73.5], zoom_start=6, tiles='CartoDB positron')
-
 def color_por_riesgo(r):
     return {'Crítico': 'darkred', 'Alto': 'red', 'Medio': 'orange'}.get(r, 'green')
 
-if map_type == "Marcadores de Páramos":
-    for p in filtered_paramos:
-        color = color_por_riesgo(p.get(risk_field, 'Bajo'))
-        dens = p.get(density_field, 0)
-        popup_content = f"""
-        <div style="width: 280px">
-            <h4>{p.get('name','Páramo')}</h4>
-            <p><strong>Vista:</strong> {view}</p>
-            <p><strong>Horizonte:</strong> {years_ahead} años</p>
-            <p><strong>Departamento:</strong> {p.get('department','N/D')}</p>
-            <p><strong>Nivel de riesgo:</strong> {p.get(risk_field,'N/D')}</p>
-            <p><strong>Densidad de frailejones:</strong> {dens:.1f}%</p>
-            <p><strong>Área aproximada:</strong> {p.get('area','N/D')} km²</p>
-            <p><strong>Altitud promedio:</strong> {p.get('altitude','N/D')} msnm</p>
-            <p><strong>Servicios ecosistémicos:</strong> {p.get('ecosystem_services','N/D')}</p>
-            <p><strong>Tipo de frailejones:</strong> {p.get('type_frailejones','N/D')}</p>
-            <p><em>{p.get('description','')}</em></p>
-        </div>
-        """
-        tooltip = f"{p.get('name','Páramo')} - {view}"
-        folium.Marker(
-            location=[p.get('lat', 0), p.get('lon', 0)],
-            popup=folium.Popup(popup_content, max_width=320),
-            tooltip=tooltip,
-            icon=folium.Icon(color=color, icon='tree', prefix='fa')
-        ).add_to(m)
-
-        folium.Circle( 
-            radius=max(0, dens) * 800,
-            location=[p.get('lat', 0), p.get('lon', 0)],
-            color=color,
-            fill=True, fill_opacity=0.3, opacity=0.7, weight=2
-        ).add_to(m)
+# El panel del mapa es un fragmento: cambiar su tipo de visualización o hacer
+# zoom solo vuelve a ejecutar este panel, no la proyección ni el análisis
+@st.fragment
+def render_map_panel(filtered_paramos, view, years_ahead):
+    map_type = st.selectbox("Tipo de visualización", ["Marcadores de Páramos", "Densidad de Frailejones", "Clusters por Región"], index=0)
 
-elif map_type == "Densidad de Frailejones":
-    heat_data = [[p.get('lat', 0), p.get('lon', 0), p.get(density_field, 0)] for p in filtered_paramos]
-    
-    HeatMap(
-        heat_data,
-        radius=20,
-        min_opacity=0.4,
-        gradient={0.4: '#81c784', 0.6: '#66bb6a', 0.8: '#4caf50', 1.0: '#2e7d32'},
-        blur=15
-    ).add_to(m)
-
-    def get_color(density):
-        if density < 30:
-            return "red"
-        elif density < 60:
-            return "orange"
-        else:
-            return "green"
-
-    for p in filtered_paramos:
-        dens = p.get(density_field, 0)
-        popup_content = f"""
-        <div style="width: 250px">
-            <h4>{p.get('name','Páramo')}</h4>
-            <p><strong>Vista:</strong> {view}</p>
-            <p><strong>Horizonte:</strong> {years_ahead} años</p>
-            <p><strong>Densidad de frailejones:</strong> {dens:.1f}%</p>
-            <p><strong>Área aproximada:</strong> {p.get('area','N/D')} km²</p>
-            <p><strong>Altitud promedio:</strong> {p.get('altitude','N/D')} msnm</p>
-        </div>
-        """
-        folium.CircleMarker(
-            location=[p.get('lat', 0), p.get('lon', 0)],
-            radius=8,
-            color=get_color(dens),
-            fill=True,
-            fill_color=get_color(dens),
-            fill_opacity=0.7,
-            popup=folium.Popup(popup_content, max_width=300),
-            tooltip=f"{p.get('name','Páramo')} - {dens:.1f}% frailejones"
+    st.markdown("<div class='map-container'>", unsafe_allow_html=True)
+    # El zoom reportado por el mapa en la interacción anterior decide el nivel de
+    # simplificación de los límites de los páramos
+    map_zoom = st.session_state.get("map_zoom", 6)
+    map_center = st.session_state.get("map_center", [5.5, -73.5])
+    m = folium.Map(location=map_center, zoom_start=map_zoom, tiles='CartoDB positron')
+    # Páramos dibujados con su polígono real (solo en la vista de marcadores)
+    con_limites = set()
+
+    if map_type == "Marcadores de Páramos":
+        con_limites = add_boundary_layer(
+            m, filtered_paramos, map_zoom,
+            lambda p: color_por_riesgo(p.get(risk_field, 'Bajo'))
+        )
+        for p in filtered_paramos:
+            color = color_por_riesgo(p.get(risk_field, 'Bajo'))
+            dens = p.get(density_field, 0)
+            popup_content = f"""
+            <div style="width: 280px">
+                <h4>{p.get('name','Páramo')}</h4>
+                <p><strong>Vista:</strong> {view}</p>
+                <p><strong>Horizonte:</strong> {years_ahead} años</p>
+                <p><strong>Departamento:</strong> {p.get('department','N/D')}</p>
+                <p><strong>Nivel de riesgo:</strong> {p.get(risk_field,'N/D')}</p>
+                <p><strong>Densidad de frailejones:</strong> {dens:.1f}%</p>
+                <p><strong>Área aproximada:</strong> {p.get('area','N/D')} km²</p>
+                <p><strong>Altitud promedio:</strong> {p.get('altitude','N/D')} msnm</p>
+                <p><strong>Servicios ecosistémicos:</strong> {p.get('ecosystem_services','N/D')}</p>
+                <p><strong>Tipo de frailejones:</strong> {p.get('type_frailejones','N/D')}</p>
+                <p><em>{p.get('description','')}</em></p>
+            </div>
+            """
+            tooltip = f"{p.get('name','Páramo')} - {view}"
+            folium.Marker(
+                location=[p.get('lat', 0), p.get('lon', 0)],
+                popup=folium.Popup(popup_content, max_width=320),
+                tooltip=tooltip,
+                icon=folium.Icon(color=color, icon='tree', prefix='fa')
+            ).add_to(m)
+
+            # Los páramos con polígono real no necesitan el círculo aproximado
+            if p.get('name') in con_limites:
+                continue
+
+            folium.Circle( 
+                radius=max(0, dens) * 800,
+                location=[p.get('lat', 0), p.get('lon', 0)],
+                color=color,
+                fill=True, fill_opacity=0.3, opacity=0.7, weight=2
+            ).add_to(m)
+
+    elif map_type == "Densidad de Frailejones":
+        heat_data = [[p.get('lat', 0), p.get('lon', 0), p.get(density_field, 0)] for p in filtered_paramos]
+
+        HeatMap(
+            heat_data,
+            radius=20,
+            min_opacity=0.4,
+            gradient={0.4: '#81c784', 0.6: '#66bb6a', 0.8: '#4caf50', 1.0: '#2e7d32'},
+            blur=15
         ).add_to(m)
 
-elif map_type == "Clusters por Región":
-    marker_cluster = MarkerCluster().add_to(m)
-    for p in filtered_paramos:
-        color = color_por_riesgo(p.get(risk_field, 'Bajo'))
-        dens = p.get(density_field, 0)
-        popup_content = f"""
-        <div style="width: 280px">
-            <h4>{p.get('name','Páramo')}</h4>
-            <p><strong>Vista:</strong> {view}</p>
-            <p><strong>Horizonte:</strong> {years_ahead} años</p>
-            <p><strong>Nivel de riesgo:</strong> {p.get(risk_field,'N/D')}</p>
-            <p><strong>Densidad de frailejones:</strong> {dens:.1f}%</p>
-        </div>
-        """
-        folium.Marker(
-            location=[p.get('lat', 0), p.get('lon', 0)],
-            popup=folium.Popup(popup_content, max_width=320),
-            tooltip=p.get('name', 'Páramo'),
-            icon=folium.Icon(color=color, icon='tree', prefix='fa')
-        ).add_to(marker_cluster)
-
-st_folium(m, width=1200, height=600)
-st.markdown("</div>", unsafe_allow_html=True)
+        def get_color(density):
+            if density < 30:
+                return "red"
+            elif density < 60:
+                return "orange"
+            else:
+                return "green"
+
+        for p in filtered_paramos:
+            dens = p.get(density_field, 0)
+            popup_content = f"""
+            <div style="width: 250px">
+                <h4>{p.get('name','Páramo')}</h4>
+                <p><strong>Vista:</strong> {view}</p>
+                <p><strong>Horizonte:</strong> {years_ahead} años</p>
+                <p><strong>Densidad de frailejones:</strong> {dens:.1f}%</p>
+                <p><strong>Área aproximada:</strong> {p.get('area','N/D')} km²</p>
+                <p><strong>Altitud promedio:</strong> {p.get('altitude','N/D')} msnm</p>
+            </div>
+            """
+            folium.CircleMarker(
+                location=[p.get('lat', 0), p.get('lon', 0)],
+                radius=8,
+                color=get_color(dens),
+                fill=True,
+                fill_color=get_color(dens),
+                fill_opacity=0.7,
+                popup=folium.Popup(popup_content, max_width=300),
+                tooltip=f"{p.get('name','Páramo')} - {dens:.1f}% frailejones"
+            ).add_to(m)
+
+    elif map_type == "Clusters por Región":
+        marker_cluster = MarkerCluster().add_to(m)
+        for p in filtered_paramos:
+            color = color_por_riesgo(p.get(risk_field, 'Bajo'))
+            dens = p.get(density_field, 0)
+            popup_content = f"""
+            <div style="width: 280px">
+                <h4>{p.get('name','Páramo')}</h4>
+                <p><strong>Vista:</strong> {view}</p>
+                <p><strong>Horizonte:</strong> {years_ahead} años</p>
+                <p><strong>Nivel de riesgo:</strong> {p.get(risk_field,'N/D')}</p>
+                <p><strong>Densidad de frailejones:</strong> {dens:.1f}%</p>
+            </div>
+            """
+            folium.Marker(
+                location=[p.get('lat', 0), p.get('lon', 0)],
+                popup=folium.Popup(popup_content, max_width=320),
+                tooltip=p.get('name', 'Páramo'),
+                icon=folium.Icon(color=color, icon='tree', prefix='fa')
+            ).add_to(marker_cluster)
+
+    map_state = st_folium(m, width=1200, height=600, returned_objects=["zoom", "center"])
+    if map_state and map_state.get("zoom") and map_state["zoom"] != map_zoom:
+        # Recordar la vista para redibujar con los límites simplificados para el nuevo zoom
+        st.session_state["map_zoom"] = map_state["zoom"]
+        if map_state.get("center"):
+            st.session_state["map_center"] = [map_state["center"]["lat"], map_state["center"]["lng"]]
+        # Solo vale la pena redibujar si hay límites en el mapa y el nuevo
+        # zoom usa otro nivel de simplificación
+        if con_limites and tolerance_for_zoom(map_state["zoom"]) != tolerance_for_zoom(map_zoom):
+            st.rerun(scope="fragment")
+    st.markdown("</div>", unsafe_allow_html=True)
+
+render_map_panel(filtered_paramos, view, years_ahead)
 
 # ==== Análisis ====
 st.markdown("<div class='card'>", unsafe_allow_html=True)
@@ -0,0 +1,174 @@
+import ctypes
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from ensemble_store import VARIABLES, trajectory_percentiles
+from models import create_ecosystem_simulation_batch, output_times
+
+# Ensambles en varios procesos sin devolver las trayectorias por pickle.
+#
+# El proceso principal reserva el tensor de resultados (miembros, tiempo,
+# variables) en multiprocessing.shared_memory; cada trabajador se conecta a
+# él una sola vez (initializer) y escribe su lote de miembros en su lugar.
+# Por la cola de resultados solo viajan los índices del lote, y el proceso
+# principal lee el tensor como una vista de NumPy, sin copias.
+
+_worker_state = {}
+
+
+class _SharedBuffer:
+    """
+    Expone un bloque de memoria compartida como arreglo de NumPy y es la
+    base de todas sus vistas: el bloque sigue mapeado mientras alguna vista
+    exista, aunque se pierda la referencia al SharedEnsemble.
+    """
+
+    def __init__(self, shm, shape, dtype):
+        self.shm = shm
+        # La dirección se lee sin dejar exportado el buffer, así
+        # SharedMemory puede cerrarse cuando se libere este objeto
+        address = ctypes.addressof(ctypes.c_char.from_buffer(shm.buf))
+        self.__array_interface__ = {
+            "shape": tuple(shape),
+            "typestr": np.dtype(dtype).str,
+            "data": (address, False),
+            "version": 3,
+        }
+
+
+class SharedEnsemble:
+    """
+    Resultado de run_parallel_ensemble: las trayectorias viven en memoria
+    compartida. close() (o salir del bloque with) libera el nombre del
+    bloque; la memoria se libera cuando ya no queda ninguna vista.
+
+    Atributos:
+    - time: eje de tiempo (años)
+    - trajectories: vista (miembros, tiempo, variables) sobre la memoria compartida
+    - variables: nombres de la última dimensión
+    - metadata: parámetros del ensamble
+    """
+
+    def __init__(self, time, members, dtype=np.float32, metadata=None):
+        self.time = np.asarray(time, dtype=float)
+        self.variables = VARIABLES
+        self.metadata = metadata or {}
+        self.shape = (int(members), len(self.time), len(VARIABLES))
+        self.dtype = np.dtype(dtype)
+        nbytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+        self.trajectories = np.asarray(_SharedBuffer(self.shm, self.shape, self.dtype))
+
+    def percentiles(self, percentiles=(10, 50, 90), variables=None):
+        """Bandas de percentiles (mismo formato que ensemble_store.ensemble_percentiles)."""
+        return trajectory_percentiles(self.trajectories, self.time, percentiles, variables)
+
+    def close(self):
+        """
+        Elimina el nombre del bloque compartido. Las vistas ya entregadas
+        siguen siendo válidas: el bloque se desmapea al liberarse la última.
+        """
+        if self.shm is None:
+            return
+        self.shm.unlink()
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _init_worker(name, shape, dtype):
+    """Conecta el proceso trabajador al tensor de resultados compartido."""
+    _worker_state.clear()
+    shm = shared_memory.SharedMemory(name=name)
+    _worker_state["shm"] = shm
+    _worker_state["trajectories"] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _worker_batch(start, frailejon, years, resilience, climate_strength, resolution, dtype):
+    runs = create_ecosystem_simulation_batch(frailejon, years, resilience, climate_strength,
+                                             resolution=resolution, output="array", dtype=dtype)
+    target = _worker_state["trajectories"]
+    for offset, run in enumerate(runs):
+        target[start + offset] = run["data"][:, 1:]
+    return start, len(runs)
+
+
+def run_parallel_ensemble(frailejon_percentage, years, ecosystem_resilience, climate_strength=0.02,
+                          members=10_000, spread=0.15, seed=0, batch_size=250, workers=None,
+                          resolution="monthly", dtype=np.float32, progress=None):
+    """
+    Ensamble de simulaciones perturbadas repartido entre procesos; cada
+    trabajador escribe sus miembros directamente en memoria compartida.
+
+    Los parámetros perturbados se sortean en el proceso principal, así el
+    resultado no depende del número de procesos.
+
+    Parámetros:
+    - frailejon_percentage, years, ecosystem_resilience, climate_strength:
+      escenario central (el clima es común a todos los miembros)
+    - members: número de miembros
+    - spread: desviación relativa (lognormal) de frailejón y resiliencia
+    - batch_size: miembros integrados juntos por tarea
+    - workers: procesos (None = todos los núcleos; 1 = en el proceso actual)
+    - resolution: instantes de salida, como en
+      create_ecosystem_simulation_batch (por defecto mensual)
+    - progress: función opcional progress(miembros_completos, members)
+
+    Salida:
+    - SharedEnsemble (usar con ``with`` o llamar close() al terminar)
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size debe ser > 0")
+    rng = np.random.default_rng(seed)
+    frailejon = np.clip(frailejon_percentage * rng.lognormal(0.0, spread, members), 0, 100)
+    resilience = np.clip(ecosystem_resilience * rng.lognormal(0.0, spread, members), 0.0, 1.0)
+    metadata = {
+        "frailejon_percentage": frailejon_percentage,
+        "years": years,
+        "ecosystem_resilience": ecosystem_resilience,
+        "climate_strength": climate_strength,
+        "spread": spread,
+        "seed": seed,
+    }
+    time = output_times(years, resolution)
+    if time is None:
+        raise ValueError("resolution='adaptive' no está disponible para ensambles")
+    ensemble = SharedEnsemble(time, members, dtype=dtype, metadata=metadata)
+    batches = [(start, frailejon[start:start + batch_size], years, resilience[start:start + batch_size],
+                climate_strength, time, ensemble.dtype)
+               for start in range(0, members, batch_size)]
+
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    done = 0
+    try:
+        if workers == 1:
+            _init_worker(ensemble.shm.name, ensemble.shape, ensemble.dtype)
+            try:
+                for batch in batches:
+                    _, count = _worker_batch(*batch)
+                    done += count
+                    if progress is not None:
+                        progress(done, members)
+            finally:
+                _worker_state.pop("trajectories", None)
+                _worker_state.pop("shm").close()
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(ensemble.shm.name, ensemble.shape, ensemble.dtype)) as pool:
+                futures = [pool.submit(_worker_batch, *batch) for batch in batches]
+                for future in futures:
+                    _, count = future.result()
+                    done += count
+                    if progress is not None:
+                        progress(done, members)
+    except BaseException:
+        ensemble.close()
+        raise
+    return ensemble
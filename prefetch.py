@@ -0,0 +1,116 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cache
+from scenario_cube import load_cube
+
+# Precálculo especulativo: después de cada rerun se resuelven en segundo plano
+# las posiciones vecinas de los sliders (±1 paso) y se guardan en la caché
+# compartida, de modo que mover un slider una muesca encuentre todo calculado.
+
+FRAILEJON_STEP = 5
+FRAILEJON_RANGE = (10, 100)
+YEARS_STEP = 1
+YEARS_RANGE = (1, 40)
+
+# Segundos sin actividad tras los que se olvida el estado de una sesión
+SESSION_TTL = 3600
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch")
+_lock = threading.Lock()
+# Generación actual, futuros pendientes y última actividad por sesión
+_generations = {}
+_pending = {}
+_last_seen = {}
+
+
+def neighbour_states(frailejon, years):
+    """Estados (frailejón, años) a un paso de distancia en cada slider."""
+    states = []
+    for d_frailejon, d_years in ((FRAILEJON_STEP, 0), (-FRAILEJON_STEP, 0), (0, YEARS_STEP), (0, -YEARS_STEP)):
+        f = frailejon + d_frailejon
+        y = years + d_years
+        if FRAILEJON_RANGE[0] <= f <= FRAILEJON_RANGE[1] and YEARS_RANGE[0] <= y <= YEARS_RANGE[1]:
+            states.append((f, y))
+    return states
+
+
+def _is_current(session_id, generation):
+    with _lock:
+        return _generations.get(session_id) == generation
+
+
+def _prefetch_state(session_id, generation, frailejon, years, resilience, viz_type, climate_strength):
+    # Cada paso comprueba que el usuario no se haya movido a otro estado.
+    # Con el cubo de escenarios la página no resuelve simulaciones
+    steps = []
+    if load_cube() is None:
+        steps.append(lambda: cache.create_ecosystem_simulation(frailejon, years, resilience, climate_strength))
+    if viz_type == "Gráfico 2D":
+        steps.append(lambda: cache.plot_frailejon_crop_relationship(frailejon))
+    else:
+        steps.append(lambda: cache.plot_frailejon_crop_relationship_3d(frailejon, years))
+
+    for step in steps:
+        if not _is_current(session_id, generation):
+            return
+        step()
+
+
+def purge_sessions(max_age=SESSION_TTL):
+    """Olvida las sesiones sin actividad hace más de ``max_age`` segundos."""
+    now = time.monotonic()
+    with _lock:
+        for session_id in [session_id for session_id, seen in _last_seen.items() if now - seen > max_age]:
+            _generations.pop(session_id, None)
+            _pending.pop(session_id, None)
+            del _last_seen[session_id]
+
+
+def cancel_prefetch(session_id):
+    """Cancela el precálculo pendiente de una sesión."""
+    with _lock:
+        _generations[session_id] = _generations.get(session_id, 0) + 1
+        _last_seen[session_id] = time.monotonic()
+        futures = _pending.pop(session_id, [])
+    for future in futures:
+        future.cancel()
+
+
+def prefetch_neighbours(session_id, frailejon, years, resilience, viz_type="Gráfico 2D", climate_strength=0.02):
+    """
+    Programa en segundo plano la simulación y la figura de los estados
+    vecinos al actual. Un nuevo llamado de la misma sesión cancela lo
+    pendiente del anterior (los cálculos en curso se detienen en el
+    siguiente paso).
+
+    Parámetros:
+    - session_id: identificador de la sesión de Streamlit
+    - frailejon, years, resilience: estado actual de los controles
+    - viz_type: visualización activa ("Gráfico 2D" o "Modelo 3D Interactivo")
+    - climate_strength: intensidad climática del escenario seleccionado
+    """
+    purge_sessions()
+    cancel_prefetch(session_id)
+    with _lock:
+        generation = _generations[session_id]
+
+    futures = []
+    use_cube = load_cube() is not None
+    for f, y in neighbour_states(frailejon, years):
+        figure_ready = (
+            cache.plot_frailejon_crop_relationship.contains(f)
+            if viz_type == "Gráfico 2D"
+            else cache.plot_frailejon_crop_relationship_3d.contains(f, y)
+        )
+        simulation_ready = use_cube or cache.create_ecosystem_simulation.contains(f, y, resilience, climate_strength)
+        if simulation_ready and figure_ready:
+            continue
+        futures.append(_executor.submit(_prefetch_state, session_id, generation, f, y, resilience, viz_type,
+                                        climate_strength))
+
+    with _lock:
+        if _generations.get(session_id) == generation:
+            _pending[session_id] = futures
+    return futures
@@ -0,0 +1,200 @@
+import argparse
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cache
+from models import CLIMATE_SCENARIO_STRENGTH
+from scenario_cube import load_cube
+
+# Precalentamiento de la caché compartida (cache.py) con los escenarios más
+# comunes, para que el primer usuario después de un despliegue no pague los
+# cálculos en frío. Los resultados se calculan en procesos trabajadores y se
+# guardan en la caché del proceso del servidor; opcionalmente también en un
+# archivo (snapshot) que el servidor carga al arrancar.
+#
+# Uso desde la terminal (antes o después de levantar el servidor):
+#     python prewarm.py --workers 4
+
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "prewarm.pkl")
+
+# Rejilla de escenarios: todos los pasos del slider de frailejones, todos los
+# niveles de resiliencia, todos los escenarios climáticos y los horizontes
+# más usados (incluye el de defecto)
+PREWARM_FRAILEJON = tuple(range(10, 101, 5))
+PREWARM_RESILIENCE = (0.2, 0.4, 0.6, 0.8, 1.0)
+PREWARM_YEARS = (5, 10, 15, 20, 30)
+PREWARM_CLIMATE = tuple(CLIMATE_SCENARIO_STRENGTH.values())
+
+# Módulos cuyo cambio invalida un snapshot guardado
+_SOURCE_MODULES = ("models.py", "visualizations.py", "data/regions.py")
+
+# Cargadores de datos: sus entradas precalculadas sí vencen, para recoger
+# cambios en los archivos locales (ráster, observaciones)
+_EXPIRING_FUNCTIONS = ("get_frailejon_regions", "get_initial_data")
+
+_startup_lock = threading.Lock()
+_startup_thread = None
+
+
+def scenario_grid(frailejon_values=PREWARM_FRAILEJON, resilience_values=PREWARM_RESILIENCE,
+                  years_values=PREWARM_YEARS, climate_values=PREWARM_CLIMATE):
+    """
+    Tareas de precálculo para la rejilla de escenarios.
+
+    Los argumentos se pasan en la misma forma posicional que usan las
+    páginas, para que las claves de caché coincidan. Si existe el cubo de
+    escenarios (scenario_cube.py) se omiten las simulaciones: la página las
+    lee del cubo.
+
+    Salida:
+    - lista de (nombre de la función en cache.py, tupla de argumentos)
+    """
+    tasks = [("get_frailejon_regions", ()), ("get_initial_data", ())]
+    simulations = load_cube() is None
+    for frailejon in frailejon_values:
+        tasks.append(("plot_frailejon_crop_relationship", (frailejon,)))
+        for years in years_values:
+            tasks.append(("plot_frailejon_crop_relationship_3d", (frailejon, years)))
+            if simulations:
+                for resilience in resilience_values:
+                    for climate_strength in climate_values:
+                        tasks.append(("create_ecosystem_simulation", (frailejon, years, resilience, climate_strength)))
+    return tasks
+
+
+def _compute_task(task):
+    name, args = task
+    # Se llama a la función original (sin caché) dentro del trabajador
+    return name, args, getattr(cache, name).func(*args)
+
+
+def compute_scenarios(tasks, workers=None, chunksize=8):
+    """
+    Calcula las tareas en procesos trabajadores.
+
+    Parámetros:
+    - tasks: lista de (nombre, argumentos) (ver scenario_grid)
+    - workers: número de procesos (None = núcleos disponibles; 1 = en el
+      proceso actual)
+    - chunksize: tareas enviadas juntas a cada trabajador
+
+    Salida:
+    - lista de (nombre, argumentos, resultado)
+    """
+    if workers == 1 or len(tasks) <= 1:
+        return [_compute_task(task) for task in tasks]
+    # "spawn": el precalentamiento corre en un hilo del servidor, y hacer
+    # fork de un proceso con varios hilos puede dejar bloqueados a los hijos
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(_compute_task, tasks, chunksize=chunksize))
+
+
+def warm_cache(entries):
+    """
+    Guarda los resultados precalculados en la caché compartida. Los
+    modelos y figuras quedan fijados (sin vencimiento por TTL) para que
+    sigan disponibles mientras viva el proceso del servidor.
+    """
+    for name, args, value in entries:
+        cached_function = getattr(cache, name)
+        cached_function.put(cached_function.key(*args), value, pin=name not in _EXPIRING_FUNCTIONS)
+    return len(entries)
+
+
+def _sources_mtime():
+    base = os.path.dirname(os.path.abspath(__file__))
+    return max(os.path.getmtime(os.path.join(base, module)) for module in _SOURCE_MODULES)
+
+
+def save_snapshot(entries, path=None):
+    """Escribe los resultados precalculados a disco (escritura atómica)."""
+    path = path or SNAPSHOT_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump({"created": time.time(), "entries": entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path=None):
+    """
+    Lee un snapshot guardado con save_snapshot.
+
+    Salida:
+    - lista de (nombre, argumentos, resultado), o None si no existe o es
+      más antiguo que el código de los modelos y figuras
+    """
+    path = path or SNAPSHOT_PATH
+    if not os.path.exists(path) or os.path.getmtime(path) < _sources_mtime():
+        return None
+    with open(path, "rb") as f:
+        return pickle.load(f)["entries"]
+
+
+def prewarm(workers=None, tasks=None, snapshot_path=None, save=False):
+    """
+    Precalcula la rejilla de escenarios y llena la caché compartida. Las
+    tareas que ya están en caché se omiten.
+
+    Parámetros:
+    - workers: procesos trabajadores (ver compute_scenarios)
+    - tasks: tareas a calcular (por defecto scenario_grid())
+    - snapshot_path: ruta del snapshot (por defecto SNAPSHOT_PATH)
+    - save: escribir también el snapshot a disco
+
+    Salida:
+    - número de resultados calculados
+    """
+    tasks = scenario_grid() if tasks is None else tasks
+    missing = [(name, args) for name, args in tasks if not getattr(cache, name).contains(*args)]
+    entries = compute_scenarios(missing, workers=workers)
+    warm_cache(entries)
+    if save:
+        # El snapshot incluye también lo que ya estaba en caché
+        computed = {(name, args) for name, args, _ in entries}
+        for name, args in tasks:
+            if (name, args) not in computed:
+                cached_function = getattr(cache, name)
+                value = cached_function.get(cached_function.key(*args))
+                if value is not None:
+                    entries.append((name, args, value))
+        save_snapshot(entries, snapshot_path)
+    return len(missing)
+
+
+def _startup(workers):
+    entries = load_snapshot()
+    if entries is not None:
+        warm_cache(entries)
+    else:
+        prewarm(workers=workers)
+
+
+def prewarm_on_startup(workers=2):
+    """
+    Lanza el precalentamiento en un hilo de fondo, una sola vez por proceso
+    del servidor. Si hay un snapshot vigente se carga; si no, se calcula la
+    rejilla con ``workers`` procesos. Las páginas no esperan a que termine.
+    """
+    global _startup_thread
+    with _startup_lock:
+        if _startup_thread is not None:
+            return _startup_thread
+        _startup_thread = threading.Thread(target=_startup, args=(workers,), name="prewarm", daemon=True)
+        _startup_thread.start()
+        return _startup_thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precalcula los escenarios más comunes del simulador.")
+    parser.add_argument("--workers", type=int, default=None, help="procesos trabajadores (por defecto, todos los núcleos)")
+    parser.add_argument("--output", default=SNAPSHOT_PATH, help="ruta del snapshot que carga el servidor")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    computed = prewarm(workers=args.workers, snapshot_path=args.output, save=True)
+    print(f"{computed} escenarios precalculados en {time.perf_counter() - start:.1f} s -> {args.output}")
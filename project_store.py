@@ -0,0 +1,296 @@
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+import avances_store
+from avances_store import CORTES, AvancesConflictError
+
+# Almacén embebido (SQLite) del proyecto: los avances por corte y los
+# escenarios guardados con sus series de resultados. Cada guardado toca solo
+# las filas que cambian (no se reescribe un archivo completo) y el modo WAL
+# deja leer a todas las sesiones mientras una escribe.
+#
+# La primera vez que se abre la base se importan los avances de
+# avances_data.json (o los valores por defecto).
+
+PROJECT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "proyecto.sqlite3")
+
+# Columnas de resultados que devuelve models.create_ecosystem_simulation
+RESULT_COLUMNS = ("time", "biodiversity", "water_regulation", "endemic_plants",
+                  "frailejon_population", "soil_carbon")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS avances (
+    corte TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (corte, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    created_at REAL NOT NULL,
+    region TEXT NOT NULL,
+    climate TEXT NOT NULL,
+    resilience REAL NOT NULL,
+    frailejon REAL NOT NULL,
+    years REAL NOT NULL,
+    summary TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_scenarios_params ON scenarios (region, climate, resilience, frailejon);
+CREATE INDEX IF NOT EXISTS idx_scenarios_created ON scenarios (created_at);
+CREATE TABLE IF NOT EXISTS scenario_results (
+    scenario_id INTEGER NOT NULL REFERENCES scenarios (id) ON DELETE CASCADE,
+    time REAL NOT NULL,
+    biodiversity REAL,
+    water_regulation REAL,
+    endemic_plants REAL,
+    frailejon_population REAL,
+    soil_carbon REAL,
+    PRIMARY KEY (scenario_id, time)
+) WITHOUT ROWID;
+"""
+
+_initialized = set()
+_init_lock = threading.Lock()
+# Avances en caché por base: ruta -> (revisión, datos)
+_avances_cache = {}
+_avances_lock = threading.Lock()
+
+
+def _open(path):
+    connection = sqlite3.connect(path, timeout=30.0)
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    return connection
+
+
+def _initialize(path):
+    with _init_lock:
+        if path in _initialized:
+            return
+        connection = _open(path)
+        try:
+            # WAL queda registrado en el archivo de la base
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.executescript(_SCHEMA)
+            imported = connection.execute("SELECT 1 FROM meta WHERE key = 'avances_revision'").fetchone()
+            if imported is None:
+                avances_data, _ = avances_store.read_avances()
+                # Otro proceso puede estar abriendo la misma base nueva: se
+                # vuelve a comprobar con el candado de escritura tomado
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    if connection.execute("SELECT 1 FROM meta WHERE key = 'avances_revision'").fetchone() is None:
+                        _replace_avances(connection, avances_data, CORTES)
+                        connection.execute("INSERT INTO meta (key, value) VALUES ('avances_revision', '1')")
+                    connection.commit()
+                except BaseException:
+                    if connection.in_transaction:
+                        connection.rollback()
+                    raise
+        finally:
+            connection.close()
+        _initialized.add(path)
+
+
+@contextmanager
+def connect(path=None):
+    """
+    Conexión a la base del proyecto (se crea e inicializa si no existe).
+
+    Cada llamada abre su propia conexión, así que se puede usar desde
+    cualquier hilo o sesión de Streamlit.
+    """
+    path = path or PROJECT_DB_PATH
+    _initialize(path)
+    connection = _open(path)
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+
+# ==== Avances ====
+
+def _replace_avances(connection, avances_data, cortes):
+    now = time.time()
+    connection.executemany("DELETE FROM avances WHERE corte = ?", [(corte,) for corte in cortes])
+    connection.executemany(
+        "INSERT INTO avances (corte, position, text, updated_at) VALUES (?, ?, ?, ?)",
+        [(corte, position, text, now) for corte in cortes for position, text in enumerate(avances_data.get(corte, []))]
+    )
+
+
+def _revision(connection):
+    row = connection.execute("SELECT value FROM meta WHERE key = 'avances_revision'").fetchone()
+    return row[0] if row is not None else "0"
+
+
+def _avances_rows(connection):
+    data = {corte: [] for corte in CORTES}
+    for corte, text in connection.execute("SELECT corte, text FROM avances ORDER BY corte, position"):
+        data.setdefault(corte, []).append(text)
+    return data
+
+
+def read_avances(path=None):
+    """
+    Lee los avances del proyecto.
+
+    Solo se consulta la revisión en la base; la lista completa se vuelve a
+    leer únicamente si alguien guardó cambios.
+
+    Salida:
+    - (datos, versión): dict corte -> lista de avances y la revisión leída
+    """
+    path = path or PROJECT_DB_PATH
+    with connect(path) as connection:
+        revision = _revision(connection)
+        with _avances_lock:
+            cached = _avances_cache.get(path)
+        if cached is None or cached[0] != revision:
+            # Revisión y filas en la misma transacción de lectura
+            with connection:
+                connection.execute("BEGIN")
+                revision = _revision(connection)
+                data = _avances_rows(connection)
+            cached = (revision, data)
+            with _avances_lock:
+                _avances_cache[path] = cached
+    return copy.deepcopy(cached[1]), cached[0]
+
+
+def write_avances(avances_data, expected_version=None, path=None):
+    """
+    Guarda los avances; solo se reescriben los cortes que cambiaron.
+
+    Parámetros:
+    - avances_data: dict corte -> lista de avances
+    - expected_version: revisión sobre la que se editó (None = sin comprobar)
+
+    Salida:
+    - nueva revisión (la misma si no cambió nada)
+
+    Lanza AvancesConflictError si otro guardó después de expected_version.
+    """
+    path = path or PROJECT_DB_PATH
+    with connect(path) as connection:
+        # BEGIN IMMEDIATE toma el candado de escritura antes de comparar; el
+        # estado actual se lee dentro de la misma transacción
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            revision = _revision(connection)
+            current = _avances_rows(connection)
+            if expected_version is not None and revision != expected_version:
+                connection.rollback()
+                raise AvancesConflictError(current, revision)
+            changed = [corte for corte in avances_data if avances_data[corte] != current.get(corte)]
+            if not changed:
+                # Guardar lo mismo no crea conflictos a los demás editores
+                connection.rollback()
+                return revision
+            _replace_avances(connection, avances_data, changed)
+            revision = str(int(revision) + 1)
+            connection.execute("UPDATE meta SET value = ? WHERE key = 'avances_revision'", (revision,))
+            connection.commit()
+        except BaseException:
+            if connection.in_transaction:
+                connection.rollback()
+            raise
+    return revision
+
+
+# ==== Escenarios ====
+
+def save_scenarios(scenarios, path=None):
+    """
+    Guarda varios escenarios con sus resultados en una sola transacción.
+
+    Parámetros:
+    - scenarios: lista de dicts con 'params' (frailejon, resilience, years,
+      region, climate), 'results' (DataFrame de create_ecosystem_simulation)
+      y opcionalmente 'name' y 'summary' (dict serializable a JSON)
+
+    Salida:
+    - lista de ids asignados
+    """
+    now = time.time()
+    ids = []
+    with connect(path) as connection, connection:
+        for scenario in scenarios:
+            params = scenario["params"]
+            cursor = connection.execute(
+                "INSERT INTO scenarios (name, created_at, region, climate, resilience, frailejon, years, summary) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (scenario.get("name"), now, params.get("region", "Todos los páramos"),
+                 params.get("climate", "Estable"), float(params["resilience"]),
+                 float(params["frailejon"]), float(params["years"]),
+                 json.dumps(scenario.get("summary") or {}, ensure_ascii=False))
+            )
+            scenario_id = cursor.lastrowid
+            results = scenario["results"]
+            columns = [results[column].to_numpy(dtype=float) for column in RESULT_COLUMNS]
+            connection.executemany(
+                f"INSERT INTO scenario_results (scenario_id, {', '.join(RESULT_COLUMNS)}) "
+                f"VALUES (?, {', '.join('?' * len(RESULT_COLUMNS))})",
+                ((scenario_id, *row) for row in zip(*(column.tolist() for column in columns)))
+            )
+            ids.append(scenario_id)
+    return ids
+
+
+def save_scenario(params, results, name=None, summary=None, path=None):
+    """Guarda un escenario con sus resultados (ver save_scenarios) y devuelve su id."""
+    return save_scenarios([{"params": params, "results": results, "name": name, "summary": summary}], path)[0]
+
+
+def list_scenarios(region=None, climate=None, resilience=None, limit=200, path=None):
+    """
+    Escenarios guardados (más recientes primero), filtrados por los campos
+    indexados.
+
+    Salida:
+    - pd.DataFrame con id, name, created_at, region, climate, resilience,
+      frailejon, years y summary
+    """
+    conditions = []
+    values = []
+    for column, value in (("region", region), ("climate", climate), ("resilience", resilience)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            values.append(value)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    with connect(path) as connection:
+        scenarios = pd.read_sql_query(
+            f"SELECT * FROM scenarios {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+            connection, params=values + [int(limit)]
+        )
+    scenarios["created_at"] = pd.to_datetime(scenarios["created_at"], unit="s")
+    return scenarios
+
+
+def load_scenario_results(scenario_id, path=None):
+    """Serie de resultados de un escenario guardado (mismas columnas que create_ecosystem_simulation)."""
+    with connect(path) as connection:
+        return pd.read_sql_query(
+            f"SELECT {', '.join(RESULT_COLUMNS)} FROM scenario_results WHERE scenario_id = ? ORDER BY time",
+            connection, params=(int(scenario_id),)
+        )
+
+
+def delete_scenario(scenario_id, path=None):
+    """Borra un escenario y sus resultados."""
+    with connect(path) as connection, connection:
+        connection.execute("DELETE FROM scenarios WHERE id = ?", (int(scenario_id),))
@@ -0,0 +1,142 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+# Capa reactiva mínima para las páginas de Streamlit: cada bloque de cálculo
+# declara de qué entradas (widgets) o de qué otros bloques depende, y su
+# resultado se guarda en st.session_state. En cada rerun solo se recalculan
+# los bloques cuyas dependencias cambiaron; el resto devuelve el valor guardado.
+
+# Hilos compartidos por todas las sesiones para evaluar bloques independientes
+block_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="reactive")
+
+
+class ReactiveGraph:
+    """
+    Grafo de bloques de cálculo con recálculo incremental.
+
+    Parámetros:
+    - state_key: clave de st.session_state donde se guardan los resultados
+    - state: mapeo alternativo a st.session_state (útil fuera de Streamlit)
+
+    Uso:
+        graph = ReactiveGraph("main_page")
+        graph.block("simulation", ["frailejon", "years"], create_ecosystem_simulation)
+        graph.block("figure", ["simulation"], plot_timeseries_forecast)
+        results = graph.run({"frailejon": 80, "years": 15}, only=["figure"])
+    """
+
+    def __init__(self, state_key, state=None):
+        self.state_key = state_key
+        self._state = state
+        self._blocks = {}
+        self.recomputed = []
+
+    @property
+    def _store(self):
+        state = st.session_state if self._state is None else self._state
+        if self.state_key not in state:
+            state[self.state_key] = {}
+        return state[self.state_key]
+
+    def block(self, name, depends_on, func):
+        """
+        Declara un bloque. ``func`` recibe como argumentos con nombre los
+        valores de ``depends_on`` (entradas o resultados de otros bloques).
+        """
+        for dep in depends_on:
+            if dep == name:
+                raise ValueError(f"El bloque '{name}' no puede depender de sí mismo")
+        self._blocks[name] = (tuple(depends_on), func)
+        return self
+
+    def _order(self, names, inputs):
+        """Bloques necesarios para ``names`` en orden topológico."""
+        order = []
+        done = set()
+
+        def visit(name, visiting):
+            if name in inputs or name in done:
+                return
+            if name not in self._blocks:
+                raise KeyError(f"'{name}' no es una entrada ni un bloque declarado")
+            if name in visiting:
+                raise ValueError(f"Dependencia circular en el bloque '{name}'")
+            visiting.add(name)
+            for dep in self._blocks[name][0]:
+                visit(dep, visiting)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in names:
+            visit(name, set())
+        return order
+
+    def run(self, inputs, only=None, executor=None):
+        """
+        Evalúa los bloques pedidos (por defecto todos) y sus dependencias.
+
+        Los bloques se procesan por oleadas: en cada una se toman los que ya
+        tienen resueltas sus dependencias, y los que deben recalcularse se
+        envían juntos al ``executor`` (si se da), de modo que los bloques
+        independientes corren en paralelo y el tiempo del rerun tiende al del
+        bloque más lento. Las funciones de los bloques no deben llamar a
+        Streamlit, porque corren fuera del hilo del script.
+
+        Parámetros:
+        - inputs: dict con el valor actual de cada entrada (hashable)
+        - only: nombres de bloques a evaluar; los no pedidos no se calculan
+        - executor: concurrent.futures.Executor opcional para paralelizar
+
+        Salida:
+        - dict nombre de bloque -> resultado
+        """
+        store = self._store
+        self.recomputed = []
+        names = list(self._blocks) if only is None else list(only)
+        remaining = self._order(names, inputs)
+
+        # Token de cada dependencia: el valor de una entrada o la versión de
+        # un bloque (los dependientes comparan la versión, no el valor)
+        tokens = {name: ("input", value) for name, value in inputs.items()}
+        values = dict(inputs)
+
+        while remaining:
+            ready = [n for n in remaining if all(dep in tokens for dep in self._blocks[n][0])]
+            stale = {}
+            for name in ready:
+                depends_on, func = self._blocks[name]
+                fingerprint = tuple((dep, tokens[dep]) for dep in depends_on)
+                entry = store.get(name)
+                if entry is not None and entry["fingerprint"] == fingerprint:
+                    values[name] = entry["value"]
+                    tokens[name] = ("block", name, entry["version"])
+                else:
+                    stale[name] = (fingerprint, func, {dep: values[dep] for dep in depends_on})
+
+            if executor is not None and len(stale) > 1:
+                futures = {name: executor.submit(func, **args) for name, (_, func, args) in stale.items()}
+                results = {name: future.result() for name, future in futures.items()}
+            else:
+                results = {name: func(**args) for name, (_, func, args) in stale.items()}
+
+            for name, (fingerprint, _, _) in stale.items():
+                entry = store.get(name)
+                version = 0 if entry is None else entry["version"] + 1
+                store[name] = {"fingerprint": fingerprint, "value": results[name], "version": version}
+                values[name] = results[name]
+                tokens[name] = ("block", name, version)
+                self.recomputed.append(name)
+
+            remaining = [n for n in remaining if n not in ready]
+
+        return {name: values[name] for name in names}
+
+    def invalidate(self, name=None):
+        """Descarta el resultado guardado de un bloque (o de todos)."""
+        store = self._store
+        if name is None:
+            store.clear()
+        else:
+            store.pop(name, None)
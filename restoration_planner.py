@@ -0,0 +1,226 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from data.regions import get_frailejon_regions
+from models import CLIMATE_SCENARIO_STRENGTH, SIMULATION_COLUMNS, create_ecosystem_simulation_batch
+from utils import calculate_paramo_health_score, get_conservation_recommendations
+
+# Problema inverso sobre el modelo del páramo: para cada páramo, la menor
+# restauración (porcentaje inicial de frailejones o resiliencia) con la que
+# el puntaje de salud de utils.calculate_paramo_health_score llega a una
+# meta al final del horizonte.
+#
+# El puntaje final crece con ambas palancas, así que la restauración mínima
+# es la raíz de puntaje(x) - meta entre el valor actual y el máximo. Se
+# busca con falsa posición (variante Illinois), que mantiene la raíz
+# acotada en cada paso, avanzando todos los páramos a la vez: en cada
+# iteración las simulaciones de todos los páramos pendientes se integran
+# juntas como un solo sistema apilado (create_ecosystem_simulation_batch).
+#
+# Uso:
+#     python restoration_planner.py --target 60 --years 15
+
+# Palancas de restauración: rango de búsqueda y tolerancia en x
+LEVERS = {
+    "frailejon": {"upper": 100.0, "tolerance": 0.05},
+    "resilience": {"upper": 1.0, "tolerance": 0.0005},
+}
+
+# Tolerancia en el puntaje: basta con llegar a la meta + esto
+SCORE_TOLERANCE = 0.01
+MAX_ITERATIONS = 60
+
+_COLUMNS = list(SIMULATION_COLUMNS)
+
+
+def projected_health_scores(frailejon_percentage, years, ecosystem_resilience, climate_strength=0.02):
+    """
+    Puntaje de salud al final del horizonte para varios escenarios (una sola
+    integración apilada).
+
+    Parámetros:
+    - frailejon_percentage, ecosystem_resilience: arreglos de la misma
+      longitud (o escalares comunes)
+    - years, climate_strength: comunes a todos los escenarios
+
+    Salida:
+    - np.ndarray con un puntaje (0-100) por escenario
+    """
+    runs = create_ecosystem_simulation_batch(frailejon_percentage, years, ecosystem_resilience, climate_strength,
+                                             output="array")
+    final = np.array([run["data"][-1] for run in runs])
+    return np.array([
+        calculate_paramo_health_score(state[_COLUMNS.index("frailejon_population")],
+                                      state[_COLUMNS.index("water_regulation")],
+                                      state[_COLUMNS.index("biodiversity")])["score"]
+        for state in final
+    ])
+
+
+def minimum_restoration(current_frailejon, resilience, target_score, years, climate_strength=0.02,
+                        lever="frailejon"):
+    """
+    Menor valor de la palanca con el que cada escenario llega a la meta.
+
+    Parámetros:
+    - current_frailejon: porcentaje actual de frailejones por escenario
+    - resilience: resiliencia actual por escenario (0-1)
+    - target_score: puntaje de salud buscado al final del horizonte
+    - years, climate_strength: horizonte e intensidad climática comunes
+    - lever: "frailejon" (porcentaje inicial) o "resilience"
+
+    Salida:
+    - dict con 'required' (valor mínimo de la palanca; NaN si ni el máximo
+      alcanza la meta), 'baseline_score' (sin restaurar), 'achieved_score'
+      (con el valor requerido) y 'iterations'
+    """
+    if lever not in LEVERS:
+        raise ValueError(f"lever debe ser una de {sorted(LEVERS)}")
+    current_frailejon, resilience = np.broadcast_arrays(
+        np.clip(np.asarray(current_frailejon, dtype=float), 0, 100),
+        np.clip(np.asarray(resilience, dtype=float), 0.0, 1.0)
+    )
+    current_frailejon = np.atleast_1d(current_frailejon).copy()
+    resilience = np.atleast_1d(resilience).copy()
+    upper = LEVERS[lever]["upper"]
+    tolerance = LEVERS[lever]["tolerance"]
+
+    def scores(values, indices):
+        frailejon, resil = current_frailejon[indices], resilience[indices]
+        if lever == "frailejon":
+            frailejon = values
+        else:
+            resil = values
+        return projected_health_scores(frailejon, years, resil, climate_strength) - target_score
+
+    n = len(current_frailejon)
+    everyone = np.arange(n)
+    a = current_frailejon.copy() if lever == "frailejon" else resilience.copy()
+    b = np.full(n, upper)
+    # Extremos del intervalo: sin restaurar y con la palanca al máximo
+    fa = scores(a, everyone)
+    fb = scores(b, everyone)
+    fa_baseline = fa.copy()
+
+    required = np.full(n, np.nan)
+    achieved = np.full(n, np.nan)
+    already = fa >= 0
+    required[already] = a[already]
+    achieved[already] = fa[already] + target_score
+    bracketed = np.flatnonzero(~already & (fb >= 0))
+    active = bracketed
+    # Último extremo movido (-1 = a, 1 = b) para la corrección de Illinois
+    side = np.zeros(n, dtype=int)
+
+    iterations = 0
+    while len(active) and iterations < MAX_ITERATIONS:
+        iterations += 1
+        x = b[active] - fb[active] * (b[active] - a[active]) / (fb[active] - fa[active])
+        # Si la secante se pega a un extremo, se bisecta
+        stalled = (x <= a[active]) | (x >= b[active]) | ~np.isfinite(x)
+        x[stalled] = 0.5 * (a[active] + b[active])[stalled]
+        fx = scores(x, active)
+
+        reached = fx >= 0
+        moved_b, moved_a = active[reached], active[~reached]
+        b[moved_b], fb[moved_b] = x[reached], fx[reached]
+        a[moved_a], fa[moved_a] = x[~reached], fx[~reached]
+        # Illinois: si el mismo extremo se mueve dos veces, se divide a la
+        # mitad el valor del otro para que la secante no se estanque
+        fa[moved_b[side[moved_b] == 1]] *= 0.5
+        fb[moved_a[side[moved_a] == -1]] *= 0.5
+        side[moved_b], side[moved_a] = 1, -1
+
+        done = ((b[active] - a[active]) <= tolerance) | (reached & (fx <= SCORE_TOLERANCE))
+        active = active[~done]
+
+    # b siempre alcanza la meta: es el menor valor comprobado que la cumple
+    if len(bracketed):
+        required[bracketed] = b[bracketed]
+        achieved[bracketed] = scores(b[bracketed], bracketed) + target_score
+
+    return {
+        "required": required,
+        "baseline_score": fa_baseline + target_score,
+        "achieved_score": achieved,
+        "iterations": iterations,
+    }
+
+
+def plan_restoration(target_score=60.0, years=15, climate_scenario="Calentamiento moderado", resilience=0.6,
+                     lever="frailejon", regions=None):
+    """
+    Plan nacional de restauración: para cada páramo, la menor restauración
+    que lleva su puntaje de salud a ``target_score`` en ``years`` años.
+
+    Parámetros:
+    - target_score: meta de puntaje de salud (0-100)
+    - years: horizonte (años)
+    - climate_scenario: clave de CLIMATE_SCENARIO_STRENGTH
+    - resilience: resiliencia actual, común (número) o por páramo (dict
+      nombre -> valor; los que falten usan 0.6)
+    - lever: "frailejon" (aumentar el porcentaje inicial de frailejones
+      desde la densidad actual) o "resilience" (mejorar la resiliencia)
+    - regions: lista de páramos (dicts como los de get_frailejon_regions;
+      por defecto todos)
+
+    Salida:
+    - pd.DataFrame ordenado por prioridad (primero los páramos que no
+      alcanzan la meta ni con la palanca al máximo, luego la mayor
+      restauración necesaria), con columnas rank, name, department,
+      current_frailejon, resilience, baseline_score, required,
+      restoration, achieved_score, feasible y recommendations
+    """
+    if climate_scenario not in CLIMATE_SCENARIO_STRENGTH:
+        raise ValueError(f"Escenario climático desconocido: {climate_scenario}")
+    regions = regions if regions is not None else get_frailejon_regions()
+    current = np.array([float(region.get("frailejon_density", 100)) for region in regions])
+    if isinstance(resilience, dict):
+        resil = np.array([float(resilience.get(region["name"], 0.6)) for region in regions])
+    else:
+        resil = np.full(len(regions), float(resilience))
+
+    result = minimum_restoration(current, resil, target_score, years,
+                                 CLIMATE_SCENARIO_STRENGTH[climate_scenario], lever)
+    baseline_lever = current if lever == "frailejon" else resil
+    plan = pd.DataFrame({
+        "name": [region["name"] for region in regions],
+        "department": [region.get("department", "") for region in regions],
+        "current_frailejon": current,
+        "resilience": resil,
+        "baseline_score": result["baseline_score"],
+        "required": result["required"],
+        "restoration": result["required"] - baseline_lever,
+        "achieved_score": result["achieved_score"],
+        "feasible": ~np.isnan(result["required"]),
+        "recommendations": [get_conservation_recommendations(value) for value in current],
+    })
+    plan = plan.sort_values(["feasible", "restoration", "baseline_score"], ascending=[True, False, True],
+                            na_position="first")
+    plan.insert(0, "rank", np.arange(1, len(plan) + 1))
+    plan.attrs.update({"target_score": target_score, "years": years, "climate_scenario": climate_scenario,
+                       "lever": lever, "iterations": result["iterations"]})
+    return plan.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Restauración mínima por páramo para alcanzar un puntaje de salud.")
+    parser.add_argument("--target", type=float, default=60.0, help="puntaje de salud buscado (0-100)")
+    parser.add_argument("--years", type=float, default=15, help="horizonte en años")
+    parser.add_argument("--climate", default="Calentamiento moderado", choices=list(CLIMATE_SCENARIO_STRENGTH))
+    parser.add_argument("--resilience", type=float, default=0.6, help="resiliencia actual de los páramos")
+    parser.add_argument("--lever", default="frailejon", choices=list(LEVERS))
+    parser.add_argument("--output", default=None, help="CSV de salida (opcional)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    plan = plan_restoration(args.target, args.years, args.climate, args.resilience, args.lever)
+    elapsed = time.perf_counter() - start
+    with pd.option_context("display.width", 160, "display.max_columns", 20):
+        print(plan.drop(columns="recommendations").round(2).to_string(index=False))
+    print(f"{len(plan)} páramos en {elapsed:.2f} s ({plan.attrs['iterations']} iteraciones)")
+    if args.output:
+        plan.to_csv(args.output, index=False)
@@ -0,0 +1,384 @@
+import argparse
+import itertools
+import json
+import os
+import struct
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data.regions import get_frailejon_regions
+from models import (
+    CLIMATE_SCENARIO_STRENGTH,
+    SIMULATION_COLUMNS,
+    calculate_biodiversity_impact_batch,
+    calculate_crop_production_batch,
+    calculate_economic_impact_batch,
+    create_ecosystem_simulation
+)
+from utils import calculate_paramo_health_score
+
+# Cubo de escenarios precalculado. Los controles de la página principal son
+# pocos y acotados (frailejón 10-100 de 5 en 5, cinco niveles de
+# resiliencia, tres escenarios climáticos, 1-40 años y 18 regiones), así que
+# todas las métricas que muestran las páginas caben en unos pocos arreglos
+# N-dimensionales, guardados en un .npz sin comprimir:
+#
+#     python scenario_cube.py --workers 4
+#
+# Al consultar, cada arreglo del .npz se abre memoria-mapeado (a partir de
+# su posición dentro del zip) y se responde con cortes o con interpolación
+# multilineal sobre los ejes numéricos, sin resolver el modelo.
+
+CUBE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "scenario_cube.npz")
+
+CUBE_FRAILEJON = tuple(range(10, 101, 5))
+CUBE_RESILIENCE = (0.2, 0.4, 0.6, 0.8, 1.0)
+CUBE_YEARS = tuple(range(1, 41))
+
+# Puntos por año de las trayectorias guardadas (la resolución de la página)
+STEPS_PER_YEAR = 12
+
+# Ejes categóricos: se consultan por nombre, sin interpolar
+CATEGORICAL_AXES = ("climate", "region", "service", "variable")
+
+_META_KEY = "__meta__"
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _simulate_group(task):
+    climate_index, years_index, climate_strength, years, frailejon_values, resilience_values, dtype = task
+    block = None
+    for (i, frailejon), (j, resilience) in itertools.product(enumerate(frailejon_values),
+                                                             enumerate(resilience_values)):
+        run = create_ecosystem_simulation(frailejon, years, resilience, climate_strength=climate_strength,
+                                          output="array")
+        if block is None:
+            block = np.empty((len(frailejon_values), len(resilience_values), len(run["data"]),
+                              len(SIMULATION_COLUMNS) - 1), dtype=dtype)
+            ends = np.empty(block.shape[:2] + block.shape[3:])
+            time_axis = run["data"][:, 0].astype(np.float64)
+        block[i, j] = run["data"][:, 1:]
+        ends[i, j] = run["data"][-1, 1:]
+    return climate_index, years_index, time_axis, block, ends
+
+
+def build_cube(path=None, workers=None, dtype=np.float32, frailejon_values=CUBE_FRAILEJON,
+               resilience_values=CUBE_RESILIENCE, years_values=CUBE_YEARS, log=print):
+    """
+    Precalcula todas las métricas de la rejilla de controles y las guarda
+    en un .npz sin comprimir (para poder memoria-mapearlo).
+
+    Contenido (ejes entre corchetes):
+    - trajectories [frailejon, resilience, climate, years, time, variable]:
+      simulación mensual; los instantes después del horizonte quedan en NaN
+    - end_state [frailejon, resilience, climate, years, variable]
+    - health_score [frailejon, resilience, climate, years]: puntaje de
+      utils.calculate_paramo_health_score con el estado final
+    - biodiversity_index [frailejon, resilience]
+    - crop_production [frailejon]
+    - economic_loss [frailejon, region, service] y economic_loss_total
+      [frailejon, region]
+
+    Parámetros:
+    - path: archivo de salida (por defecto CUBE_PATH)
+    - workers: procesos para las simulaciones (None = todos los núcleos)
+    - dtype: tipo de las trayectorias (float32 por defecto, la mitad de
+      espacio; los demás arreglos se guardan en float64)
+    - log: función para los mensajes de avance (None = silencio)
+
+    Salida:
+    - ruta del cubo escrito
+    """
+    path = path or CUBE_PATH
+    frailejon = np.asarray(frailejon_values, dtype=float)
+    resilience = np.asarray(resilience_values, dtype=float)
+    years = np.asarray(years_values, dtype=int)
+    climates = list(CLIMATE_SCENARIO_STRENGTH)
+    regions = ["Todos los páramos"] + [p["name"] for p in get_frailejon_regions()]
+    variables = list(SIMULATION_COLUMNS[1:])
+    # Una fila de más para el redondeo del último paso mensual
+    max_steps = int(years.max()) * STEPS_PER_YEAR + 2
+
+    trajectories = np.full((len(frailejon), len(resilience), len(climates), len(years), max_steps, len(variables)),
+                           np.nan, dtype=dtype)
+    # Filas válidas de cada horizonte y el eje de tiempo más largo
+    steps = np.zeros(len(years), dtype=int)
+    end_state = np.empty((len(frailejon), len(resilience), len(climates), len(years), len(variables)))
+    time_axis = np.empty(0)
+    tasks = [(c, y, CLIMATE_SCENARIO_STRENGTH[climate], int(n_years), frailejon, resilience, np.dtype(dtype))
+             for c, climate in enumerate(climates) for y, n_years in enumerate(years)]
+    start = time.perf_counter()
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    if workers == 1:
+        blocks = map(_simulate_group, tasks)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        blocks = pool.map(_simulate_group, tasks, chunksize=4)
+    try:
+        for done, (c, y, block_time, block, ends) in enumerate(blocks, start=1):
+            trajectories[:, :, c, y, :len(block_time)] = block
+            end_state[:, :, c, y] = ends
+            steps[y] = len(block_time)
+            if len(block_time) > len(time_axis):
+                time_axis = block_time
+            if log and done % len(years) == 0:
+                log(f"{done} de {len(tasks)} grupos de simulaciones ({time.perf_counter() - start:.1f} s)")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    trajectories = trajectories[:, :, :, :, :len(time_axis)]
+
+    health_score = np.vectorize(lambda *state: calculate_paramo_health_score(*state)["score"], otypes=[float])(
+        end_state[..., variables.index("frailejon_population")],
+        end_state[..., variables.index("water_regulation")],
+        end_state[..., variables.index("biodiversity")]
+    )
+
+    grid_frailejon, grid_resilience = np.meshgrid(frailejon, resilience, indexing="ij")
+    biodiversity_index = calculate_biodiversity_impact_batch(grid_frailejon.ravel(), grid_resilience.ravel())
+    crop_production = calculate_crop_production_batch(frailejon)
+
+    grid_frailejon, grid_region = np.meshgrid(frailejon, np.arange(len(regions)), indexing="ij")
+    losses = calculate_economic_impact_batch(grid_frailejon.ravel(), [regions[k] for k in grid_region.ravel()])
+    services = list(losses)
+    economic_loss = np.stack([np.asarray(losses[service]) for service in services], axis=-1)
+    economic_loss = economic_loss.reshape(len(frailejon), len(regions), len(services))
+
+    meta = {
+        "dims": {
+            "trajectories": ["frailejon", "resilience", "climate", "years", "time", "variable"],
+            "end_state": ["frailejon", "resilience", "climate", "years", "variable"],
+            "health_score": ["frailejon", "resilience", "climate", "years"],
+            "biodiversity_index": ["frailejon", "resilience"],
+            "crop_production": ["frailejon"],
+            "economic_loss": ["frailejon", "region", "service"],
+            "economic_loss_total": ["frailejon", "region"],
+        },
+        "created_at": time.time(),
+    }
+    arrays = {
+        _META_KEY: np.array(json.dumps(meta, ensure_ascii=False)),
+        "frailejon": frailejon,
+        "resilience": resilience,
+        "years": years.astype(float),
+        "time": time_axis,
+        "steps": steps,
+        "climate": np.array(climates),
+        "region": np.array(regions),
+        "service": np.array(services),
+        "variable": np.array(variables),
+        "trajectories": trajectories,
+        "end_state": end_state,
+        "health_score": np.asarray(health_score, dtype=float),
+        "biodiversity_index": np.asarray(biodiversity_index, dtype=float).reshape(len(frailejon), len(resilience)),
+        "crop_production": np.asarray(crop_production, dtype=float),
+        "economic_loss": economic_loss,
+        "economic_loss_total": economic_loss.sum(axis=-1),
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp.npz"
+    # np.savez (sin comprimir): cada arreglo queda contiguo dentro del zip
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _memmap_npz(path):
+    """Abre cada arreglo de un .npz sin comprimir como np.memmap de solo lectura."""
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path}: el cubo debe guardarse sin compresión para memoria-mapearlo")
+            # Encabezado local del zip: 30 bytes + nombre + campo extra
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack("<HH", f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+                continue
+            arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                                     order="F" if fortran_order else "C")
+    return arrays
+
+
+class ScenarioCube:
+    """
+    Cubo de escenarios memoria-mapeado (ver build_cube).
+
+    Atributos:
+    - axes: dict eje -> valores (numéricos o nombres)
+    - dims: dict arreglo -> lista de ejes
+    """
+
+    def __init__(self, path=None):
+        self.path = path or CUBE_PATH
+        self._arrays = _memmap_npz(self.path)
+        meta = json.loads(str(self._arrays.pop(_META_KEY)[()]))
+        self.dims = meta["dims"]
+        self.steps = np.array(self._arrays["steps"])
+        axes = {name for dims in self.dims.values() for name in dims}
+        self.axes = {name: (self._arrays[name].tolist() if name in CATEGORICAL_AXES else np.array(self._arrays[name]))
+                     for name in axes}
+
+    def _positions(self, axis, value):
+        """Índices y pesos (1 o 2 puntos de la rejilla) para un valor de un eje."""
+        values = self.axes[axis]
+        if axis in CATEGORICAL_AXES:
+            if value not in values:
+                raise KeyError(f"'{value}' no está en el eje {axis} del cubo")
+            return [(values.index(value), 1.0)]
+        value = float(value)
+        if not values[0] <= value <= values[-1]:
+            raise KeyError(f"{axis}={value} está fuera del cubo ({values[0]}-{values[-1]})")
+        upper = int(np.searchsorted(values, value))
+        if values[upper] == value:
+            return [(upper, 1.0)]
+        lower = upper - 1
+        weight = (value - values[lower]) / (values[upper] - values[lower])
+        return [(lower, 1.0 - weight), (upper, weight)]
+
+    def query(self, name, **coords):
+        """
+        Valor de un arreglo del cubo en unas coordenadas.
+
+        Los ejes categóricos (climate, region, service, variable) se eligen
+        por nombre; los numéricos (frailejon, resilience, years, time) se
+        interpolan linealmente entre los dos puntos vecinos de la rejilla
+        (multilineal si hay varios). Los ejes que no se dan quedan completos.
+
+        Parámetros:
+        - name: arreglo del cubo (p. ej. 'health_score')
+        - coords: eje=valor
+
+        Salida:
+        - float si se dieron todos los ejes, o np.ndarray con los ejes
+          restantes en su orden original
+
+        Lanza KeyError si un valor está fuera del cubo.
+        """
+        dims = self.dims[name]
+        unknown = set(coords) - set(dims)
+        if unknown:
+            raise ValueError(f"{name} no tiene los ejes {sorted(unknown)}")
+        positions = [self._positions(axis, coords[axis]) if axis in coords else [(slice(None), 1.0)]
+                     for axis in dims]
+        array = self._arrays[name]
+        result = None
+        # Suma ponderada de las esquinas de la celda (2^k cortes, k = ejes interpolados)
+        for corner in itertools.product(*positions):
+            index = tuple(position for position, _ in corner)
+            weight = float(np.prod([w for _, w in corner]))
+            value = np.asarray(array[index], dtype=np.float64) * weight
+            result = value if result is None else result + value
+        return float(result) if np.ndim(result) == 0 else result
+
+    def simulation(self, frailejon_percentage, years, ecosystem_resilience, climate="Calentamiento moderado"):
+        """
+        Simulación precalculada con la misma forma que create_ecosystem_simulation
+        (resolución mensual). ``years`` debe ser uno de los horizontes del cubo.
+
+        Salida:
+        - pd.DataFrame con las columnas de SIMULATION_COLUMNS
+        """
+        matches = np.flatnonzero(self.axes["years"] == float(years))
+        if len(matches) == 0:
+            raise KeyError(f"years={years} no es un horizonte del cubo")
+        steps = int(self.steps[matches[0]])
+        values = self.query("trajectories", frailejon=frailejon_percentage, resilience=ecosystem_resilience,
+                            climate=climate, years=years)[:steps]
+        data = np.empty((steps, len(SIMULATION_COLUMNS)))
+        data[:, 0] = self.axes["time"][:steps]
+        data[:, 1:] = values
+        return pd.DataFrame(data, columns=list(SIMULATION_COLUMNS))
+
+
+def load_cube(path=None):
+    """
+    Cubo de escenarios con caché por fecha de modificación del archivo.
+
+    Salida:
+    - ScenarioCube, o None si el cubo no existe
+    """
+    path = path or CUBE_PATH
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+    cube = ScenarioCube(path)
+
+    with _cache_lock:
+        _cache[path] = (mtime, cube)
+    return cube
+
+
+def lookup_simulation(frailejon_percentage, years, ecosystem_resilience, climate_strength=0.02, path=None):
+    """
+    Simulación desde el cubo, con los mismos argumentos que
+    create_ecosystem_simulation.
+
+    Salida:
+    - pd.DataFrame, o None si no hay cubo o el escenario está fuera de él
+      (el llamador resuelve el modelo)
+    """
+    cube = load_cube(path)
+    climate = next((name for name, strength in CLIMATE_SCENARIO_STRENGTH.items()
+                    if strength == climate_strength), None)
+    if cube is None or climate is None:
+        return None
+    try:
+        return cube.simulation(frailejon_percentage, years, ecosystem_resilience, climate)
+    except KeyError:
+        return None
+
+
+def lookup_biodiversity(frailejon_percentage, ecosystem_resilience, path=None):
+    """
+    Índice de biodiversidad desde el cubo, con los mismos argumentos que
+    calculate_biodiversity_impact.
+
+    Salida:
+    - float, o None si no hay cubo o el escenario está fuera de él
+    """
+    cube = load_cube(path)
+    if cube is None:
+        return None
+    try:
+        return cube.query("biodiversity_index", frailejon=frailejon_percentage, resilience=ecosystem_resilience)
+    except KeyError:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precalcula el cubo de escenarios de la página principal.")
+    parser.add_argument("--workers", type=int, default=None, help="procesos (por defecto, todos los núcleos)")
+    parser.add_argument("--output", default=CUBE_PATH, help="archivo .npz de salida")
+    parser.add_argument("--float64", action="store_true", help="guardar las trayectorias en doble precisión")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    build_cube(args.output, workers=args.workers, dtype=np.float64 if args.float64 else np.float32)
+    size = os.path.getsize(args.output) / 1e6
+    print(f"Cubo escrito en {time.perf_counter() - start:.1f} s ({size:.0f} MB) -> {args.output}")
@@ -0,0 +1,175 @@
+import os
+import time
+import uuid
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.ipc as ipc
+
+# Almacén columnar de resultados de escenarios: cada corrida de
+# create_ecosystem_simulation se guarda como filas Parquet en un dataset
+# particionado (estilo Hive) por región, escenario climático y resiliencia:
+#
+#     data/escenarios/region=.../climate=.../resilience=.../run-<id>.parquet
+#
+# Las lecturas aplican los filtros sobre las particiones y las estadísticas
+# de los archivos (solo se abren los que pueden tener filas) y leen solo las
+# columnas pedidas. Para comparar muchas corridas una y otra vez, un
+# resultado se puede exportar a un archivo Arrow IPC que se abre
+# memoria-mapeado, sin copiar ni decodificar.
+
+SCENARIO_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "escenarios")
+
+PARTITION_COLUMNS = ("region", "climate", "resilience")
+
+SCHEMA = pa.schema([
+    ("run_id", pa.string()),
+    ("created_at", pa.timestamp("s")),
+    ("frailejon", pa.float64()),
+    ("years", pa.float64()),
+    ("time", pa.float64()),
+    ("biodiversity", pa.float64()),
+    ("water_regulation", pa.float64()),
+    ("endemic_plants", pa.float64()),
+    ("frailejon_population", pa.float64()),
+    ("soil_carbon", pa.float64()),
+    ("region", pa.string()),
+    ("climate", pa.string()),
+    ("resilience", pa.float64()),
+])
+
+_PARTITIONING = ds.partitioning(
+    pa.schema([(name, SCHEMA.field(name).type) for name in PARTITION_COLUMNS]),
+    flavor="hive"
+)
+
+
+def _run_table(run_id, params, results, created_at):
+    n = len(results)
+    columns = {
+        "run_id": pa.array([run_id] * n, pa.string()),
+        "created_at": pa.array(np.full(n, int(created_at), dtype="datetime64[s]")),
+        "frailejon": pa.array(np.full(n, float(params["frailejon"]))),
+        "years": pa.array(np.full(n, float(params["years"]))),
+    }
+    for name in ("time", "biodiversity", "water_regulation", "endemic_plants", "frailejon_population", "soil_carbon"):
+        columns[name] = pa.array(results[name].to_numpy(dtype=float))
+    columns["region"] = pa.array([params.get("region", "Todos los páramos")] * n, pa.string())
+    columns["climate"] = pa.array([params.get("climate", "Estable")] * n, pa.string())
+    columns["resilience"] = pa.array(np.full(n, float(params["resilience"])))
+    return pa.table(columns, schema=SCHEMA)
+
+
+def write_runs(runs, root=None, run_ids=None, basename=None):
+    """
+    Agrega corridas al almacén.
+
+    Parámetros:
+    - runs: lista de (params, results): params con frailejon, resilience,
+      years, region y climate; results el DataFrame de
+      create_ecosystem_simulation
+    - root: carpeta del dataset (por defecto SCENARIO_STORE_PATH)
+    - run_ids: identificadores de las corridas (por defecto aleatorios)
+    - basename: prefijo de los archivos escritos (por defecto uno único);
+      repetir una escritura con el mismo basename reemplaza sus archivos en
+      lugar de duplicar filas
+
+    Salida:
+    - lista de run_id asignados (en el orden de ``runs``)
+    """
+    if not runs:
+        return []
+    root = root or SCENARIO_STORE_PATH
+    created_at = time.time()
+    run_ids = list(run_ids) if run_ids is not None else [uuid.uuid4().hex for _ in runs]
+    table = pa.concat_tables([
+        _run_table(run_id, params, results, created_at)
+        for run_id, (params, results) in zip(run_ids, runs)
+    ])
+    # Nombre de archivo único por llamada: las escrituras nunca pisan
+    # archivos de otras llamadas, solo agregan
+    basename = basename or f"run-{uuid.uuid4().hex}"
+    ds.write_dataset(
+        table, root, format="parquet", partitioning=_PARTITIONING,
+        basename_template=f"{basename}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore"
+    )
+    return run_ids
+
+
+def open_store(root=None):
+    """Dataset de pyarrow sobre todo el almacén (sin leer datos)."""
+    return ds.dataset(root or SCENARIO_STORE_PATH, format="parquet", partitioning=_PARTITIONING, schema=SCHEMA)
+
+
+def _filter_expression(filters):
+    expression = None
+    for name, value in (filters or {}).items():
+        field = ds.field(name)
+        if isinstance(value, (list, tuple, set)):
+            condition = field.isin(list(value))
+        elif isinstance(value, slice):
+            condition = None
+            if value.start is not None:
+                condition = field >= value.start
+            if value.stop is not None:
+                upper = field <= value.stop
+                condition = upper if condition is None else condition & upper
+        else:
+            condition = field == value
+        if condition is not None:
+            expression = condition if expression is None else expression & condition
+    return expression
+
+
+def read_runs(filters=None, columns=None, root=None):
+    """
+    Lee corridas del almacén con filtros y selección de columnas.
+
+    Parámetros:
+    - filters: dict columna -> valor, lista de valores o slice(mín, máx)
+      (ambos incluidos); los filtros sobre region/climate/resilience
+      descartan particiones completas y los demás usan las estadísticas
+      de los archivos Parquet
+    - columns: columnas a leer (None = todas)
+    - root: carpeta del dataset
+
+    Salida:
+    - pyarrow.Table
+    """
+    root = root or SCENARIO_STORE_PATH
+    if not os.path.isdir(root):
+        fields = [SCHEMA.field(name) for name in columns] if columns else list(SCHEMA)
+        return pa.schema(fields).empty_table()
+    return open_store(root).to_table(columns=columns, filter=_filter_expression(filters))
+
+
+def read_runs_dataframe(filters=None, columns=None, root=None):
+    """Como read_runs, pero devuelve un pd.DataFrame."""
+    return read_runs(filters, columns, root).to_pandas()
+
+
+def list_runs(filters=None, root=None):
+    """Una fila por corrida (run_id y parámetros), leyendo solo esas columnas."""
+    columns = ["run_id", "created_at", "frailejon", "years", "region", "climate", "resilience"]
+    frame = read_runs_dataframe(filters, columns, root)
+    return frame.drop_duplicates("run_id").reset_index(drop=True)
+
+
+def export_arrow(table, path):
+    """Escribe una tabla como archivo Arrow IPC (para abrirla memoria-mapeada)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def load_arrow(path):
+    """
+    Abre un archivo Arrow IPC memoria-mapeado: las columnas apuntan al
+    archivo y el sistema operativo carga solo las páginas que se leen.
+    """
+    with pa.memory_map(path, "r") as source:
+        return ipc.open_file(source).read_all()
@@ -0,0 +1,226 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Núcleo de dispersión por defecto (vecindad de Moore 3x3, sin la celda central)
+DEFAULT_KERNEL = np.array([
+    [0.05, 0.20, 0.05],
+    [0.20, 0.00, 0.20],
+    [0.05, 0.20, 0.05],
+], dtype=np.float32)
+
+# Estado compartido de cada proceso trabajador (se llena en _init_worker)
+_worker_state = {}
+
+
+def initial_grid_for_paramo(frailejon_density, shape=(1000, 1000), patchiness=0.3, seed=0):
+    """
+    Genera una grilla inicial de densidad (0-1) con heterogeneidad espacial
+    y media igual a ``frailejon_density`` (0-100).
+    """
+    rng = np.random.default_rng(seed)
+    noise = rng.standard_normal(shape).astype(np.float32)
+    # Suavizado barato con el mismo stencil del simulador para crear parches
+    for _ in range(4):
+        noise = 0.5 * noise + 0.5 * _apply_stencil(np.pad(noise, 1, mode="edge"), DEFAULT_KERNEL / DEFAULT_KERNEL.sum())
+    noise /= max(float(noise.std()), 1e-6)
+
+    grid = frailejon_density / 100.0 + patchiness * noise * (frailejon_density / 100.0)
+    grid = np.clip(grid, 0.0, 1.0).astype(np.float32)
+    return grid
+
+
+def _apply_stencil(padded, kernel):
+    """
+    Convolución de un bloque con borde ya añadido (halo de kernel.shape // 2)
+    como suma de cortes desplazados: vectorizada y sin copias intermedias
+    grandes.
+    """
+    kr, kc = kernel.shape
+    rows = padded.shape[0] - kr + 1
+    cols = padded.shape[1] - kc + 1
+    out = np.zeros((rows, cols), dtype=np.float32)
+    for i in range(kr):
+        for j in range(kc):
+            w = kernel[i, j]
+            if w != 0.0:
+                out += w * padded[i:i + rows, j:j + cols]
+    return out
+
+
+def _padded_rows(grid, r0, r1, halo):
+    """Filas r0:r1 de la grilla con ``halo`` filas/columnas de borde (reflejo de borde)."""
+    n_rows = grid.shape[0]
+    top = max(0, r0 - halo)
+    bottom = min(n_rows, r1 + halo)
+    block = grid[top:bottom]
+    pad_top = halo - (r0 - top)
+    pad_bottom = halo - (bottom - r1)
+    return np.pad(block, ((pad_top, pad_bottom), (halo, halo)), mode="edge")
+
+
+def _step_rows(src, dst, r0, r1, climate, land_use, kernel, params, climate_factor):
+    """
+    Avanza un año las filas r0:r1 leyendo de ``src`` y escribiendo en ``dst``.
+
+    Dinámica por celda (densidad D en 0-1):
+    - dispersión: D' = (1 - m) D + m * (kernel * D)
+    - crecimiento logístico limitado por la fracción de suelo no transformado
+    - mortalidad base + estrés climático local + presión por uso del suelo
+    """
+    halo = kernel.shape[0] // 2
+    density = src[r0:r1]
+    neighbours = _apply_stencil(_padded_rows(src, r0, r1, halo), kernel)
+    dispersed = (1.0 - params["dispersal"]) * density + params["dispersal"] * neighbours
+
+    local_land_use = land_use[r0:r1] if land_use is not None else 0.0
+    local_climate = climate[r0:r1] if climate is not None else 1.0
+    capacity = np.maximum(1.0 - local_land_use, 1e-6)
+
+    growth = params["growth_rate"] * dispersed * (1.0 - dispersed / capacity)
+    mortality = (params["base_mortality"]
+                 + climate_factor * local_climate
+                 + params["land_use_mortality"] * local_land_use)
+
+    dst[r0:r1] = np.clip(dispersed + growth - mortality * dispersed, 0.0, capacity)
+
+
+def _row_blocks(n_rows, n_blocks):
+    edges = np.linspace(0, n_rows, n_blocks + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+def _init_worker(names, shape, kernel, params):
+    """Conecta el proceso trabajador a las grillas en memoria compartida."""
+    _worker_state.clear()
+    _worker_state["shm"] = {}
+    for key, name in names.items():
+        if name is None:
+            _worker_state[key] = None
+            continue
+        shm = shared_memory.SharedMemory(name=name)
+        _worker_state["shm"][key] = shm
+        _worker_state[key] = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+    _worker_state["kernel"] = kernel
+    _worker_state["params"] = params
+
+
+def _worker_step(src_key, dst_key, r0, r1, climate_factor):
+    state = _worker_state
+    _step_rows(state[src_key], state[dst_key], r0, r1, state["climate"], state["land_use"],
+               state["kernel"], state["params"], climate_factor)
+
+
+def _to_shared(array):
+    shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    np.ndarray(array.shape, dtype=np.float32, buffer=shm.buf)[:] = array
+    return shm
+
+
+def simulate_spatial_paramo(initial_density, years, climate_layer=None, land_use_layer=None,
+                            ecosystem_resilience=0.6, climate_strength=0.02, dispersal=0.1,
+                            base_mortality=0.01, land_use_mortality=0.05, kernel=None,
+                            record_every=None, workers=1, blocks_per_worker=2):
+    """
+    Simulador espacial (autómata celular) de la densidad de frailejones en
+    una grilla de celdas, con pasos anuales.
+
+    Parámetros:
+    - initial_density: grilla (filas, columnas) de densidad inicial 0-1
+      (ver initial_grid_for_paramo)
+    - years: número de pasos anuales (> 0)
+    - climate_layer: sensibilidad climática relativa por celda (None = 1);
+      el estrés crece linealmente hasta climate_strength al final del horizonte
+    - land_use_layer: fracción de la celda transformada por uso del suelo 0-1
+      (limita la capacidad y añade mortalidad)
+    - ecosystem_resilience: 0-1, escala la tasa de crecimiento local
+    - dispersal: fracción de la densidad que se redistribuye a vecinos cada año
+    - kernel: stencil de dispersión (por defecto vecindad 3x3 normalizada)
+    - record_every: guardar una copia de la grilla cada N años (None = no)
+    - workers: procesos para repartir la grilla por bloques de filas
+      (1 = todo en el proceso actual)
+
+    Salida:
+    - dict con 'time' (años), 'mean_density' (% medio por año), 'final'
+      (grilla final 0-1) y 'snapshots' (lista de (año, grilla) si se pidió)
+    """
+    years = int(years)
+    if years <= 0:
+        raise ValueError("years debe ser > 0")
+
+    grid = np.clip(np.asarray(initial_density, dtype=np.float32), 0.0, 1.0)
+    shape = grid.shape
+    for layer in (climate_layer, land_use_layer):
+        if layer is not None and np.shape(layer) != shape:
+            raise ValueError("Las capas deben tener la forma de la grilla")
+
+    kernel = DEFAULT_KERNEL if kernel is None else np.asarray(kernel, dtype=np.float32)
+    kernel = kernel / kernel.sum()
+    ecosystem_resilience = float(np.clip(ecosystem_resilience, 0.0, 1.0))
+    params = {
+        "dispersal": float(np.clip(dispersal, 0.0, 1.0)),
+        "growth_rate": 0.08 * ecosystem_resilience,
+        "base_mortality": float(base_mortality),
+        "land_use_mortality": float(land_use_mortality),
+    }
+    climate = None if climate_layer is None else np.asarray(climate_layer, dtype=np.float32)
+    land_use = None if land_use_layer is None else np.clip(np.asarray(land_use_layer, dtype=np.float32), 0.0, 1.0)
+
+    time = np.arange(0, years + 1)
+    mean_density = np.empty(years + 1)
+    mean_density[0] = float(grid.mean()) * 100.0
+    snapshots = [(0, grid.copy())] if record_every else []
+
+    def climate_factor(year):
+        return climate_strength * (year / years)
+
+    workers = max(1, int(workers or 1))
+    if workers == 1:
+        src, dst = grid, np.empty_like(grid)
+        for year in range(1, years + 1):
+            _step_rows(src, dst, 0, shape[0], climate, land_use, kernel, params, climate_factor(year))
+            src, dst = dst, src
+            mean_density[year] = float(src.mean()) * 100.0
+            if record_every and year % record_every == 0:
+                snapshots.append((year, src.copy()))
+        final = src
+    else:
+        # Dos buffers compartidos (lectura/escritura alternada) y las capas;
+        # cada trabajador avanza un bloque de filas por año sin copiar grillas
+        shms = {}
+        buffers = {}
+        try:
+            for key, layer in (("a", grid), ("b", np.zeros_like(grid)), ("climate", climate), ("land_use", land_use)):
+                if layer is not None:
+                    shms[key] = _to_shared(layer)
+            names = {key: (shms[key].name if key in shms else None) for key in ("a", "b", "climate", "land_use")}
+            buffers = {key: np.ndarray(shape, dtype=np.float32, buffer=shms[key].buf) for key in ("a", "b")}
+
+            blocks = _row_blocks(shape[0], workers * blocks_per_worker)
+            src_key, dst_key = "a", "b"
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(names, shape, kernel, params)) as pool:
+                for year in range(1, years + 1):
+                    factor = climate_factor(year)
+                    futures = [pool.submit(_worker_step, src_key, dst_key, r0, r1, factor) for r0, r1 in blocks]
+                    for future in futures:
+                        future.result()
+                    src_key, dst_key = dst_key, src_key
+                    mean_density[year] = float(buffers[src_key].mean()) * 100.0
+                    if record_every and year % record_every == 0:
+                        snapshots.append((year, buffers[src_key].copy()))
+            final = buffers[src_key].copy()
+        finally:
+            # Las vistas deben liberarse antes de cerrar la memoria compartida
+            buffers.clear()
+            for shm in shms.values():
+                shm.close()
+                shm.unlink()
+
+    return {
+        "time": time,
+        "mean_density": mean_density,
+        "final": final,
+        "snapshots": snapshots,
+    }
@@ -0,0 +1,192 @@
+import itertools
+import threading
+
+import numpy as np
+from numpy.polynomial import legendre
+from scipy.stats import qmc
+
+from models import SIMULATION_COLUMNS, create_ecosystem_simulation
+
+# Modelo sustituto (surrogate) de create_ecosystem_simulation para análisis
+# masivos (optimización, barridos de incertidumbre) que necesitan millones
+# de evaluaciones. Para un horizonte fijo, cada variable en cada instante de
+# salida se aproxima con un polinomio de Legendre de grado total ``degree``
+# en las entradas escaladas a [-1, 1] (caos polinomial ajustado por mínimos
+# cuadrados sobre una muestra del modelo real). Evaluarlo es un producto de
+# matrices, así que un lote de escenarios cuesta microsegundos por escenario.
+#
+# El error se mide con escenarios de validación que no se usaron para
+# ajustar. Fuera de los límites muestreados, o si el error de validación
+# supera la tolerancia, se usa el modelo real.
+
+INPUTS = ("frailejon", "resilience", "climate_strength")
+
+# Región muestreada (la de los controles de la página)
+DEFAULT_BOUNDS = {
+    "frailejon": (10.0, 100.0),
+    "resilience": (0.2, 1.0),
+    "climate_strength": (0.0, 0.04),
+}
+
+DEFAULT_DEGREE = 6
+DEFAULT_SAMPLES = 1024
+DEFAULT_VALIDATION = 256
+# Error absoluto máximo aceptado en validación (puntos porcentuales)
+DEFAULT_TOLERANCE = 0.1
+
+VARIABLES = SIMULATION_COLUMNS[1:]
+
+_surrogates = {}
+_surrogates_lock = threading.Lock()
+
+
+def _legendre_basis(z, degree):
+    """Términos de Legendre de grado total <= degree evaluados en z (n, d) -> (n, términos)."""
+    per_input = [legendre.legvander(z[:, k], degree) for k in range(z.shape[1])]
+    terms = [powers for powers in itertools.product(range(degree + 1), repeat=z.shape[1]) if sum(powers) <= degree]
+    basis = np.empty((len(z), len(terms)))
+    for column, powers in enumerate(terms):
+        values = per_input[0][:, powers[0]].copy()
+        for k in range(1, z.shape[1]):
+            values *= per_input[k][:, powers[k]]
+        basis[:, column] = values
+    return basis
+
+
+def _stack_inputs(frailejon_percentage, ecosystem_resilience, climate_strength):
+    return np.column_stack(np.broadcast_arrays(
+        np.atleast_1d(np.clip(np.asarray(frailejon_percentage, dtype=float), 0, 100)),
+        np.atleast_1d(np.clip(np.asarray(ecosystem_resilience, dtype=float), 0.0, 1.0)),
+        np.atleast_1d(np.asarray(climate_strength, dtype=float))
+    ))
+
+
+class EcosystemSurrogate:
+    """
+    Aproximación polinomial de la simulación para un horizonte fijo.
+
+    Parámetros:
+    - years: horizonte de la simulación (años)
+    - degree: grado total de los polinomios
+    - bounds: dict entrada -> (mín, máx) de la región muestreada
+    - steps_per_year: puntos de salida por año (1 = anual)
+    - tolerance: error de validación máximo para confiar en el sustituto
+    """
+
+    def __init__(self, years, degree=DEFAULT_DEGREE, bounds=None, steps_per_year=1, tolerance=DEFAULT_TOLERANCE):
+        self.years = float(years)
+        if self.years <= 0:
+            raise ValueError("years debe ser > 0")
+        self.degree = int(degree)
+        bounds = dict(DEFAULT_BOUNDS, **(bounds or {}))
+        self.lower = np.array([bounds[name][0] for name in INPUTS], dtype=float)
+        self.upper = np.array([bounds[name][1] for name in INPUTS], dtype=float)
+        self.steps_per_year = steps_per_year
+        self.tolerance = tolerance
+        self.time = None
+        self.coefficients = None
+        self.validation = None
+
+    def _solve(self, inputs):
+        runs = [create_ecosystem_simulation(frailejon, self.years, resilience, climate_strength=climate_strength,
+                                            resolution=self.steps_per_year, output="array")
+                for frailejon, resilience, climate_strength in inputs]
+        if self.time is None:
+            self.time = runs[0]["data"][:, 0].copy()
+        return np.stack([run["data"][:, 1:] for run in runs])
+
+    def _scaled(self, inputs):
+        return 2.0 * (inputs - self.lower) / (self.upper - self.lower) - 1.0
+
+    def fit(self, samples=DEFAULT_SAMPLES, validation=DEFAULT_VALIDATION, seed=0):
+        """
+        Muestrea el modelo real (hipercubo latino), ajusta los coeficientes y
+        mide el error con ``validation`` escenarios aleatorios adicionales.
+
+        Salida:
+        - el mismo sustituto (para encadenar)
+        """
+        sampler = qmc.LatinHypercube(d=len(INPUTS), seed=seed)
+        inputs = qmc.scale(sampler.random(samples), self.lower, self.upper)
+        outputs = self._solve(inputs)
+        basis = _legendre_basis(self._scaled(inputs), self.degree)
+        if basis.shape[1] > samples:
+            raise ValueError(f"Se necesitan al menos {basis.shape[1]} muestras para grado {self.degree}")
+        self.coefficients, *_ = np.linalg.lstsq(basis, outputs.reshape(samples, -1), rcond=None)
+
+        rng = np.random.default_rng(seed + 1)
+        check_inputs = qmc.scale(rng.random((validation, len(INPUTS))), self.lower, self.upper)
+        errors = np.abs(self._approximate(check_inputs) - self._solve(check_inputs))
+        self.validation = {
+            "samples": samples,
+            "validation_samples": validation,
+            "max_abs_error": {name: float(errors[:, :, k].max()) for k, name in enumerate(VARIABLES)},
+            "rmse": {name: float(np.sqrt(np.mean(errors[:, :, k] ** 2))) for k, name in enumerate(VARIABLES)},
+        }
+        return self
+
+    @property
+    def trusted(self):
+        """True si el error de validación está dentro de la tolerancia."""
+        return self.validation is not None and max(self.validation["max_abs_error"].values()) <= self.tolerance
+
+    def in_trust_region(self, frailejon_percentage, ecosystem_resilience, climate_strength=0.02):
+        """Máscara de los escenarios dentro de la región muestreada."""
+        inputs = _stack_inputs(frailejon_percentage, ecosystem_resilience, climate_strength)
+        return np.all((inputs >= self.lower) & (inputs <= self.upper), axis=1)
+
+    def _approximate(self, inputs):
+        values = _legendre_basis(self._scaled(inputs), self.degree) @ self.coefficients
+        values = values.reshape(len(inputs), len(self.time), len(VARIABLES))
+        # Mismos límites que aplica create_ecosystem_simulation
+        np.maximum(values, 0.0, out=values)
+        np.minimum(values[:, :, VARIABLES.index("frailejon_population")], 100.0,
+                   out=values[:, :, VARIABLES.index("frailejon_population")])
+        return values
+
+    def predict(self, frailejon_percentage, ecosystem_resilience, climate_strength=0.02, fallback=True):
+        """
+        Trayectorias aproximadas de un lote de escenarios.
+
+        Parámetros:
+        - frailejon_percentage, ecosystem_resilience, climate_strength:
+          arreglos de la misma longitud (o escalares comunes)
+        - fallback: resolver el modelo real para los escenarios fuera de la
+          región de confianza (si es False, se extrapola)
+
+        Salida:
+        - arreglo (escenarios, tiempo, variables) en % (0-100); el eje de
+          tiempo es ``self.time`` y las variables las de VARIABLES
+        """
+        if self.coefficients is None:
+            raise RuntimeError("El sustituto no está ajustado (llamar a fit)")
+        inputs = _stack_inputs(frailejon_percentage, ecosystem_resilience, climate_strength)
+        if not fallback:
+            return self._approximate(inputs)
+
+        inside = np.all((inputs >= self.lower) & (inputs <= self.upper), axis=1) & self.trusted
+        values = np.empty((len(inputs), len(self.time), len(VARIABLES)))
+        if inside.any():
+            values[inside] = self._approximate(inputs[inside])
+        if not inside.all():
+            values[~inside] = self._solve(inputs[~inside])
+        return values
+
+    def predict_final(self, frailejon_percentage, ecosystem_resilience, climate_strength=0.02, fallback=True):
+        """Como predict, pero solo el estado al final del horizonte: (escenarios, variables)."""
+        return self.predict(frailejon_percentage, ecosystem_resilience, climate_strength, fallback)[:, -1]
+
+
+def get_surrogate(years, degree=DEFAULT_DEGREE, steps_per_year=1):
+    """
+    Sustituto ajustado para un horizonte, reutilizado dentro del proceso
+    (se ajusta la primera vez que se pide).
+    """
+    key = (float(years), int(degree), steps_per_year)
+    with _surrogates_lock:
+        surrogate = _surrogates.get(key)
+    if surrogate is None:
+        surrogate = EcosystemSurrogate(years, degree=degree, steps_per_year=steps_per_year).fit()
+        with _surrogates_lock:
+            surrogate = _surrogates.setdefault(key, surrogate)
+    return surrogate
@@ -6,6 +6,7 @@ import numpy as np
 import folium
 from folium.plugins import HeatMap
 from models import calculate_crop_production, calculate_biodiversity_impact
+from data.boundaries import get_boundaries_geojson
 
 def plot_frailejon_crop_relationship_3d(current_frailejon_percentage, years=10):
     """
@@ -525,7 +526,112 @@ def plot_timeseries_forecast(ecosystem_data):
     
     return fig
 
-def create_risk_map(frailejon_percentage):
+def plot_ensemble_bands(ensemble, title=None):
+    """
+    Plot percentile bands (10-90) and the median of an ensemble projection.
+
+    Parameters:
+    -----------
+    ensemble : dict
+        Ensemble result or partial result with 'time', 'members' and
+        'bands' (variable -> {10, 50, 90} -> series)
+    title : str, optional
+        Figure title (defaults to the number of members)
+
+    Returns:
+    --------
+    plotly.graph_objects.Figure
+        Interactive plot
+    """
+    styles = {
+        'biodiversity': ('Biodiversidad del páramo', '#2E7D32', 'rgba(46, 125, 50, 0.2)'),
+        'water_regulation': ('Regulación hídrica', '#1976D2', 'rgba(25, 118, 210, 0.2)'),
+        'frailejon_population': ('Población de frailejones', '#FF6F00', 'rgba(255, 111, 0, 0.2)')
+    }
+    time = ensemble['time']
+    fig = go.Figure()
+
+    for variable, bands in ensemble['bands'].items():
+        label, color, fill = styles.get(variable, (variable, '#555555', 'rgba(85, 85, 85, 0.2)'))
+        fig.add_trace(go.Scatter(
+            x=np.concatenate([time, time[::-1]]),
+            y=np.concatenate([bands[90], bands[10][::-1]]),
+            fill='toself',
+            fillcolor=fill,
+            line=dict(width=0),
+            hoverinfo='skip',
+            showlegend=False
+        ))
+        fig.add_trace(go.Scatter(
+            x=time,
+            y=bands[50],
+            mode='lines',
+            name=label,
+            line=dict(color=color, width=3),
+            hovertemplate=f'Año %{{x:.1f}}<br>{label} (mediana): %{{y:.1f}}%<extra></extra>'
+        ))
+
+    fig.update_layout(
+        title=title or f"Ensamble de proyecciones ({ensemble['members']} miembros, banda 10-90%)",
+        xaxis_title="Años",
+        yaxis_title="Porcentaje del nivel óptimo (%)",
+        hovermode="x unified",
+        template="plotly_white",
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        ),
+        font=dict(color='#2d5016')
+    )
+
+    return fig
+
+def add_boundary_layer(m, paramos, zoom, color_fn, opacity=0.3):
+    """
+    Add páramo boundary polygons to a map, simplified for the given zoom level.
+    
+    Parameters:
+    -----------
+    m : folium.Map
+        Map to draw on
+    paramos : list of dict
+        Páramos to draw (as returned by get_frailejon_regions)
+    zoom : int
+        Current zoom level of the map
+    color_fn : callable
+        Function mapping a páramo dict to a color
+    opacity : float
+        Fill opacity of the polygons
+        
+    Returns:
+    --------
+    set
+        Names of the páramos that have a boundary polygon
+    """
+    by_name = {p["name"]: p for p in paramos}
+    boundaries = get_boundaries_geojson(zoom, names=by_name.keys())
+    if not boundaries["features"]:
+        return set()
+    
+    colors = {name: color_fn(p) for name, p in by_name.items()}
+    folium.GeoJson(
+        boundaries,
+        name="Límites de páramos",
+        style_function=lambda feature: {
+            "color": colors.get(feature["properties"]["name"], "green"),
+            "fillColor": colors.get(feature["properties"]["name"], "green"),
+            "weight": 2,
+            "fillOpacity": opacity,
+        },
+        tooltip=folium.GeoJsonTooltip(fields=["name"], labels=False),
+    ).add_to(m)
+    
+    return {feature["properties"]["name"] for feature in boundaries["features"]}
+
+def create_risk_map(frailejon_percentage, zoom=6):
     """
     Create an interactive map showing páramos at risk due to frailejón loss in Colombia.
     
@@ -533,6 +639,9 @@ def create_risk_map(frailejon_percentage):
     -----------
     frailejon_percentage : float
         Current frailejón population percentage
+    zoom : int
+        Zoom level of the map; páramo boundaries are served at the
+        simplification level that fits it
         
     Returns:
     --------
@@ -540,12 +649,19 @@ def create_risk_map(frailejon_percentage):
         Interactive map
     """
     # Create a base map centered on Colombia's páramos
-    m = folium.Map(location=[5.5, -73.5], zoom_start=6, tiles='CartoDB positron')
+    m = folium.Map(location=[5.5, -73.5], zoom_start=zoom, tiles='CartoDB positron')
     
     # Import regions data from data module
     from data.regions import get_frailejon_regions
     colombia_paramos = get_frailejon_regions()
     
+    # Draw real boundaries where a local GeoJSON provides them
+    risk_colors = {'Crítico': 'darkred', 'Alto': 'red', 'Medio': 'orange'}
+    with_boundary = add_boundary_layer(
+        m, colombia_paramos, zoom,
+        lambda p: risk_colors.get(p["risk"], 'green')
+    )
+    
     # Adjust risk based on current frailejón population
     # Lower frailejón population = higher risk
     risk_multiplier = max(0.1, (100 - frailejon_percentage) / 100 * 2)
@@ -594,6 +710,10 @@ def create_risk_map(frailejon_percentage):
             icon=folium.Icon(color=color, icon='tree', prefix='fa')
         ).add_to(m)
         
+        # Páramos with a boundary polygon don't need the approximate circle
+        if name in with_boundary:
+            continue
+        
         # Add circle with radius proportional to risk and frailejón density
         adjusted_risk = min(1.0, (frailejon_density/100) * risk_multiplier)
         folium.Circle(